@@ -0,0 +1,150 @@
+"""Headless batch scoring of applicant files with the Financial Overview metrics.
+
+Reads a CSV or Parquet file of applicants in chunks, computes the same metrics
+the app shows (loan-to-value, debt-to-income, housing cost ratio, risk score and
+category) with ``loan_engine.financial_metrics``, checks them against the bank
+approval rules and appends the results to a Parquet file. Chunks are scored in a process pool; nothing here imports Streamlit.
+
+    python batch_scoring.py applicants.csv scores.parquet --processes 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from loan_engine import APPROVAL_TIERS, RISK_CATEGORIES, check_approval, financial_metrics
+
+REQUIRED_COLUMNS = [
+    "monthly_income", "monthly_expenses", "other_loans", "other_assets",
+    "loan_amount", "down_payment", "loan_term", "interest_rate",
+]
+OPTIONAL_COLUMNS = {"monthly_maintenance": 0.0, "renovation_cost_monthly": 0.0}
+SCORE_COLUMNS = [
+    "monthly_payment", "loan_to_value", "debt_to_income", "disposable_income", "asset_to_loan_ratio",
+    "total_monthly_housing_cost", "total_housing_ratio", "risk_score", "risk_category",
+]
+# Optional 0-3 index into CREDIT_RATINGS; without it credit history is not assessed
+CREDIT_COLUMN = "credit_rating"
+# Read as float in every chunk, so a blank cell in a later chunk cannot change the output schema
+NUMERIC_COLUMNS = REQUIRED_COLUMNS + list(OPTIONAL_COLUMNS) + [CREDIT_COLUMN]
+
+
+def read_chunks(path, chunksize=250000):
+    """Yield the applicant file as DataFrames of at most ``chunksize`` rows."""
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix in (".parquet", ".pq"):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            chunk = batch.to_pandas()
+            numeric = [column for column in NUMERIC_COLUMNS if column in chunk]
+            yield chunk.astype(dict.fromkeys(numeric, float))
+    elif suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=dict.fromkeys(NUMERIC_COLUMNS, float))
+    else:
+        raise ValueError(f"Unsupported applicant file type {suffix or '(none)'}: use .csv, .parquet or .pq")
+
+
+def score_chunk(chunk):
+    """Applicant columns plus the score columns for one chunk.
+
+    Rows with a blank required input are flagged ``incomplete`` and left
+    unscored (missing scores, category and approval tier).
+    """
+    missing = [column for column in REQUIRED_COLUMNS if column not in chunk]
+    if missing:
+        raise ValueError(f"Applicant file is missing columns: {', '.join(missing)}")
+    inputs = {column: chunk[column].to_numpy(dtype=float) for column in REQUIRED_COLUMNS}
+    for column, default in OPTIONAL_COLUMNS.items():
+        inputs[column] = chunk[column].to_numpy(dtype=float) if column in chunk else default
+
+    incomplete = np.zeros(len(chunk), dtype=bool)
+    for column in REQUIRED_COLUMNS:
+        incomplete |= np.isnan(inputs[column])
+
+    metrics = financial_metrics(**inputs)
+    scored = chunk.copy()
+    scored["incomplete"] = incomplete
+    for column in SCORE_COLUMNS:
+        scored[column] = np.where(incomplete, np.nan, metrics[column])
+    scored["risk_category"] = pd.Categorical.from_codes(np.where(incomplete, -1, metrics["risk_category"]),
+                                                        categories=RISK_CATEGORIES)
+
+    # Strictest approval tier met (missing when none is), and which rules fail the tier after it
+    approval_metrics = {"dti_ratio": metrics["debt_to_income"], "ltv_ratio": metrics["loan_to_value"]}
+    if CREDIT_COLUMN in chunk:
+        approval_metrics["credit_rating"] = chunk[CREDIT_COLUMN].to_numpy(dtype=float)
+    approval = check_approval(approval_metrics)
+    rank = np.where(incomplete, len(APPROVAL_TIERS), approval["approval_rank"])
+    scored["approval_tier"] = pd.Categorical.from_codes(np.where(rank < len(APPROVAL_TIERS), rank, -1),
+                                                        categories=list(APPROVAL_TIERS))
+    stricter = np.maximum(rank - 1, 0)
+    for k, rule in enumerate(approval["rules"]):
+        failed = ~approval["passed"][np.arange(len(rank)), stricter, k] & (rank > 0) & ~incomplete
+        scored[f"next_tier_fails_{rule}"] = failed
+    return scored
+
+
+def score_file(input_path, output_path, chunksize=250000, processes=None):
+    """Score ``input_path`` into ``output_path`` (Parquet) and return row count, seconds and rows per second.
+
+    With ``processes`` > 1 chunks are scored in a process pool while the parent
+    reads ahead and writes results in input order; at most two chunks per worker
+    are in flight, so memory stays bounded for files of any size.
+    """
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    chunks = read_chunks(input_path, chunksize)
+
+    def write(scored):
+        nonlocal writer, rows
+        table = pa.Table.from_pandas(scored, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        else:
+            # Other columns can still be inferred differently chunk to chunk (e.g. an all-blank text column)
+            table = table.cast(writer.schema)
+        writer.write_table(table)
+        rows += len(scored)
+
+    try:
+        if processes and processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(score_chunk, chunk))
+                    if len(pending) >= 2 * processes:
+                        write(pending.pop(0).result())
+                for future in pending:
+                    write(future.result())
+        else:
+            for chunk in chunks:
+                write(score_chunk(chunk))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds > 0 else np.inf}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an applicant CSV or Parquet file into Parquet.")
+    parser.add_argument("input", help="applicant file (.csv, .parquet or .pq)")
+    parser.add_argument("output", help="Parquet file to write")
+    parser.add_argument("--chunksize", type=int, default=250000, help="rows per chunk (default: 250000)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="worker processes, 1 scores in this process (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    stats = score_file(args.input, args.output, chunksize=args.chunksize, processes=args.processes)
+    print(f"Scored {stats['rows']:,} applicants in {stats['seconds']:.2f} s "
+          f"({stats['rows_per_second']:,.0f} rows/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
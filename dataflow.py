@@ -0,0 +1,55 @@
+"""Small incremental dataflow graph for Streamlit reruns.
+
+Every rerun the app sets the current widget values as inputs and pulls the
+derived values and rendered fragments it needs. A node is recomputed only
+when one of its upstream values changed since it was last computed;
+otherwise the previous result (figure, HTML, array, ...) is reused.
+"""
+
+
+def _same(a, b):
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+class Dataflow:
+    def __init__(self):
+        self._nodes = {}
+        self._values = {}
+        self._versions = {}
+        self._computed_from = {}
+
+    def node(self, *deps):
+        """Register the decorated function as a node reading ``deps`` in order."""
+        def register(func):
+            self._nodes[func.__name__] = (func, deps)
+            return func
+        return register
+
+    def set_inputs(self, **inputs):
+        """Update input nodes, bumping the version of the ones that changed."""
+        for name, value in inputs.items():
+            if name in self._values and _same(self._values[name], value):
+                continue
+            self._values[name] = value
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def _version(self, name):
+        if name in self._nodes:
+            self.get(name)
+        return self._versions[name]
+
+    def get(self, name):
+        if name not in self._nodes:
+            return self._values[name]
+        func, deps = self._nodes[name]
+        dep_versions = tuple(self._version(dep) for dep in deps)
+        if self._computed_from.get(name) != dep_versions:
+            self._values[name] = func(*(self._values[dep] for dep in deps))
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._computed_from[name] = dep_versions
+        return self._values[name]
+
+    __getitem__ = get
@@ -0,0 +1,1080 @@
+"""Vectorized loan calculations used by the Housing Loan Advisor app.
+
+Everything in here is plain NumPy so it can be imported without starting
+Streamlit. Inputs may be scalars or arrays; arrays broadcast against each
+other and the month axis is always appended last.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+
+def annuity_payment(principal, annual_rate, term_years):
+    """Fixed monthly annuity payment; a 0% rate repays the principal linearly."""
+    principal = np.asarray(principal, dtype=float)
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    n = np.asarray(term_years, dtype=float) * 12
+    growth = (1 + r) ** n
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = np.where(r > 0, principal * r * growth / (growth - 1), principal / n)
+    return payment[()]
+
+
+def payment_grid(principal, annual_rate, term_years, outer=False, repayment_type="Annuity"):
+    """Monthly payment and lifetime cost for many loan configurations at once.
+
+    Inputs broadcast against each other, including ``repayment_type`` (a name or
+    an array of names from ``REPAYMENT_TYPES``). With ``outer=True`` three 1-D
+    inputs are expanded into a full ``principal x rate x term`` grid instead.
+    For equal-principal loans ``payment`` is the first, and highest, payment.
+    """
+    if outer:
+        principal, annual_rate, term_years = np.ix_(
+            np.atleast_1d(np.asarray(principal, dtype=float)),
+            np.atleast_1d(np.asarray(annual_rate, dtype=float)),
+            np.atleast_1d(np.asarray(term_years, dtype=float)),
+        )
+    principal = np.asarray(principal, dtype=float)
+    n = np.asarray(term_years, dtype=float) * 12
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    annuity = annuity_payment(principal, annual_rate, term_years)
+    # A fixed installment loan repays exactly like an annuity while the rate does not change
+    equal_principal = np.asarray(repayment_type) == "Equal Principal"
+    payment = np.where(equal_principal, principal / n + principal * r, annuity)
+    total_interest = np.where(equal_principal, principal * r * (n + 1) / 2, annuity * n - principal)
+    return {
+        "payment": payment[()],
+        "total_paid": (principal + total_interest)[()],
+        "total_interest": total_interest[()],
+    }
+
+
+def effective_annual_rate(principal, annual_rate, term_years, upfront_fee=0.0, monthly_fee=0.0,
+                          repayment_type="Annuity", tol=1e-12, max_iter=60):
+    """Effective annual rate (todellinen vuosikorko) of a loan including fees, in percent.
+
+    Solves for the monthly IRR ``i`` at which the payments plus ``monthly_fee``
+    are worth the principal net of ``upfront_fee``, then annualizes it as
+    ``(1 + i)**12 - 1``. Level (annuity and fixed installment) payments are
+    valued in closed form; when any element is equal principal the actual
+    monthly cash flows are discounted instead. All inputs broadcast, including
+    ``repayment_type``; every element takes safeguarded Newton steps at once
+    (falling back to bisection whenever a step would leave the bracket), and
+    iteration stops when the whole batch has converged.
+    """
+    principal, annual_rate, term_years, upfront_fee, monthly_fee = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (principal, annual_rate, term_years, upfront_fee, monthly_fee)))
+    n = np.rint(term_years * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    net_amount = principal - upfront_fee
+    equal_principal = np.broadcast_to(np.asarray(repayment_type) == "Equal Principal", principal.shape)
+
+    if equal_principal.any():
+        # Payments month by month (month axis last), zero after each loan's own term
+        month = np.arange(1, int(n.max()) + 1)
+        loan, rate, n_months = principal[..., None], annual_rate[..., None] / 100 / 12, n[..., None]
+        equal_principal_payment = loan / n_months + rate * loan * (n_months - month + 1) / n_months
+        cash_flows = np.where(month <= n_months,
+                              np.where(equal_principal[..., None], equal_principal_payment, payment[..., None])
+                              + monthly_fee[..., None], 0.0)
+
+        def value_and_slope(i):
+            discount = (1 + i[..., None]) ** -month
+            return ((cash_flows * discount).sum(axis=-1) - net_amount,
+                    -(month * cash_flows * discount).sum(axis=-1) / (1 + i))
+    else:
+        cash_out = payment + monthly_fee
+
+        def value_and_slope(i):
+            discount = (1 + i) ** -n
+            return (cash_out * (1 - discount) / i - net_amount,
+                    cash_out * (n * discount / (1 + i) - (1 - discount) / i) / i)
+
+    # The present value of the payments falls as the rate rises, so the root is bracketed by [0, 100%/month]
+    low = np.zeros(principal.shape)
+    high = np.ones(principal.shape)
+    i = annual_rate / 100 / 12 + 1e-6
+    for _ in range(max_iter):
+        value, slope = value_and_slope(i)
+        low = np.where(value > 0, i, low)
+        high = np.where(value > 0, high, i)
+        newton = i - value / slope
+        next_i = np.where((newton > low) & (newton < high), newton, (low + high) / 2)
+        converged = np.all(np.abs(next_i - i) < tol)
+        i = next_i
+        if converged:
+            break
+    return (((1 + i) ** 12 - 1) * 100)[()]
+
+
+def _check_total_paid(total_paid, principal, total_interest):
+    """Raise if a schedule's payments do not add up to its principal plus interest."""
+    expected = np.asarray(principal, dtype=float) + total_interest
+    if not np.allclose(total_paid, expected, rtol=1e-9, atol=1e-6):
+        gap = np.max(np.abs(np.asarray(total_paid) - expected))
+        raise ValueError(f"Schedule payments miss principal + interest by up to {gap:,.2f}")
+
+
+def _schedule(month, n_months, payment, opening_balance, balance, interest):
+    """Monthly series plus yearly rollups shared by the fixed and variable-rate schedules."""
+    total_months = month.size
+    total_years = -(-total_months // 12)
+    principal_paid = opening_balance - balance
+    payments = interest + principal_paid
+    total_paid = payments.sum(axis=-1)
+    _check_total_paid(total_paid, opening_balance[..., 0], interest.sum(axis=-1))
+
+    # Pad to whole years so the rollups are a reshape + sum
+    pad = total_years * 12 - total_months
+    pad_width = [(0, 0)] * (balance.ndim - 1) + [(0, pad)]
+
+    def by_year(a):
+        return np.pad(a, pad_width).reshape(a.shape[:-1] + (total_years, 12))
+
+    year_end = np.minimum(np.arange(1, total_years + 1) * 12, total_months) - 1
+
+    return {
+        "month": month,
+        "months": n_months,
+        "payment": payment,
+        "payments": payments,
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance,
+        "cumulative_interest": np.cumsum(interest, axis=-1),
+        "total_interest": interest.sum(axis=-1),
+        "total_paid": total_paid,
+        "year": np.arange(1, total_years + 1),
+        "yearly_interest": by_year(interest).sum(axis=-1),
+        "yearly_principal": by_year(principal_paid).sum(axis=-1),
+        "yearly_balance": balance[..., year_end],
+    }
+
+
+def amortization_schedule(principal, annual_rate, term_years):
+    """Full monthly annuity schedule computed in one vectorized pass.
+
+    Returns a dict of arrays with shape ``(..., months)`` for the monthly
+    series (months past the end of a shorter term are zero) and
+    ``(..., years)`` for the yearly rollups.
+    """
+    principal, annual_rate, term_years = np.broadcast_arrays(
+        np.asarray(principal, dtype=float),
+        np.asarray(annual_rate, dtype=float),
+        np.asarray(term_years, dtype=float),
+    )
+    r = annual_rate / 100 / 12
+    n_months = np.rint(term_years * 12).astype(int)
+    total_months = int(n_months.max())
+    payment = np.asarray(annuity_payment(principal, annual_rate, term_years))
+
+    month = np.arange(1, total_months + 1)
+    r_ = r[..., None]
+    growth = (1 + r_) ** month
+    with np.errstate(divide="ignore", invalid="ignore"):
+        paid_off = np.where(r_ > 0, payment[..., None] * (growth - 1) / r_, payment[..., None] * month)
+    balance = principal[..., None] * growth - paid_off
+    active = month <= n_months[..., None]
+    balance = np.where(month < n_months[..., None], np.maximum(balance, 0.0), 0.0)
+
+    opening_balance = np.concatenate([principal[..., None], balance[..., :-1]], axis=-1)
+    interest = np.where(active, opening_balance * r_, 0.0)
+    return _schedule(month, n_months, payment, opening_balance, balance, interest)
+
+
+# Rates are held as integer units of 0.0001 percentage points in the cent engine, so the
+# monthly interest is an exact integer division: cents * rate_units / RATE_DENOMINATOR
+RATE_UNITS_PER_PERCENT = 10000
+RATE_DENOMINATOR = 12 * 100 * RATE_UNITS_PER_PERCENT
+
+
+def _divide_rounded(numerator, denominator, rounding):
+    quotient, remainder = np.divmod(numerator, denominator)
+    if rounding == "half_up":
+        return quotient + (2 * remainder >= denominator)
+    if rounding == "half_even":
+        return quotient + ((2 * remainder > denominator) | ((2 * remainder == denominator) & (quotient % 2 == 1)))
+    if rounding == "down":
+        return quotient
+    raise ValueError(f"Unknown rounding rule: {rounding}")
+
+
+def amortization_schedule_cents(principal, annual_rate, term_years, rounding="half_up"):
+    """Annuity schedule in integer cents, matching a bank statement to the cent.
+
+    The payment is the annuity rounded up to the next cent, each month's interest
+    is rounded with ``rounding`` ("half_up", "half_even" or "down"), and the final
+    payment is adjusted to clear the balance exactly. Rounding makes every month
+    depend on the previous one, so months are stepped through in int64 while all
+    scenarios (broadcast principal / rate / term) advance together. Returns the
+    same keys as ``amortization_schedule`` with all amounts in cents.
+    """
+    principal, annual_rate, term_years = np.broadcast_arrays(
+        np.asarray(principal, dtype=float),
+        np.asarray(annual_rate, dtype=float),
+        np.asarray(term_years, dtype=float),
+    )
+    principal_cents = np.rint(principal * 100).astype(np.int64)
+    rate_units = np.rint(annual_rate * RATE_UNITS_PER_PERCENT).astype(np.int64)
+    n_months = np.rint(term_years * 12).astype(int)
+    total_months = int(n_months.max())
+    # Round before ceil so float noise such as 1055.0000001 cents does not add a cent
+    payment = np.ceil(np.round(np.asarray(annuity_payment(principal, annual_rate, term_years)) * 100, 6)).astype(np.int64)
+
+    opening_balance = np.zeros(principal_cents.shape + (total_months,), dtype=np.int64)
+    interest = np.zeros_like(opening_balance)
+    balance = np.zeros_like(opening_balance)
+    current = principal_cents.copy()
+    for m in range(total_months):
+        active = m < n_months
+        month_interest = np.where(active, _divide_rounded(current * rate_units, RATE_DENOMINATOR, rounding), 0)
+        repaid = np.where(m == n_months - 1, current, np.clip(payment - month_interest, 0, current))
+        repaid = np.where(active, repaid, 0)
+        opening_balance[..., m] = current
+        interest[..., m] = month_interest
+        current = current - repaid
+        balance[..., m] = current
+
+    month = np.arange(1, total_months + 1)
+    return _schedule(month, n_months, payment[()], opening_balance, balance, interest)
+
+
+def repayment_horizon_months(term_years, repayment_type="Annuity", max_extension_years=10):
+    """Longest possible repayment time: fixed installment loans may run past the contract term."""
+    n_months = int(round(term_years * 12))
+    return n_months + max_extension_years * 12 if repayment_type == "Fixed Installment" else n_months
+
+
+def _constant_payment_period(balance, r, payment, months):
+    """Balance after paying ``payment`` for ``months`` at monthly rate ``r``, stopping at payoff.
+
+    Returns the new balance, the interest paid in the period and the number of
+    months (1..months) in which a payment was made.
+    """
+    growth = (1 + r) ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        new_balance = np.where(r > 0, balance * growth - payment * (growth - 1) / r, balance - payment * months)
+        # Month of payoff when the balance would turn negative inside the period
+        payoff = np.where(r > 0, np.log(payment / (payment - r * balance)) / np.log1p(r), balance / payment)
+    paid_off = new_balance <= 1e-9
+    active = np.where(paid_off, np.clip(np.ceil(np.nan_to_num(payoff, nan=months) - 1e-9), 1, months), months)
+    before_last = np.where(r > 0, balance * (1 + r) ** (active - 1) - payment * ((1 + r) ** (active - 1) - 1) / np.where(r > 0, r, 1),
+                           balance - payment * (active - 1))
+    paid = np.where(paid_off, payment * (active - 1) + before_last * (1 + r), payment * months)
+    new_balance = np.where(paid_off, 0.0, new_balance)
+    return new_balance, paid - (balance - new_balance), active
+
+
+def reset_schedule(principal, annual_rates, term_years, reset_months=12, repayment_type="Annuity",
+                   max_extension_years=10):
+    """Reset-level view of a loan whose rate is reset periodically.
+
+    ``annual_rates`` is ``(..., n_resets)`` in percent, the rate in force for
+    each reset period (reference rate + margin); the last rate is held if the
+    loan runs longer. At every reset the payment follows the repayment type:
+
+    - "Annuity": recomputed to repay the remaining balance over the remaining term
+    - "Equal Principal": the same principal every month plus that month's interest
+    - "Fixed Installment": kept at the initial annuity payment so the term floats,
+      up to ``max_extension_years`` past the contract term (raised to cover the
+      interest if a rate rise would otherwise make the balance grow)
+
+    Only the reset periods are looped over; all paths are handled at once, so this
+    is the kernel to use when only per-period figures of many rate paths are needed.
+    Returns ``(..., n_resets)`` arrays of the rate, the payment at the start of the
+    period, the opening balance and the interest of each period, plus the total
+    interest, the total paid, the payoff month and the ``balloon`` of each path:
+    the balance still owed at the horizon, which is due with the last payment.
+    """
+    annual_rates = np.atleast_1d(np.asarray(annual_rates, dtype=float))
+    n_months = int(round(term_years * 12))
+    horizon = repayment_horizon_months(term_years, repayment_type, max_extension_years)
+    n_resets = -(-horizon // reset_months)
+    if annual_rates.shape[-1] < n_resets:
+        pad_width = [(0, 0)] * (annual_rates.ndim - 1) + [(0, n_resets - annual_rates.shape[-1])]
+        annual_rates = np.pad(annual_rates, pad_width, mode="edge")
+    annual_rates = annual_rates[..., :n_resets]
+
+    balance = np.broadcast_to(np.asarray(principal, dtype=float), annual_rates.shape[:-1]).copy()
+    monthly_principal = balance / n_months
+    installment = annuity_payment(balance, annual_rates[..., 0], term_years)
+    payments = np.zeros(annual_rates.shape)
+    opening = np.zeros(annual_rates.shape)
+    interest = np.zeros(annual_rates.shape)
+    total_paid = np.zeros(balance.shape)
+    balloon = np.zeros(balance.shape)
+    payoff_month = np.full(balance.shape, horizon)
+
+    for k in range(n_resets):
+        start = k * reset_months
+        months = min(reset_months, horizon - start)
+        r = annual_rates[..., k] / 100 / 12
+        opening[..., k] = balance
+        if repayment_type == "Equal Principal":
+            repaid = np.minimum(monthly_principal * months, balance)
+            payments[..., k] = np.where(balance > 0, monthly_principal + balance * r, 0.0)
+            interest[..., k] = r * (balance * months - monthly_principal * months * (months - 1) / 2)
+            new_balance = balance - repaid
+        else:
+            if repayment_type == "Fixed Installment":
+                payment = np.where(balance > 0, np.maximum(installment, balance * r * 1.001), 0.0)
+            else:
+                payment = annuity_payment(balance, annual_rates[..., k], (n_months - start) / 12)
+            new_balance, interest[..., k], active = _constant_payment_period(balance, r, payment, months)
+            payments[..., k] = payment
+            newly_paid = (balance > 0) & (new_balance <= 0)
+            payoff_month = np.where(newly_paid & (start + active < payoff_month), start + active, payoff_month)
+        new_balance = np.where(new_balance > 1e-9, new_balance, 0.0)
+        if start + months >= horizon:
+            # Whatever is still owed at the horizon is due with the last payment
+            balloon = new_balance
+            new_balance = np.zeros_like(balance)
+        total_paid += interest[..., k] + balance - new_balance
+        balance = new_balance
+
+    total_interest = interest.sum(axis=-1)
+    _check_total_paid(total_paid, principal, total_interest)
+
+    return {
+        "rate": annual_rates,
+        "payment": payments,
+        "opening_balance": opening,
+        "interest": interest,
+        "total_interest": total_interest,
+        "total_paid": total_paid,
+        "balloon": balloon,
+        "payoff_month": payoff_month.astype(int) if repayment_type == "Fixed Installment" else np.full(balance.shape, n_months),
+        "reset_months": reset_months,
+        "months": horizon,
+    }
+
+
+def variable_rate_schedule(principal, annual_rates, term_years, reset_months=12, repayment_type="Annuity",
+                           max_extension_years=10):
+    """Full monthly schedule of a loan whose rate is reset periodically (reference rate + margin).
+
+    Takes the same inputs as ``reset_schedule`` and returns the same keys as
+    ``amortization_schedule`` plus the monthly ``rate`` and the ``balloon`` due
+    with the last payment, so the two can be used interchangeably. The balances inside each period follow the closed form from
+    that period's opening balance, so the monthly expansion is a single pass.
+    The months after the last path is paid off are dropped, so a fixed
+    installment loan that ends early has no empty trailing years.
+    """
+    resets = reset_schedule(principal, annual_rates, term_years, reset_months, repayment_type, max_extension_years)
+    horizon = int(resets["payoff_month"].max())
+    month = np.arange(1, horizon + 1)
+    period = (month - 1) // reset_months
+    k = month - period * reset_months
+
+    rate = resets["rate"][..., period]
+    payment = resets["payment"][..., period]
+    period_open = resets["opening_balance"][..., period]
+    r = rate / 100 / 12
+    if repayment_type == "Equal Principal":
+        monthly_principal = np.asarray(principal, dtype=float)[..., None] / round(term_years * 12)
+        balance = np.maximum(period_open - monthly_principal * k, 0.0)
+    else:
+        growth = (1 + r) ** k
+        with np.errstate(divide="ignore", invalid="ignore"):
+            paid_off = np.where(r > 0, payment * (growth - 1) / r, payment * k)
+        balance = np.maximum(period_open * growth - paid_off, 0.0)
+    # A balance still owed at the horizon is paid off with the last payment
+    balloon = np.where(balance[..., -1] > 1e-9, balance[..., -1], 0.0)
+    balance[..., -1] = 0.0
+
+    opening_balance = np.concatenate([period_open[..., :1], balance[..., :-1]], axis=-1)
+    interest = opening_balance * r
+    result = _schedule(month, resets["payoff_month"], resets["payment"][..., 0], opening_balance, balance, interest)
+    result["rate"] = rate
+    result["reset_payments"] = resets["payment"]
+    result["balloon"] = balloon
+    return result
+
+
+def repayment_schedule(principal, annual_rate, term_years, repayment_type="Annuity"):
+    """Monthly schedule of any repayment type at a constant rate."""
+    if repayment_type == "Annuity":
+        return amortization_schedule(principal, annual_rate, term_years)
+    n_resets = -(-int(round(term_years * 12)) // 12)
+    rates = np.repeat(np.asarray(annual_rate, dtype=float)[..., None], n_resets, axis=-1)
+    return variable_rate_schedule(principal, rates, term_years, repayment_type=repayment_type)
+
+
+def remaining_balance(principal, annual_rate, term_years, month):
+    """Balance right after the payment of ``month`` (0 = loan start), without building a schedule."""
+    principal = np.asarray(principal, dtype=float)
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    n = np.rint(np.asarray(term_years, dtype=float) * 12)
+    month = np.clip(np.asarray(month, dtype=float), 0, n)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    growth = (1 + r) ** month
+    with np.errstate(divide="ignore", invalid="ignore"):
+        paid_off = np.where(r > 0, payment * (growth - 1) / r, payment * month)
+    balance = np.where(month < n, np.maximum(principal * growth - paid_off, 0.0), 0.0)
+    return balance[()]
+
+
+def cumulative_interest(principal, annual_rate, term_years, month):
+    """Interest paid up to and including ``month``: everything paid minus the principal repaid."""
+    n = np.rint(np.asarray(term_years, dtype=float) * 12)
+    month = np.clip(np.asarray(month, dtype=float), 0, n)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    repaid = np.asarray(principal, dtype=float) - remaining_balance(principal, annual_rate, term_years, month)
+    return (payment * month - repaid)[()]
+
+
+def home_equity(property_value, principal, annual_rate, term_years, month):
+    """Owner's equity at ``month``, assuming a constant property value."""
+    return (np.asarray(property_value, dtype=float) - remaining_balance(principal, annual_rate, term_years, month))[()]
+
+
+def balance_milestone_month(principal, annual_rate, term_years, threshold):
+    """First month the balance is at or below ``threshold``, solved analytically.
+
+    The annuity balance is ``P*g**m - A*(g**m - 1)/r``, so the month follows from a
+    logarithm. Any threshold (half the loan, an LTV limit, a target equity) reduces
+    to a balance threshold; see ``ltv_milestone_month`` and ``equity_milestone_month``.
+    """
+    principal = np.asarray(principal, dtype=float)
+    threshold = np.asarray(threshold, dtype=float)
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    n = np.rint(np.asarray(term_years, dtype=float) * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = np.where(r > 0, payment / r, np.inf)
+        exact = np.where(
+            r > 0,
+            np.log((level - threshold) / (level - principal)) / np.log1p(r),
+            (principal - threshold) / payment,
+        )
+    # Small tolerance so thresholds hit exactly on a payment date are not pushed a month later
+    month = np.ceil(np.nan_to_num(exact, nan=0.0) - 1e-9)
+    month = np.where(threshold >= principal, 0, np.where(threshold <= 0, n, np.clip(month, 0, n)))
+    return month.astype(int)[()]
+
+
+def ltv_milestone_month(principal, annual_rate, term_years, property_value, ltv=60):
+    """First month the loan-to-value falls to ``ltv`` percent or below."""
+    return balance_milestone_month(principal, annual_rate, term_years, np.asarray(property_value) * ltv / 100)
+
+
+def equity_milestone_month(principal, annual_rate, term_years, property_value, target_equity):
+    """First month the owner's equity reaches ``target_equity``."""
+    return balance_milestone_month(principal, annual_rate, term_years,
+                                   np.asarray(property_value, dtype=float) - target_equity)
+
+
+def principal_crossover_month(principal, annual_rate, term_years):
+    """First month in which more of the payment goes to principal than to interest.
+
+    The principal part of an annuity grows geometrically, ``(A - r*P) * g**(m-1)``,
+    so the month where it reaches half the payment has a closed form.
+    """
+    principal = np.asarray(principal, dtype=float)
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    n = np.rint(np.asarray(term_years, dtype=float) * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    first_principal = payment - r * principal
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exact = 1 + np.log(payment / (2 * first_principal)) / np.log1p(r)
+    month = np.where((r > 0) & (first_principal < payment / 2), np.ceil(exact - 1e-9), 1)
+    return np.clip(month, 1, n).astype(int)[()]
+
+
+def first_month_at_or_below(balance, threshold):
+    """Milestone lookup on an already computed, non-increasing balance path via ``searchsorted``.
+
+    Works for any schedule (variable rates, prepayments); returns the 1-based month.
+    """
+    balance = np.asarray(balance, dtype=float)
+    return np.searchsorted(-balance, -np.asarray(threshold, dtype=float), side="left") + 1
+
+
+def payment_holiday_schedule(principal, annual_rate, term_years, holiday_start, holiday_months, extend_term=True):
+    """Annuity schedule with an interest-only window (repayment holiday, lyhennysvapaa).
+
+    From month ``holiday_start`` (1-based) only interest is paid for
+    ``holiday_months`` months; afterwards the remaining balance is re-amortized,
+    either over the original number of remaining payments so the loan ends later
+    (``extend_term=True``, the usual practice) or by the original end date. To keep
+    the end date the holiday is cut short so at least the final month is repaid;
+    ``holiday_months`` in the result is the length actually granted.
+    ``holiday_start`` and ``holiday_months`` broadcast, so a whole grid of holidays
+    is one call; the month axis is appended last and covers the longest scenario.
+    """
+    r = float(annual_rate) / 100 / 12
+    n_months = int(round(term_years * 12))
+    start, length = np.broadcast_arrays(np.clip(np.asarray(holiday_start, dtype=int), 1, n_months),
+                                        np.maximum(np.asarray(holiday_months, dtype=int), 0))
+    payment = float(annuity_payment(principal, annual_rate, term_years))
+
+    def balance_after(balance, monthly_payment, months):
+        growth = (1 + r) ** months
+        annuity_factor = (growth - 1) / r if r > 0 else months
+        return balance * growth - monthly_payment * annuity_factor
+
+    paid_before = start - 1
+    if not extend_term:
+        length = np.minimum(length, n_months - paid_before - 1)
+    holiday_balance = balance_after(principal, payment, paid_before)
+    remaining = n_months - paid_before if extend_term else n_months - paid_before - length
+    payment_after = np.asarray(annuity_payment(holiday_balance, annual_rate, remaining / 12))
+    end = paid_before + length + remaining
+
+    month = np.arange(1, int(end.max()) + 1)
+    start_, length_, end_ = start[..., None], length[..., None], end[..., None]
+    after = np.maximum(month - (paid_before + length)[..., None], 0)
+    balance = np.where(
+        month < start_, balance_after(principal, payment, month),
+        np.where(month < start_ + length_, holiday_balance[..., None],
+                 balance_after(holiday_balance[..., None], payment_after[..., None], after)))
+    balance = np.where(month < end_, np.maximum(balance, 0.0), 0.0)
+
+    opening_balance = np.concatenate([np.broadcast_to(float(principal), balance.shape[:-1] + (1,)), balance[..., :-1]], axis=-1)
+    interest = np.where(month <= end_, opening_balance * r, 0.0)
+    result = _schedule(month, end, payment, opening_balance, balance, interest)
+    result["holiday_months"] = length
+    result["holiday_payment"] = holiday_balance * r
+    result["payment_after"] = payment_after
+    result["extra_interest"] = result["total_interest"] - (payment * n_months - principal)
+    return result
+
+
+def refinance_analysis(principal, annual_rate, term_years, new_rate, fees=0.0):
+    """Refinancing at every month of the term evaluated at once.
+
+    Refinancing after ``month`` payments (0 = right away) replaces the remaining
+    balance with a new annuity at ``new_rate`` over the same remaining term and
+    costs ``fees`` up front. Returns arrays over the refinance month of the
+    balance, old and new payment, the fee break-even time in months (inf when the
+    new payment is not lower) and the net savings over the rest of the loan.
+    """
+    n_months = int(round(term_years * 12))
+    month = np.arange(n_months)
+    remaining = n_months - month
+    payment = float(annuity_payment(principal, annual_rate, term_years))
+    balance = remaining_balance(principal, annual_rate, term_years, month)
+    new_payment = annuity_payment(balance, new_rate, remaining / 12)
+    monthly_saving = payment - new_payment
+    with np.errstate(divide="ignore"):
+        break_even = np.where(monthly_saving > 0, np.ceil(fees / monthly_saving), np.inf)
+    net_savings = monthly_saving * remaining - fees
+    return {
+        "month": month,
+        "balance": balance,
+        "payment": payment,
+        "new_payment": new_payment,
+        "monthly_saving": monthly_saving,
+        "break_even_months": np.where(break_even <= remaining, break_even, np.inf),
+        "net_savings": net_savings,
+        # Last refinance month that still pays for its fees (-1 when none does)
+        "last_worthwhile_month": int(month[net_savings > 0].max()) if (net_savings > 0).any() else -1,
+    }
+
+
+def prepayment_schedule(principal, annual_rate, term_years, extra_monthly=0, lump_sums=None):
+    """Exact effect of paying extra on a fixed-rate annuity, for many extra amounts at once.
+
+    The regular payment stays the same and every extra euro goes to principal,
+    so the loan ends early. ``extra_monthly`` may be an array (the month axis is
+    appended last); ``lump_sums`` maps a month number to a one-off amount. The
+    balance follows the closed form, and the months after payoff are masked out.
+    """
+    extra_monthly = np.asarray(extra_monthly, dtype=float)
+    r = float(annual_rate) / 100 / 12
+    n_months = int(round(term_years * 12))
+    payment = float(annuity_payment(principal, annual_rate, term_years))
+
+    month = np.arange(1, n_months + 1)
+    growth = (1 + r) ** month
+    annuity_factor = (growth - 1) / r if r > 0 else month.astype(float)
+    balance = principal * growth - (payment + extra_monthly[..., None]) * annuity_factor
+    for lump_month, amount in (lump_sums or {}).items():
+        if 1 <= lump_month <= n_months:
+            later = month >= lump_month
+            balance[..., later] -= amount * (1 + r) ** (month[later] - lump_month)
+
+    # Payoff is the first month the balance reaches zero; the final payment only clears what is left
+    paid_off = balance <= 1e-6
+    paid_off[..., -1] = True
+    payoff_month = np.argmax(paid_off, axis=-1) + 1
+    balance = np.maximum(balance, 0.0)
+    opening_balance = np.concatenate([np.broadcast_to(float(principal), balance.shape[:-1] + (1,)), balance[..., :-1]], axis=-1)
+    interest = np.where(month <= payoff_month[..., None], opening_balance * r, 0.0)
+    total_interest = interest.sum(axis=-1)
+    base_interest = payment * n_months - principal
+
+    return {
+        "extra_monthly": extra_monthly,
+        "payment": payment,
+        "balance": balance,
+        "interest": interest,
+        "payoff_month": payoff_month,
+        "months_saved": n_months - payoff_month,
+        "total_interest": total_interest,
+        "interest_saved": base_interest - total_interest,
+    }
+
+
+FinancialProfile = namedtuple("FinancialProfile", [
+    "monthly_payment",
+    "loan_to_value",
+    "debt_to_income",
+    "disposable_income",
+    "asset_to_loan_ratio",
+    "total_monthly_housing_cost",
+    "total_housing_ratio",
+    "risk_score",
+    "risk_category",
+])
+
+
+RISK_CATEGORIES = ("Low Risk", "Moderate Risk", "High Risk")
+RISK_THRESHOLDS = (20, 35)
+
+
+def risk_category(risk_score):
+    return RISK_CATEGORIES[int(np.searchsorted(RISK_THRESHOLDS, risk_score, side="right"))]
+
+
+def financial_metrics(monthly_income, monthly_expenses, other_loans, other_assets,
+                      loan_amount, down_payment, loan_term, interest_rate,
+                      monthly_maintenance=0, renovation_cost_monthly=0):
+    """The ``FinancialProfile`` metrics for arrays of applicants, as a dict of arrays.
+
+    ``risk_category`` is returned as an index into ``RISK_CATEGORIES``.
+    """
+    monthly_income = np.asarray(monthly_income, dtype=float)
+    loan_amount = np.asarray(loan_amount, dtype=float)
+    monthly_payment = np.asarray(annuity_payment(loan_amount, interest_rate, loan_term))
+    loan_to_value = (loan_amount / (loan_amount + down_payment)) * 100
+    debt_to_income = ((monthly_payment + other_loans) / monthly_income) * 100
+    disposable_income = monthly_income - monthly_expenses - monthly_payment - other_loans
+    asset_to_loan_ratio = (np.asarray(other_assets, dtype=float) / loan_amount) * 100
+    total_monthly_housing_cost = monthly_payment + monthly_maintenance + renovation_cost_monthly
+    total_housing_ratio = (total_monthly_housing_cost / monthly_income) * 100
+    risk_score = (debt_to_income * 0.4 + loan_to_value * 0.4
+                  - (disposable_income / monthly_income) * 20 - (asset_to_loan_ratio * 0.1))
+    return {
+        "monthly_payment": monthly_payment,
+        "loan_to_value": loan_to_value,
+        "debt_to_income": debt_to_income,
+        "disposable_income": disposable_income,
+        "asset_to_loan_ratio": asset_to_loan_ratio,
+        "total_monthly_housing_cost": total_monthly_housing_cost,
+        "total_housing_ratio": total_housing_ratio,
+        "risk_score": risk_score,
+        "risk_category": np.searchsorted(RISK_THRESHOLDS, risk_score, side="right"),
+    }
+
+
+def financial_profile(monthly_income, monthly_expenses, other_loans, other_assets,
+                      loan_amount, down_payment, loan_term, interest_rate,
+                      monthly_maintenance=0, renovation_cost_monthly=0):
+    """Derived metrics shown across the app, as an immutable record."""
+    metrics = financial_metrics(monthly_income, monthly_expenses, other_loans, other_assets,
+                                loan_amount, down_payment, loan_term, interest_rate,
+                                monthly_maintenance, renovation_cost_monthly)
+    values = {key: float(value) for key, value in metrics.items() if key != "risk_category"}
+    return FinancialProfile(**values, risk_category=risk_category(values["risk_score"]))
+
+
+# Repayment types offered by Finnish banks: annuity (annuiteetti), equal principal
+# (tasalyhennys) and fixed installment (kiinteä tasaerä, where the term floats)
+REPAYMENT_TYPES = ("Annuity", "Equal Principal", "Fixed Installment")
+
+# The recommender prices every structure at today's rate, where a fixed installment loan
+# is identical to an annuity, so it searches only the types that actually differ
+RECOMMENDER_REPAYMENT_TYPES = ("Annuity", "Equal Principal")
+
+# LTV-based rate tiers: a lower loan-to-value earns a margin discount on the base rate
+RATE_TIERS = [
+    {"name": "Premium", "max_ltv": 75, "rate_adjustment": -0.30},
+    {"name": "Preferred", "max_ltv": 80, "rate_adjustment": -0.15},
+    {"name": "Standard", "max_ltv": 85, "rate_adjustment": 0.0},
+    {"name": "High LTV", "max_ltv": 95, "rate_adjustment": 0.25},
+]
+
+# Approval tiers from strictest to most lenient, as described in the recommender. Credit
+# history is an index into CREDIT_RATINGS
+CREDIT_RATINGS = ("Weak", "Average", "Good", "Excellent")
+
+APPROVAL_TIERS = {
+    "Very High (95%+)": {"max_dti": 35, "max_ltv": 80, "min_credit": 3},
+    "High (80-95%)": {"max_dti": 40, "max_ltv": 85, "min_credit": 2},
+    "Moderate (65-80%)": {"max_dti": 45, "max_ltv": 90, "min_credit": 1},
+    "Flexible": {"max_dti": np.inf, "max_ltv": 95, "min_credit": 0},
+}
+
+# What each tier limit checks: the metric it reads, the comparison that must hold and how a
+# failure reads to the user
+APPROVAL_RULES = {
+    "max_dti": ("dti_ratio", np.less_equal, "Debt-to-income {value:.1f}% is above the {limit:g}% limit"),
+    "max_ltv": ("ltv_ratio", np.less_equal, "Loan-to-value {value:.1f}% is above the {limit:g}% limit"),
+    "min_credit": ("credit_rating", np.greater_equal, "{value} credit history is below the required {limit}"),
+}
+
+
+def compile_approval_rules(tiers=APPROVAL_TIERS, rules=APPROVAL_RULES):
+    """Compile the tier limits into one vectorized predicate per rule.
+
+    Returns a function taking a dict of metric arrays (any broadcastable
+    shapes) and returning ``passed`` with shape ``(..., tiers, rules)``, the
+    ``approval_rank`` of the strictest tier every rule passes
+    (``len(tiers)`` = none) and the rule names. Rules whose metric is not
+    supplied, such as credit history for a loan structure on its own, are not
+    assessed and count as passed.
+    """
+    names = list(rules)
+    thresholds = np.array([[limits[name] for name in names] for limits in tiers.values()], dtype=float)
+
+    def check(metrics):
+        columns = []
+        for k, name in enumerate(names):
+            metric, compare, _ = rules[name]
+            if metric in metrics:
+                columns.append(compare(np.asarray(metrics[metric], dtype=float)[..., None], thresholds[:, k]))
+            else:
+                columns.append(np.ones(len(tiers), dtype=bool))
+        passed = np.stack(np.broadcast_arrays(*columns), axis=-1)
+        tier_passed = passed.all(axis=-1)
+        return {
+            "rules": names,
+            "passed": passed,
+            "approval_rank": np.where(tier_passed.any(axis=-1), np.argmax(tier_passed, axis=-1), len(tiers)),
+        }
+
+    return check
+
+
+check_approval = compile_approval_rules()
+
+
+def explain_approval(metrics, tier):
+    """Failed rules of one approval tier for a single applicant or structure, as sentences."""
+    limits = APPROVAL_TIERS[tier]
+    reasons = []
+    for name, (metric, compare, message) in APPROVAL_RULES.items():
+        if metric not in metrics or compare(metrics[metric], limits[name]):
+            continue
+        value, limit = metrics[metric], limits[name]
+        if metric == "credit_rating":
+            value, limit = CREDIT_RATINGS[int(value)], CREDIT_RATINGS[int(limit)].lower()
+        reasons.append(message.format(value=value, limit=limit))
+    return reasons
+
+
+def evaluate_loan_structures(price, down_payment, term_years, base_rate, monthly_income, other_monthly_debt=0,
+                             repayment_types=RECOMMENDER_REPAYMENT_TYPES, credit_rating=None):
+    """Payment, cost and approval metrics for every (down payment, term, repayment type, rate tier) combination.
+
+    ``down_payment``, ``term_years`` and ``repayment_types`` are 1-D; the result
+    arrays have shape ``(down payments, terms, repayment types, rate tiers)``.
+    Affordability is judged on the first payment, the highest for equal principal.
+    ``approval_rank`` comes from ``check_approval``; credit history is only
+    assessed when ``credit_rating`` is given.
+    """
+    down = np.asarray(down_payment, dtype=float)[:, None, None, None]
+    term = np.asarray(term_years, dtype=float)[None, :, None, None]
+    repayment = np.asarray(repayment_types)[None, None, :, None]
+    tier_max_ltv = np.array([tier["max_ltv"] for tier in RATE_TIERS], dtype=float)
+    tier_rate = base_rate + np.array([tier["rate_adjustment"] for tier in RATE_TIERS])
+
+    loan = price - down
+    ltv = loan / price * 100
+    costs = payment_grid(loan, tier_rate, term, repayment_type=repayment)
+    dti = (costs["payment"] + other_monthly_debt) / monthly_income * 100
+
+    shape = np.broadcast(down, term, repayment, tier_rate).shape
+    approval_metrics = {"dti_ratio": dti, "ltv_ratio": ltv}
+    if credit_rating is not None:
+        approval_metrics["credit_rating"] = credit_rating
+    approval_rank = np.broadcast_to(check_approval(approval_metrics)["approval_rank"], shape)
+
+    return {
+        "down_payment": np.broadcast_to(down, shape),
+        "loan_amount": np.broadcast_to(loan, shape),
+        "term": np.broadcast_to(term, shape),
+        "repayment_type": np.broadcast_to(repayment, shape),
+        "rate": np.broadcast_to(tier_rate, shape),
+        "rate_tier_ok": np.broadcast_to(ltv <= tier_max_ltv, shape),
+        "ltv_ratio": np.broadcast_to(ltv, shape),
+        "monthly": costs["payment"],
+        "total_interest": costs["total_interest"],
+        "dti_ratio": dti,
+        "approval_rank": approval_rank,
+    }
+
+
+def _feasible(candidates, max_monthly, target_rank, max_ltv):
+    # A down payment of the whole price leaves no loan to structure
+    return ((candidates["loan_amount"] > 0)
+            & candidates["rate_tier_ok"]
+            & (candidates["monthly"] <= max_monthly)
+            & (candidates["ltv_ratio"] <= max_ltv)
+            & (candidates["approval_rank"] <= target_rank))
+
+
+def _structure_scores(candidates, feasible, payment_priority, risk_tolerance, ranges):
+    # Priority 1 weighs the monthly payment only, 5 the total interest only; risk tolerance
+    # 1 is happy to put all available cash down, 5 wants to keep as much cash as possible
+    interest_weight = (payment_priority - 1) / 4
+    cash_weight = (risk_tolerance - 1) / 4
+
+    def scaled(key):
+        low, high = ranges[key]
+        return (candidates[key] - low) / (high - low) if high > low else 0.0
+
+    score = ((1 - interest_weight) * scaled("monthly")
+             + interest_weight * scaled("total_interest")
+             + cash_weight * scaled("down_payment"))
+    return np.where(feasible, score, np.inf)
+
+
+def optimize_loan_structure(price, available_cash, base_rate, monthly_income, max_monthly,
+                            target_approval="Flexible", payment_priority=3, risk_tolerance=3,
+                            other_monthly_debt=0, terms=range(10, 31), max_ltv=95,
+                            repayment_types=RECOMMENDER_REPAYMENT_TYPES, credit_rating=None):
+    """Best down payment, term, repayment type and rate tier for the user's priorities and constraints.
+
+    The score is linear in the down payment for a given term, repayment type
+    and rate tier, so the best structure lies at an end of the cash range or
+    where a constraint starts to bind: a rate or approval tier's LTV limit, or
+    the payment cap. Those down payments are evaluated exactly, together with
+    an even grid that sets the scale of each criterion, in one batch.
+
+    Returns ``None`` when nothing is feasible, and a result with
+    ``loan_needed`` False (no loan to structure) when the cash covers the
+    whole price.
+    """
+    if available_cash >= price:
+        return {"loan_needed": False, "down_payment": float(price), "loan_amount": 0.0,
+                "cash_left": float(available_cash - price)}
+    terms = np.asarray(terms, dtype=float)
+    min_down = price * (1 - max_ltv / 100)
+    if available_cash < min_down:
+        return None
+    target_rank = list(APPROVAL_TIERS).index(target_approval)
+
+    # Largest loan each (term, repayment type, rate tier) can carry within the payment cap; the
+    # target tier's DTI limit is the same cap expressed on income
+    payment_cap = min(max_monthly, APPROVAL_TIERS[target_approval]["max_dti"] / 100 * monthly_income - other_monthly_debt)
+    tier_rate = base_rate + np.array([tier["rate_adjustment"] for tier in RATE_TIERS])
+    per_euro = payment_grid(1.0, tier_rate, terms[:, None, None],
+                            repayment_type=np.asarray(repayment_types)[None, :, None])["payment"]
+    ltv_limits = np.array([tier["max_ltv"] for tier in RATE_TIERS]
+                          + [tier["max_ltv"] for tier in APPROVAL_TIERS.values()], dtype=float)
+    # Rounded up to whole euros so every corner is on the feasible side of its limit
+    corners = np.ceil(np.concatenate([price * (1 - ltv_limits / 100), price - payment_cap / per_euro.ravel()]))
+    corners = corners[(corners > min_down) & (corners < available_cash)]
+    down_payments = np.unique(np.concatenate([np.linspace(min_down, available_cash, 60), corners]))
+
+    candidates = evaluate_loan_structures(price, down_payments, terms, base_rate,
+                                          monthly_income, other_monthly_debt, repayment_types, credit_rating)
+    feasible = _feasible(candidates, max_monthly, target_rank, max_ltv)
+    if not feasible.any():
+        return None
+    ranges = {key: (candidates[key][feasible].min(), candidates[key][feasible].max())
+              for key in ("monthly", "total_interest", "down_payment")}
+    score = _structure_scores(candidates, feasible, payment_priority, risk_tolerance, ranges)
+    best = np.unravel_index(np.argmin(score), score.shape)
+
+    return {
+        "loan_needed": True,
+        "down_payment": float(candidates["down_payment"][best]),
+        "loan_amount": float(candidates["loan_amount"][best]),
+        "term": int(candidates["term"][best]),
+        "repayment_type": str(candidates["repayment_type"][best]),
+        "rate": float(candidates["rate"][best]),
+        "rate_tier": RATE_TIERS[best[3]]["name"],
+        "monthly": float(candidates["monthly"][best]),
+        "total_interest": float(candidates["total_interest"][best]),
+        "ltv_ratio": float(candidates["ltv_ratio"][best]),
+        "dti_ratio": float(candidates["dti_ratio"][best]),
+        "approval_rank": int(candidates["approval_rank"][best]),
+        "approval_odds": list(APPROVAL_TIERS)[int(candidates["approval_rank"][best])],
+    }
+
+
+# Regulatory stress test: FIN-FSA recommends checking that the loan can still be serviced at a
+# 6% rate with a repayment period of at most 25 years. Loan service costs are compared with net
+# income at each cap; 60% is the regulatory ceiling, the stricter 50% is what the affordability
+# solver and recommender plan with
+STRESS_RATE = 6.0
+STRESS_TERM_YEARS = 25
+STRESS_CAPS = (50, 60)
+STRESS_MAX_DTI = 50
+
+AFFORDABILITY_CONSTRAINTS = ("Monthly payment", "Debt-to-income", "Stress test", "Loan-to-value")
+
+
+def _annuity_factor(annual_rate, term_years):
+    # Loan amount repaid by a payment of 1 per month
+    r = np.asarray(annual_rate, dtype=float) / 100 / 12
+    n = np.asarray(term_years, dtype=float) * 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(r > 0, (1 - (1 + r) ** -n) / r, n)
+
+
+def max_affordable_loan(monthly_income, available_cash, annual_rate, term_years, max_monthly=np.inf,
+                        max_dti=np.inf, max_ltv=95, other_monthly_debt=0, stress_rate=STRESS_RATE,
+                        stress_max_dti=STRESS_MAX_DTI, stress_term_years=STRESS_TERM_YEARS):
+    """Largest loan and purchase price the constraints allow, by inverting the annuity formula.
+
+    Each constraint caps the payment (or, for LTV, the loan) directly, so the
+    maximum loan is the smallest of the closed-form caps; ``annual_rate`` and
+    ``term_years`` broadcast, e.g. a column of terms against a row of rate
+    scenarios. ``binding`` indexes ``AFFORDABILITY_CONSTRAINTS``. The required
+    down payment is the least cash that keeps the maximum loan within ``max_ltv``.
+    """
+    payment_cap = np.minimum(max_monthly, max_dti / 100 * monthly_income - other_monthly_debt)
+    caps = np.stack(np.broadcast_arrays(
+        max_monthly * _annuity_factor(annual_rate, term_years),
+        (max_dti / 100 * monthly_income - other_monthly_debt) * _annuity_factor(annual_rate, term_years),
+        (stress_max_dti / 100 * monthly_income - other_monthly_debt)
+        * _annuity_factor(stress_rate, np.minimum(term_years, stress_term_years)),
+        np.full(np.shape(_annuity_factor(annual_rate, term_years)), available_cash * max_ltv / (100 - max_ltv)),
+    ))
+    max_loan = np.maximum(caps.min(axis=0), 0.0)
+    return {
+        "max_loan": max_loan,
+        "max_price": max_loan + available_cash,
+        "required_down_payment": max_loan * (100 - max_ltv) / max_ltv,
+        "max_payment": np.minimum(payment_cap, max_loan / _annuity_factor(annual_rate, term_years)),
+        "binding": caps.argmin(axis=0),
+    }
+
+
+def stress_test(monthly_income, loan_amount, term_years, other_monthly_debt=0, stress_rate=STRESS_RATE,
+                stress_term_years=STRESS_TERM_YEARS, caps=STRESS_CAPS):
+    """Loan service costs at a stressed rate against one or more caps on net income.
+
+    The housing loan is repaid at ``stress_rate`` over its own term, but no longer
+    than ``stress_term_years``. Inputs broadcast, so a single session, a term grid
+    or thousands of applicant profiles are all one call; the cap axis is
+    appended last. ``margin`` is the distance to each cap in percentage points
+    (negative means fail), ``headroom`` the same in euros per month.
+    """
+    monthly_income = np.asarray(monthly_income, dtype=float)
+    stress_term = np.minimum(np.asarray(term_years, dtype=float), stress_term_years)
+    stressed_payment = np.asarray(annuity_payment(loan_amount, stress_rate, stress_term))
+    service_cost = stressed_payment + np.asarray(other_monthly_debt, dtype=float)
+    stressed_ratio = service_cost / monthly_income * 100
+    caps = np.asarray(caps, dtype=float)
+    margin = caps - stressed_ratio[..., None]
+    return {
+        "caps": caps,
+        "stressed_payment": stressed_payment,
+        "stressed_ratio": stressed_ratio,
+        "margin": margin,
+        "passes": margin >= 0,
+        "headroom": caps / 100 * monthly_income[..., None] - service_cost[..., None],
+    }
+
+
+# How much a euro cut from a discretionary budget category hurts, by the category's priority
+BUDGET_PRIORITY_WEIGHTS = {"Low": 1.0, "Medium": 2.0, "High": 4.0}
+
+
+def budget_cuts(shortfall, budget, floor=0, weight=1):
+    """Least painful way to free ``shortfall`` euros a month from discretionary budget categories.
+
+    Minimizes the weighted sum of the cuts, cutting no category below its
+    ``floor``. This LP is a fractional knapsack, so cutting the lowest-weight
+    categories first is optimal; categories of equal weight give up the same
+    share of their room. ``shortfall`` may be an array, e.g. one per rate
+    scenario, and the category axis is appended last. ``uncovered`` is what no
+    combination of cuts can free.
+    """
+    shortfall = np.maximum(np.asarray(shortfall, dtype=float), 0.0)
+    budget = np.asarray(budget, dtype=float)
+    room = np.maximum(budget - floor, 0.0)
+    weight = np.broadcast_to(np.asarray(weight, dtype=float), budget.shape)
+    levels, group = np.unique(weight, return_inverse=True)
+    group_room = np.bincount(group, weights=room, minlength=len(levels))
+    room_before = np.cumsum(group_room) - group_room
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where(group_room > 0, np.clip((shortfall[..., None] - room_before) / group_room, 0, 1), 0.0)
+    cuts = share[..., group] * room
+    return {
+        "cuts": cuts,
+        "remaining_budget": budget - cuts,
+        "uncovered": np.maximum(shortfall - room.sum(), 0.0),
+        "cost": cuts @ weight,
+    }
+
+
+def pareto_mask(objectives):
+    """Boolean mask of the non-dominated rows of an ``(n, 3)`` array, all minimized.
+
+    Rows are swept in order of the first objective. Each group sharing a value
+    is checked against a 2-D staircase of the earlier groups with one
+    ``searchsorted``, so the cost grows with the number of distinct first-objective
+    values rather than with the number of row pairs. Exact duplicates keep one row.
+    """
+    objectives = np.asarray(objectives, dtype=float)
+    order = np.lexsort((objectives[:, 2], objectives[:, 1], objectives[:, 0]))
+    first, second, third = objectives[order].T
+    keep = np.zeros(len(order), dtype=bool)
+    stair_second = np.empty(0)
+    stair_third = np.empty(0)
+
+    level_starts = np.flatnonzero(np.r_[True, first[1:] != first[:-1]])
+    for start, stop in zip(level_starts, np.r_[level_starts[1:], len(order)]):
+        b, c = second[start:stop], third[start:stop]
+        # Dominated by an earlier level: some staircase point is no worse in both
+        dominated = np.zeros(len(b), dtype=bool)
+        if len(stair_second):
+            idx = np.searchsorted(stair_second, b, side="right") - 1
+            dominated = (idx >= 0) & (stair_third[np.maximum(idx, 0)] <= c)
+        # Dominated within the level: an earlier row (smaller or equal b) has c no larger
+        dominated[1:] |= np.minimum.accumulate(c)[:-1] <= c[1:]
+        keep[start:stop] = ~dominated
+
+        merged_b = np.concatenate([stair_second, b[~dominated]])
+        merged_c = np.concatenate([stair_third, c[~dominated]])
+        merged = np.lexsort((merged_c, merged_b))
+        merged_b, merged_c = merged_b[merged], merged_c[merged]
+        on_stair = np.ones(len(merged_c), dtype=bool)
+        on_stair[1:] = merged_c[1:] < np.minimum.accumulate(merged_c)[:-1]
+        stair_second, stair_third = merged_b[on_stair], merged_c[on_stair]
+
+    mask = np.zeros(len(order), dtype=bool)
+    mask[order] = keep
+    return mask
+
+
+def loan_structure_frontier(price, available_cash, base_rate, monthly_income, max_monthly,
+                            target_approval="Flexible", other_monthly_debt=0,
+                            terms=range(10, 31), max_ltv=95, down_payment_steps=1000,
+                            repayment_types=RECOMMENDER_REPAYMENT_TYPES, credit_rating=None):
+    """Pareto frontier of monthly payment vs total interest vs cash needed upfront.
+
+    All (down payment, term, repayment type, rate tier) candidates are evaluated
+    in one batch. For each down payment, term and repayment type only the cheapest
+    eligible rate tier can be on the frontier, so the others are pruned before
+    the dominance filter.
+    """
+    min_down = price * (1 - max_ltv / 100)
+    if available_cash < min_down:
+        return None
+    target_rank = list(APPROVAL_TIERS).index(target_approval)
+    down_payments = np.round(np.linspace(min_down, min(available_cash, price), down_payment_steps), -1)
+    candidates = evaluate_loan_structures(price, down_payments, np.asarray(terms, dtype=float),
+                                          base_rate, monthly_income, other_monthly_debt, repayment_types, credit_rating)
+    feasible = _feasible(candidates, max_monthly, target_rank, max_ltv)
+
+    # Rate tiers are ordered cheapest first, so the first feasible tier is the best one
+    best_tier = np.argmax(feasible, axis=-1)[..., None]
+    has_feasible = feasible.any(axis=-1)
+    pruned = {key: np.take_along_axis(np.broadcast_to(value, feasible.shape), best_tier, axis=-1)[..., 0][has_feasible]
+              for key, value in candidates.items() if key != "rate_tier_ok"}
+    if not has_feasible.any():
+        return None
+    pruned["rate_tier"] = np.array([tier["name"] for tier in RATE_TIERS])[best_tier[..., 0][has_feasible]]
+
+    # Sweep on the down payment: it only takes ``down_payment_steps`` distinct values
+    on_frontier = pareto_mask(np.column_stack([pruned["down_payment"], pruned["monthly"], pruned["total_interest"]]))
+    frontier = {key: value[on_frontier] for key, value in pruned.items()}
+    frontier["candidates"] = feasible.size
+    return frontier
@@ -0,0 +1,386 @@
+"""Monte Carlo risk simulations for the Financial Risk Simulator.
+
+Like loan_engine this is plain NumPy and importable without Streamlit, which
+also lets large simulations fan out to a process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from loan_engine import annuity_payment, remaining_balance, repayment_horizon_months, reset_schedule
+
+# Paths are always simulated in chunks of this size, each with its own child seed,
+# so results are identical whether the chunks run serially or in a process pool
+CHUNK_PATHS = 25000
+
+# Rate shocks per stress matrix chunk
+CHUNK_SHOCKS = 50
+
+# Households per lifetime simulation chunk: every chunk holds a few (households, months) arrays
+CHUNK_HOUSEHOLDS = 5000
+
+
+def simulate_reference_rates(n_paths, n_resets, start_rate, long_run_rate=2.5, reversion_speed=0.15,
+                             volatility=1.0, reset_years=1.0, floor=0.0, seed=None):
+    """Mean-reverting (Vasicek) reference rate paths, sampled at the reset dates.
+
+    Uses the exact AR(1) discretization of the Ornstein-Uhlenbeck process, so the
+    step size can be a whole reset period. Returns ``(n_paths, n_resets)`` in
+    percent, with the first column equal to ``start_rate``.
+    """
+    rng = np.random.default_rng(seed)
+    phi = np.exp(-reversion_speed * reset_years)
+    if reversion_speed > 0:
+        step_std = volatility * np.sqrt((1 - phi ** 2) / (2 * reversion_speed))
+    else:
+        step_std = volatility * np.sqrt(reset_years)
+    shocks = rng.standard_normal((n_paths, n_resets - 1)) * step_std
+
+    rates = np.empty((n_paths, n_resets))
+    rates[:, 0] = start_rate
+    for k in range(1, n_resets):
+        rates[:, k] = long_run_rate + (rates[:, k - 1] - long_run_rate) * phi + shocks[:, k - 1]
+    return np.maximum(rates, floor)
+
+
+def expected_reference_rates(n_resets, start_rate, long_run_rate=2.5, reversion_speed=0.15, reset_years=1.0):
+    """Mean path of ``simulate_reference_rates``: the start rate decaying toward the long-run level."""
+    phi = np.exp(-reversion_speed * reset_years)
+    return long_run_rate + (start_rate - long_run_rate) * phi ** np.arange(n_resets)
+
+
+def _simulate_chunk(args):
+    n_paths, seed, principal, term_years, margin, repayment_type, rate_params = args
+    n_resets = -(-repayment_horizon_months(term_years, repayment_type) // 12)
+    reference = simulate_reference_rates(n_paths, n_resets, seed=seed, **rate_params)
+    result = reset_schedule(principal, reference + margin, term_years, repayment_type=repayment_type)
+    return reference, result["payment"], result["total_interest"], result["payoff_month"]
+
+
+def simulate_rate_risk(principal, term_years, monthly_income, start_reference_rate, margin,
+                       long_run_rate=2.5, reversion_speed=0.15, volatility=1.0,
+                       n_paths=10000, seed=42, processes=None, repayment_type="Annuity",
+                       percentiles=(5, 25, 50, 75, 95)):
+    """Monte Carlo of a variable-rate loan of any repayment type with 12-month resets.
+
+    Returns percentile bands (rows follow ``percentiles``) of the monthly
+    payment and payment-to-income ratio per loan year, the payment along the
+    expected rate path and at today's rate, and the distribution of total
+    interest and payoff year. ``processes`` > 1 spreads the path chunks over a
+    process pool.
+    """
+    rate_params = {
+        "start_rate": start_reference_rate,
+        "long_run_rate": long_run_rate,
+        "reversion_speed": reversion_speed,
+        "volatility": volatility,
+    }
+    chunk_sizes = [min(CHUNK_PATHS, n_paths - start) for start in range(0, n_paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    jobs = [(size, child, principal, term_years, margin, repayment_type, rate_params)
+            for size, child in zip(chunk_sizes, seeds)]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_simulate_chunk, jobs))
+    else:
+        chunks = [_simulate_chunk(job) for job in jobs]
+
+    reference = np.concatenate([chunk[0] for chunk in chunks])
+    payments = np.concatenate([chunk[1] for chunk in chunks])
+    total_interest = np.concatenate([chunk[2] for chunk in chunks])
+    payoff_year = -(-np.concatenate([chunk[3] for chunk in chunks]) // 12)
+    dti = payments / monthly_income * 100
+    expected = expected_reference_rates(payments.shape[1], start_reference_rate, long_run_rate, reversion_speed)
+    fixed = reset_schedule(principal, np.full(payments.shape[1], start_reference_rate + margin), term_years,
+                           repayment_type=repayment_type)
+
+    return {
+        "year": np.arange(1, payments.shape[1] + 1),
+        "percentiles": np.asarray(percentiles),
+        "rate_bands": np.percentile(reference + margin, percentiles, axis=0),
+        "payment_bands": np.percentile(payments, percentiles, axis=0),
+        "expected_payment": reset_schedule(principal, expected + margin, term_years, repayment_type=repayment_type)["payment"],
+        "fixed_payment": fixed["payment"],
+        "fixed_total_interest": float(fixed["total_interest"]),
+        "dti_bands": np.percentile(dti, percentiles, axis=0),
+        "total_interest_bands": np.percentile(total_interest, percentiles),
+        "payoff_year_bands": np.percentile(payoff_year, percentiles),
+        "peak_dti": dti.max(axis=1),
+        "total_interest": total_interest,
+        "n_paths": n_paths,
+    }
+
+
+def _stress_chunk(args):
+    (principal, annual_rate, term_years, monthly_income, monthly_expenses, housing_costs, savings,
+     income_change, expense_change, event_rate_change, rate_shocks, durations) = args
+    # Axes: (events, rate shocks, durations)
+    income = monthly_income * (1 + income_change[:, None] / 100)
+    expenses = monthly_expenses * (1 + expense_change[:, None] / 100)
+    payment = annuity_payment(principal, annual_rate + event_rate_change[:, None] + rate_shocks, term_years)
+    leftover = income - expenses - payment - housing_costs
+    with np.errstate(divide="ignore", invalid="ignore"):
+        months_covered = np.where(leftover < 0, savings / -leftover, np.inf)
+    return {
+        "payment": payment,
+        "leftover": leftover,
+        "dti": payment / income * 100,
+        "savings_left": savings + leftover[..., None] * durations,
+        "months_covered": months_covered,
+    }
+
+
+def iter_stress_matrix(principal, annual_rate, term_years, monthly_income, monthly_expenses, events,
+                       rate_shocks, durations, housing_costs=0, savings=0, processes=None):
+    """Yield ``(shock_slice, results)`` for the stress matrix chunk by chunk, as each one completes.
+
+    The rate shock axis is split into chunks of ``CHUNK_SHOCKS``; with
+    ``processes`` > 1 they run in a process pool and arrive in completion order.
+    """
+    rate_shocks = np.asarray(rate_shocks, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    event_arrays = tuple(np.array([event.get(key, 0) for event in events], dtype=float)
+                         for key in ("income_change", "expense_change", "rate_change"))
+    slices = [slice(start, min(start + CHUNK_SHOCKS, len(rate_shocks)))
+              for start in range(0, len(rate_shocks), CHUNK_SHOCKS)]
+    jobs = [(principal, annual_rate, term_years, monthly_income, monthly_expenses, housing_costs, savings,
+             *event_arrays, rate_shocks[shocks], durations) for shocks in slices]
+
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {pool.submit(_stress_chunk, job): shocks for job, shocks in zip(jobs, slices)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    else:
+        for job, shocks in zip(jobs, slices):
+            yield shocks, _stress_chunk(job)
+
+
+def stress_matrix(principal, annual_rate, term_years, monthly_income, monthly_expenses, events,
+                  rate_shocks, durations, housing_costs=0, savings=0, processes=None):
+    """Every life event crossed with every rate shock and event duration.
+
+    ``events`` are dicts with percentage ``income_change`` and ``expense_change``
+    and an optional ``rate_change`` added to each shock. ``payment``,
+    ``leftover`` (monthly), ``dti`` and ``months_covered`` (how long
+    ``savings`` cover a monthly deficit) have shape ``(events, rate shocks)``;
+    ``savings_left`` at the end of the event adds the duration axis.
+    """
+    rate_shocks = np.asarray(rate_shocks, dtype=float)
+    durations = np.asarray(durations, dtype=float)
+    result = {
+        "rate_shocks": rate_shocks,
+        "durations": durations,
+        "savings_left": np.empty((len(events), len(rate_shocks), len(durations))),
+    }
+    for key in ("payment", "leftover", "dti", "months_covered"):
+        result[key] = np.empty((len(events), len(rate_shocks)))
+    for shocks, chunk in iter_stress_matrix(principal, annual_rate, term_years, monthly_income, monthly_expenses,
+                                            events, rate_shocks, durations, housing_costs, savings, processes):
+        for key, value in chunk.items():
+            result[key][:, shocks] = value
+    return result
+
+
+def simulate_life_event_cashflow(monthly_income, monthly_expenses, loan_payment, savings, income_change,
+                                 expense_change=0, event_payment=None, housing_costs=0, onset_month=1,
+                                 typical_months=6, recovery_months=0, benefit_months=None,
+                                 income_change_after_benefits=None, horizon_months=60, n_paths=5000,
+                                 duration_shape=2.0, seed=42, percentiles=(5, 25, 50, 75, 95)):
+    """Month-by-month cash flow through a life event of uncertain length, drawing down savings.
+
+    The event starts in ``onset_month`` and lasts a gamma-distributed number
+    of months with mean ``typical_months``. While it lasts, income and expenses
+    change by the given percentages and the loan payment becomes
+    ``event_payment``; income changes to ``income_change_after_benefits`` once
+    ``benefit_months`` of benefits run out. Afterwards the impact fades
+    linearly over ``recovery_months``. Savings take every month's surplus or
+    deficit, so ``runway`` is the number of months from onset until they run
+    out (``inf`` when they never do within ``horizon_months``, 0 when they are
+    already gone before the event, which ``short_before_event`` flags).
+    """
+    rng = np.random.default_rng(seed)
+    durations = np.maximum(np.ceil(rng.gamma(duration_shape, typical_months / duration_shape, n_paths)), 1)[:, None]
+    month = np.arange(1, horizon_months + 1)
+    elapsed = month - onset_month
+    in_event = (elapsed >= 0) & (elapsed < durations)
+    since_end = elapsed - durations
+    fade = np.where(in_event, 1.0, np.where((since_end >= 0) & (since_end < recovery_months),
+                                            1 - (since_end + 1) / (recovery_months + 1), 0.0))
+
+    if benefit_months is None or income_change_after_benefits is None:
+        income_shift = np.full((n_paths, horizon_months), float(income_change))
+    else:
+        # During the event by elapsed month, during recovery from the level the event ended on
+        months_in = np.where(in_event, elapsed, durations - 1)
+        income_shift = np.where(months_in < benefit_months, income_change, income_change_after_benefits)
+    event_payment = loan_payment if event_payment is None else event_payment
+
+    income = monthly_income * (1 + income_shift * fade / 100)
+    expenses = monthly_expenses * (1 + expense_change * fade / 100)
+    payment = loan_payment + (event_payment - loan_payment) * fade
+    leftover = income - expenses - payment - housing_costs
+    balance = savings + np.cumsum(leftover, axis=1)
+
+    depleted = balance < 0
+    ran_out = depleted.any(axis=1)
+    short_before_event = depleted[:, :max(onset_month - 1, 0)].any(axis=1)
+    runway = np.where(ran_out, np.maximum(np.argmax(depleted, axis=1) + 1 - onset_month, 0), np.inf)
+    return {
+        "month": month,
+        "percentiles": np.asarray(percentiles),
+        "savings_bands": np.percentile(balance, percentiles, axis=0),
+        "leftover_bands": np.percentile(leftover, percentiles, axis=0),
+        "depleted_share": np.logical_or.accumulate(depleted, axis=1).mean(axis=0),
+        "durations": durations[:, 0],
+        "runway": runway,
+        "short_before_event": short_before_event,
+        "prob_depleted": float(ran_out.mean()),
+        "lowest_savings": balance.min(axis=1),
+        "n_paths": n_paths,
+    }
+
+
+def _lifetime_chunk(args):
+    (n_households, seed, monthly_income, monthly_expenses, housing_costs, savings, payment, event_payments,
+     monthly_hazard, typical_months, income_factor, expense_factor, duration_shape) = args
+    rng = np.random.default_rng(seed)
+    n_months = len(payment)
+    # Event onsets as a Poisson process: enough exponential gaps per event to run past the term
+    # with near certainty, then each occurrence lasts a gamma-distributed number of months
+    n_events = len(monthly_hazard)
+    max_occurrences = int(np.ceil(monthly_hazard.max() * n_months * 3)) + 5
+    onsets = np.ceil(np.cumsum(rng.exponential(1 / monthly_hazard[:, None, None],
+                                                (n_events, n_households, max_occurrences)), axis=-1))
+    durations = np.maximum(np.ceil(rng.gamma(duration_shape, typical_months[:, None, None] / duration_shape,
+                                             onsets.shape)), 1)
+
+    # Merge overlapping occurrences of an event into disjoint [start, end) intervals, so that adding
+    # 2**event at each start and subtracting it at each end sums to a bit code of the active events
+    run_end = np.maximum.accumulate(onsets + durations, axis=-1)
+    starts = np.maximum(onsets, np.concatenate([np.zeros(onsets.shape[:2] + (1,)), run_end[..., :-1]], axis=-1))
+    row = np.arange(n_households)[None, :, None] * (n_months + 2)
+    bit = np.broadcast_to((2 ** np.arange(n_events))[:, None, None], onsets.shape)
+    index = np.concatenate([(row + np.minimum(starts, n_months + 1)).ravel(), (row + np.minimum(run_end, n_months + 1)).ravel()])
+    steps = np.bincount(index.astype(np.int64), weights=np.concatenate([bit.ravel(), -bit.ravel()]),
+                        minlength=n_households * (n_months + 2))
+    code = np.rint(np.cumsum(steps.reshape(n_households, n_months + 2), axis=1)[:, 1:n_months + 1]).astype(np.int64)
+
+    # Overlapping events compound: income less expenses for every combination of active events
+    combos = (np.arange(2 ** n_events)[:, None] >> np.arange(n_events)) & 1
+    net_income = (monthly_income * np.prod(np.where(combos, income_factor, 1.0), axis=1)
+                  - monthly_expenses * np.prod(np.where(combos, expense_factor, 1.0), axis=1))
+    leftover = net_income[code] - (payment + housing_costs)
+    # A payment shock replaces the payment while it lasts
+    for e in np.flatnonzero((event_payments != payment).any(axis=1)):
+        leftover -= ((code >> e) & 1) * (event_payments[e] - payment)
+    balance = savings + np.cumsum(leftover, axis=1)
+
+    shortfall = balance < 0
+    in_distress = shortfall.any(axis=1)
+    first_month = np.where(in_distress, np.argmax(shortfall, axis=1) + 1, 0)
+    # Which events were under way in the first month of shortfall
+    active_at_distress = ((code[in_distress, first_month[in_distress] - 1, None] >> np.arange(n_events)) & 1).sum(axis=0)
+    occurrences = (onsets <= n_months).sum(axis=-1).sum(axis=1)
+    return first_month, active_at_distress, occurrences
+
+
+def simulate_lifetime_distress(principal, annual_rate, term_years, monthly_income, monthly_expenses, events,
+                               housing_costs=0, savings=0, n_households=100000, seed=42, processes=None,
+                               duration_shape=2.0):
+    """Monte Carlo of random life events over the whole loan and the chance of a payment shortfall.
+
+    ``events`` are dicts with an ``annual_probability``, ``typical_months``,
+    percentage ``income_change`` and ``expense_change`` and an optional
+    ``rate_change``. Each household draws its own sequence of events, with
+    gamma-distributed durations, over the annuity payments of the loan; every
+    month's surplus or deficit goes to ``savings`` and a household is in
+    distress from the first month those go negative. Households run in
+    seeded chunks of ``CHUNK_HOUSEHOLDS`` so results do not depend on
+    ``processes``.
+    """
+    n_months = int(round(term_years * 12))
+    month = np.arange(1, n_months + 1)
+    payment = np.full(n_months, float(annuity_payment(principal, annual_rate, term_years)))
+    # A rate shock re-prices the balance still outstanding over the remaining term
+    opening = remaining_balance(principal, annual_rate, term_years, month - 1)
+    rate_change = np.array([event.get("rate_change", 0) for event in events], dtype=float)
+    event_payments = np.where(rate_change[:, None] != 0,
+                              annuity_payment(opening, annual_rate + rate_change[:, None], (n_months - month + 1) / 12),
+                              payment)
+    annual_probability = np.array([event["annual_probability"] for event in events], dtype=float)
+    monthly_hazard = 1 - (1 - annual_probability / 100) ** (1 / 12)
+    typical_months = np.array([event["typical_months"] for event in events], dtype=float)
+    income_factor = 1 + np.array([event["income_change"] for event in events], dtype=float) / 100
+    expense_factor = 1 + np.array([event["expense_change"] for event in events], dtype=float) / 100
+
+    chunk_sizes = [min(CHUNK_HOUSEHOLDS, n_households - start) for start in range(0, n_households, CHUNK_HOUSEHOLDS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    jobs = [(size, child, monthly_income, monthly_expenses, housing_costs, savings, payment, event_payments,
+             monthly_hazard, typical_months, income_factor, expense_factor, duration_shape)
+            for size, child in zip(chunk_sizes, seeds)]
+    if processes and processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            chunks = list(pool.map(_lifetime_chunk, jobs))
+    else:
+        chunks = [_lifetime_chunk(job) for job in jobs]
+
+    first_month = np.concatenate([chunk[0] for chunk in chunks])
+    in_distress = first_month > 0
+    n_distress = int(in_distress.sum())
+    distress_by_year = np.bincount(-(-first_month[in_distress] // 12), minlength=-(-n_months // 12) + 1)[1:]
+    return {
+        "year": np.arange(1, len(distress_by_year) + 1),
+        "prob_distress": n_distress / n_households,
+        "cumulative_distress": np.cumsum(distress_by_year) / n_households,
+        "first_distress_month": first_month[in_distress],
+        "event_share_at_distress": sum(chunk[1] for chunk in chunks) / max(n_distress, 1),
+        "expected_events": sum(chunk[2] for chunk in chunks) / n_households,
+        "n_households": n_households,
+    }
+
+
+def simulate_wealth(principal, annual_rates, term_years, property_value, monthly_income, fixed_expenses,
+                    initial_investments=0, savings_rate=15, expected_return=7.0, return_volatility=15.0,
+                    home_appreciation=2.0, years=25, n_paths=2000, seed=42, percentiles=(5, 25, 50, 75, 95)):
+    """Month-by-month net worth (home equity plus investments) for each mortgage rate scenario.
+
+    Each month the household invests ``savings_rate`` percent of income, or
+    whatever is left after ``fixed_expenses`` and the mortgage payment if that
+    is less (never below zero), and the portfolio earns a lognormal return
+    with the given annual mean and volatility. The home appreciates at a
+    steady rate and the balance follows the annuity schedule. Every rate
+    scenario sees the same return paths, so differences between scenarios are
+    due to the rate alone. Bands have shape ``(percentiles, scenarios, months)``.
+    """
+    rates = np.atleast_1d(np.asarray(annual_rates, dtype=float))[:, None]
+    month = np.arange(1, int(years * 12) + 1)
+    payment = np.where(month <= term_years * 12, annuity_payment(principal, rates, term_years), 0.0)
+    balance = remaining_balance(principal, rates, term_years, month)
+    home_value = property_value * (1 + home_appreciation / 100) ** (month / 12)
+    contribution = np.clip(np.minimum(monthly_income * savings_rate / 100,
+                                      monthly_income - fixed_expenses - payment), 0, None)
+
+    # Lognormal monthly growth factors with E[growth over a year] = 1 + expected_return
+    rng = np.random.default_rng(seed)
+    sigma = return_volatility / 100 / np.sqrt(12)
+    mu = np.log(1 + expected_return / 100) / 12 - sigma ** 2 / 2
+    log_growth = np.cumsum(rng.normal(mu, sigma, (n_paths, len(month))), axis=1)
+    # Contributions are made at the start of the month: W_t = G_t * (W_0 + sum_k c_k / G_(k-1))
+    discount_before = np.exp(-np.concatenate([np.zeros((n_paths, 1)), log_growth[:, :-1]], axis=1))
+    investments = np.exp(log_growth) * (initial_investments
+                                        + np.cumsum(contribution[:, None, :] * discount_before, axis=-1))
+    net_worth = investments + (home_value - balance)[:, None, :]
+
+    return {
+        "month": month,
+        "percentiles": np.asarray(percentiles),
+        "net_worth_bands": np.percentile(net_worth, percentiles, axis=1),
+        "investment_bands": np.percentile(investments, percentiles, axis=1),
+        "investment_loss_bands": np.percentile(investments[:1, :, -1] - investments[:, :, -1], percentiles, axis=1),
+        "home_equity": home_value - balance,
+        "balance": balance,
+        "contribution": contribution,
+        "n_paths": n_paths,
+    }
@@ -7,7 +7,21 @@ import plotly.graph_objects as go
 from datetime import datetime
 import pydeck as pdk
 import random
-import time
+import os
+
+from dataflow import Dataflow
+from loan_engine import (
+    AFFORDABILITY_CONSTRAINTS, APPROVAL_TIERS, BUDGET_PRIORITY_WEIGHTS, CREDIT_RATINGS, REPAYMENT_TYPES, RISK_CATEGORIES,
+    STRESS_MAX_DTI, STRESS_RATE, STRESS_TERM_YEARS, amortization_schedule_cents, annuity_payment,
+    balance_milestone_month, budget_cuts, effective_annual_rate, explain_approval, financial_profile,
+    first_month_at_or_below, loan_structure_frontier, ltv_milestone_month, max_affordable_loan,
+    optimize_loan_structure, payment_grid, payment_holiday_schedule, prepayment_schedule,
+    principal_crossover_month, refinance_analysis, repayment_schedule, stress_test, variable_rate_schedule
+)
+from risk_simulation import (
+    expected_reference_rates, simulate_life_event_cashflow, simulate_lifetime_distress, simulate_rate_risk,
+    simulate_wealth, stress_matrix
+)
 
 # MUST BE THE VERY FIRST STREAMLIT COMMAND
 st.set_page_config(page_title="Housing Loan Advisor", page_icon="house", layout="wide")
@@ -27,6 +41,12 @@ financial_vars = {
     "interest_rate": 3.5
 }
 
+# Typical bank fees, included in the effective annual rate shown next to every nominal rate
+loan_fees = {
+    "arrangement_fee": 750,
+    "monthly_fee": 5
+}
+
 # Real-world Helsinki addresses with coordinates
 helsinki_addresses = [
     {"address": "Erottajankatu 15, 00130 Helsinki", "latitude": 60.1665, "longitude": 24.9452},
@@ -273,33 +293,114 @@ with st.sidebar:
         st.markdown(f"**Maintenance Fee:** €{st.session_state.property_data['maintenance_fee']}/month")
 
 # -------------------- LOAN & FINANCIAL PARAMETERS --------------------
-mi = financial_vars["monthly_income"]
-me = financial_vars["monthly_expenses"]
-sd = financial_vars["existing_student_debt"]
-ms = financial_vars["monthly_student_payment"]
+# Widget values from the last interaction take precedence over the defaults so that
+# every tab reads the same inputs, regardless of where the widgets are rendered
+mi = st.session_state.get("global_monthly_income", financial_vars["monthly_income"])
+me = st.session_state.get("global_monthly_expenses", financial_vars["monthly_expenses"])
+sd = st.session_state.get("global_student_debt", financial_vars["existing_student_debt"])
+ms = st.session_state.get("global_student_payment", financial_vars["monthly_student_payment"])
 ol = financial_vars["other_loans"]
-oa = financial_vars["other_assets"]
-la = financial_vars["loan_amount"]
-dp = financial_vars["down_payment"]
-lt = financial_vars["loan_term"]
-ir = financial_vars["interest_rate"]
-
-# Always calculate core financial metrics regardless of UI state
-monthly_payment = (la * (ir/100/12) * (1 + ir/100/12)**(lt*12)) / ((1 + ir/100/12)**(lt*12) - 1)
-loan_to_value = (la / (la + dp)) * 100
-debt_to_income = ((monthly_payment + ol) / mi) * 100
-disposable_income = mi - me - monthly_payment - ol
-asset_to_loan_ratio = (oa / la) * 100
+oa = st.session_state.get("global_other_assets", financial_vars["other_assets"])
+la = st.session_state.get("global_loan_amount", financial_vars["loan_amount"])
+dp = st.session_state.get("global_down_payment", financial_vars["down_payment"])
+lt = st.session_state.get("global_loan_term", financial_vars["loan_term"])
+ir = st.session_state.get("global_interest_rate", financial_vars["interest_rate"])
+
+# Payment analysis rate assumption: fixed, or reference rate + margin reset every 12 months
+payment_rate_type = st.session_state.get("payment_rate_type", "Fixed")
+payment_repayment_type = st.session_state.get("payment_repayment_type", "Annuity")
+payment_margin = st.session_state.get("payment_margin", 0.8)
+payment_long_run_rate = st.session_state.get("payment_long_run_rate", 2.5)
+stress_rate = st.session_state.get("stress_rate", STRESS_RATE)
+prepayment_lump_sum = st.session_state.get("prepayment_lump_sum", 0)
+prepayment_lump_year = st.session_state.get("prepayment_lump_year", 5)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def load_financial_profile(mi, me, ol, oa, la, dp, lt, ir, monthly_maintenance, renovation_cost_monthly):
+    """Memoized financial profile, keyed on the inputs it is derived from"""
+    return financial_profile(mi, me, ol, oa, la, dp, lt, ir, monthly_maintenance, renovation_cost_monthly)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_amortization_schedule(loan_amount, interest_rate, loan_term_years, rate_type="Fixed", margin=0.8, long_run_rate=2.5,
+                               repayment_type="Annuity"):
+    """Memoized amortization schedule for the payment analysis tab"""
+    if rate_type == "Fixed":
+        return repayment_schedule(loan_amount, interest_rate, loan_term_years, repayment_type)
+    # Variable: today's rate splits into reference + margin, and the reference follows its expected path
+    n_resets = -(-int(round(loan_term_years * 12)) // 12)
+    reference = expected_reference_rates(n_resets, max(interest_rate - margin, 0.0), long_run_rate)
+    return variable_rate_schedule(loan_amount, reference + margin, loan_term_years, repayment_type=repayment_type)
 
 monthly_maintenance = st.session_state.property_data["maintenance_fee"]
 renovation_cost_monthly = sum([r["estimated_cost"] for r in st.session_state.property_data["upcoming_renovations"]]) / (10 * 12) if st.session_state.property_data["upcoming_renovations"] else 0
-total_monthly_housing_cost = monthly_payment + monthly_maintenance + renovation_cost_monthly
-total_housing_ratio = (total_monthly_housing_cost / mi) * 100
-
-risk_score = (debt_to_income * 0.4 + loan_to_value * 0.4 - (disposable_income/mi)*20 - (asset_to_loan_ratio*0.1))
-risk_category = "Low Risk" if risk_score < 20 else "Moderate Risk" if risk_score < 35 else "High Risk"
-risk_color = colors['success'] if risk_score < 20 else colors['primary'] if risk_score < 35 else colors['warning']
 
+# -------------------- DATAFLOW GRAPH --------------------
+# Inputs feed derived values, figures and HTML fragments. The graph lives in the session,
+# so a rerun only rebuilds the nodes downstream of the inputs that actually changed
+if "dataflow" not in st.session_state:
+    st.session_state.dataflow = Dataflow()
+flow = st.session_state.dataflow
+flow.set_inputs(
+    mi=mi, me=me, sd=sd, ms=ms, ol=ol, oa=oa, la=la, dp=dp, lt=lt, ir=ir,
+    payment_rate_type=payment_rate_type, payment_repayment_type=payment_repayment_type, payment_margin=payment_margin, payment_long_run_rate=payment_long_run_rate,
+    prepayment_lump_sum=prepayment_lump_sum, prepayment_lump_year=prepayment_lump_year, stress_rate=stress_rate,
+    monthly_maintenance=monthly_maintenance, renovation_cost_monthly=renovation_cost_monthly
+)
+
+@flow.node("mi", "me", "ol", "oa", "la", "dp", "lt", "ir", "monthly_maintenance", "renovation_cost_monthly")
+def profile(mi, me, ol, oa, la, dp, lt, ir, monthly_maintenance, renovation_cost_monthly):
+    return load_financial_profile(mi, me, ol, oa, la, dp, lt, ir, monthly_maintenance, renovation_cost_monthly)
+
+@flow.node("la", "ir", "lt", "payment_rate_type", "payment_margin", "payment_long_run_rate", "payment_repayment_type")
+def schedule(la, ir, lt, payment_rate_type, payment_margin, payment_long_run_rate, payment_repayment_type):
+    return load_amortization_schedule(la, ir, lt, payment_rate_type, payment_margin, payment_long_run_rate,
+                                      payment_repayment_type)
+
+# Always calculate core financial metrics regardless of UI state (cached on the inputs)
+current_profile = flow["profile"]
+monthly_payment = current_profile.monthly_payment
+loan_to_value = current_profile.loan_to_value
+debt_to_income = current_profile.debt_to_income
+disposable_income = current_profile.disposable_income
+asset_to_loan_ratio = current_profile.asset_to_loan_ratio
+total_monthly_housing_cost = current_profile.total_monthly_housing_cost
+total_housing_ratio = current_profile.total_housing_ratio
+
+risk_score = current_profile.risk_score
+risk_category = current_profile.risk_category
+risk_color = dict(zip(RISK_CATEGORIES, [colors['success'], colors['primary'], colors['warning']]))[risk_category]
+
+def describe_loan_structure(opt, available_cash):
+    """Key benefits and considerations of an optimized loan structure"""
+    benefits, considerations = [], []
+    if opt["term"] <= 20:
+        benefits += ["Lower total interest costs", "Faster equity building"]
+        considerations.append("Higher monthly payments")
+    elif opt["term"] >= 25:
+        benefits += ["Lower monthly payment burden", "Flexibility for career growth"]
+        considerations += ["Higher total interest costs", "Slower equity building"]
+    else:
+        benefits.append("Good balance of payment vs. interest")
+        considerations.append("Moderate total interest costs")
+    if opt["repayment_type"] == "Equal Principal":
+        benefits.append("Payments fall every month as the balance shrinks")
+        considerations.append("Highest payments at the start of the loan")
+    if opt["ltv_ratio"] <= 80:
+        benefits.append(f"{opt['rate_tier']} rate tier thanks to a low loan-to-value ratio")
+    else:
+        considerations.append(f"{opt['rate_tier']} rate tier due to a higher loan-to-value ratio")
+    cash_left = available_cash - opt["down_payment"]
+    if cash_left >= 0.25 * available_cash:
+        benefits.append(f"Keeps €{cash_left:,.0f} available for other investments")
+    else:
+        considerations.append(f"Uses most of your savings (€{cash_left:,.0f} left)")
+    if opt["approval_rank"] == 0:
+        benefits.append("Higher approval likelihood")
+    return benefits, considerations
+
+# The recommender, calculator and risk simulator run as fragments: their own widgets
+# only rerun that function instead of the whole app
+@st.fragment
 def render_loan_recommender():
     # Header with clearer explanation
     st.subheader("Personalized Loan Setup Recommendations")
@@ -338,19 +439,22 @@ def render_loan_recommender():
             conservative_loan = (la + dp) - conservative_down
             conservative_term = max(lt - 5, 15)
             conservative_rate = max(ir - 0.3, 2.8)
-            conservative_monthly = (conservative_loan * (conservative_rate/100/12) * (1 + conservative_rate/100/12)**(conservative_term*12)) / ((1 + conservative_rate/100/12)**(conservative_term*12) - 1)
             
             balanced_down = max(dp + 10000, 0.20 * (la + dp))
             balanced_loan = (la + dp) - balanced_down
             balanced_term = lt
             balanced_rate = max(ir - 0.15, 3.0)
-            balanced_monthly = (balanced_loan * (balanced_rate/100/12) * (1 + balanced_rate/100/12)**(balanced_term*12)) / ((1 + balanced_rate/100/12)**(balanced_term*12) - 1)
             
             growth_down = max(dp, 0.15 * (la + dp))
             growth_loan = (la + dp) - growth_down
             growth_term = min(lt + 3, 30)
             growth_rate = ir
-            growth_monthly = (growth_loan * (growth_rate/100/12) * (1 + growth_rate/100/12)**(growth_term*12)) / ((1 + growth_rate/100/12)**(growth_term*12) - 1)
+            
+            conservative_monthly, balanced_monthly, growth_monthly = payment_grid(
+                [conservative_loan, balanced_loan, growth_loan],
+                [conservative_rate, balanced_rate, growth_rate],
+                [conservative_term, balanced_term, growth_term]
+            )["payment"]
             
             # Use bank-style cards for each profile
             with profile_col1:
@@ -493,7 +597,7 @@ def render_loan_recommender():
         st.markdown("### Financial Constraints")
 
         # Show the current calculated monthly payment
-        current_monthly = (la * (ir/100/12) * (1 + ir/100/12)**(lt*12)) / ((1 + ir/100/12)**(lt*12) - 1)
+        current_monthly = annuity_payment(la, ir, lt)
 
         # Calculate percentages of income for different payment levels
         low_payment = current_monthly * 0.8
@@ -542,34 +646,42 @@ def render_loan_recommender():
             
             target_approval = st.selectbox(
                 "Target Approval Likelihood", 
-                ["Very High (95%+)", "High (80-95%)", "Moderate (65-80%)", "Flexible"],
+                list(APPROVAL_TIERS),
                 index=1,
                 key="recommender_approval"
             )
+            credit_history = st.selectbox(
+                "Credit History",
+                CREDIT_RATINGS,
+                index=CREDIT_RATINGS.index("Good"),
+                key="recommender_credit"
+            )
+            credit_rating = CREDIT_RATINGS.index(credit_history)
 
         # Add concrete examples for each approval tier - modified to only reference OP Bank
+        approval_limits = APPROVAL_TIERS[target_approval]
         if target_approval == "Very High (95%+)":
-            st.markdown("""
+            st.markdown(f"""
             <div class="bank-notice" style="border-left: 4px solid #4DAA57;">
                 <strong>Bank Examples:</strong> OP Bank and other major banks with stricter criteria. 
-                They typically require debt-to-income ratios under 35%, loan-to-value ratios under 80%, 
-                and excellent credit history.
+                They typically require debt-to-income ratios under {approval_limits['max_dti']}%, loan-to-value ratios under {approval_limits['max_ltv']}%, 
+                and {CREDIT_RATINGS[approval_limits['min_credit']].lower()} credit history.
             </div>
             """, unsafe_allow_html=True)
         elif target_approval == "High (80-95%)":
-            st.markdown("""
+            st.markdown(f"""
             <div class="bank-notice" style="border-left: 4px solid #FF9500;">
                 <strong>Bank Examples:</strong> Most Finnish banks including OP Bank. 
-                They typically accept debt-to-income ratios up to 40%, loan-to-value ratios up to 85%, 
-                and good credit history.
+                They typically accept debt-to-income ratios up to {approval_limits['max_dti']}%, loan-to-value ratios up to {approval_limits['max_ltv']}%, 
+                and {CREDIT_RATINGS[approval_limits['min_credit']].lower()} credit history.
             </div>
             """, unsafe_allow_html=True)
         elif target_approval == "Moderate (65-80%)":
-            st.markdown("""
+            st.markdown(f"""
             <div class="bank-notice" style="border-left: 4px solid #FF5A00;">
                 <strong>Bank Examples:</strong> Some online lenders and smaller banks. 
-                They may accept debt-to-income ratios up to 45%, loan-to-value ratios up to 90%, 
-                and average credit history.
+                They may accept debt-to-income ratios up to {approval_limits['max_dti']}%, loan-to-value ratios up to {approval_limits['max_ltv']}%, 
+                and {CREDIT_RATINGS[approval_limits['min_credit']].lower()} credit history.
             </div>
             """, unsafe_allow_html=True)
         else:  # Flexible
@@ -580,139 +692,96 @@ def render_loan_recommender():
             </div>
             """, unsafe_allow_html=True)
 
+        # The reverse question: the largest loan and price these constraints allow, for every term and rate scenario
+        st.markdown("<h5>How Much Can You Borrow?</h5>", unsafe_allow_html=True)
+        affordability_terms = np.arange(10, 31)
+        affordability_rates = ir + np.array([0, 1, 2])
+        affordability = max_affordable_loan(
+            mi, dp + oa, affordability_rates, affordability_terms[:, None],
+            max_monthly=max_monthly, max_dti=approval_limits["max_dti"], max_ltv=approval_limits["max_ltv"],
+            other_monthly_debt=ol
+        )
+        shown = np.isin(affordability_terms, [10, 15, 20, 25, 30])
+        affordability_df = pd.DataFrame({
+            "Term (years)": affordability_terms[shown],
+            "Max Loan": [f"€{loan:,.0f}" for loan in affordability["max_loan"][shown, 0]],
+            "Max Price": [f"€{price:,.0f}" for price in affordability["max_price"][shown, 0]],
+            "Min Down Payment": [f"€{down:,.0f}" for down in affordability["required_down_payment"][shown, 0]],
+            f"Max Price at {affordability_rates[1]:.1f}%": [f"€{price:,.0f}" for price in affordability["max_price"][shown, 1]],
+            f"Max Price at {affordability_rates[2]:.1f}%": [f"€{price:,.0f}" for price in affordability["max_price"][shown, 2]],
+            "Limited By": [AFFORDABILITY_CONSTRAINTS[i] for i in affordability["binding"][shown, 0]],
+        })
+        ui.table(affordability_df)
+        st.caption(f"At {ir:.1f}% with your €{max_monthly:,} payment limit, your €{dp + oa:,.0f} of cash and the '{target_approval}' limits "
+                   f"(loan-to-value up to {approval_limits['max_ltv']}%). At a {STRESS_RATE:.0f}% stress rate the payment must also stay "
+                   f"under {STRESS_MAX_DTI}% of income.")
+
         # Generate button - in the info tab but affects the recommendation tab
         if st.button("Generate My Personalized Recommendation", use_container_width=True, key="recommender_button"):
-            with st.spinner("Analyzing financial profiles and bank approval criteria..."):
-                time.sleep(2)
-                
-                # Generate options based on real mortgage lending standards
-                # Calculate realistic options based on the user's financial profile
-                options = [
-                    {
-                        "name": "Conservative",
-                        "down_payment": max(dp + 20000, 0.25 * (la + dp)),  # At least 25% down payment
-                        "loan_amount": min(la - 20000, 0.75 * (la + dp)),
-                        "term": max(lt - 5, 15),
-                        "rate": max(ir - 0.3, 2.8),  # Better rates for conservative profiles
-                        "monthly": 0,
-                        "total_interest": 0,
-                        "approval_odds": "Very High (95%+)",
-                        "risk_score": "Low Risk",
-                        "key_benefits": [
-                            "Lower total interest costs",
-                            "Faster equity building",
-                            "Better interest rates",
-                            "Higher approval likelihood"
-                        ],
-                        "considerations": [
-                            "Higher monthly payments",
-                            "More cash needed upfront",
-                            "Less funds for other investments"
-                        ]
-                    },
-                    {
-                        "name": "Balanced",
-                        "down_payment": max(dp + 10000, 0.20 * (la + dp)),  # 20% down payment (standard)
-                        "loan_amount": min(la - 10000, 0.80 * (la + dp)),
-                        "term": lt,
-                        "rate": max(ir - 0.15, 3.0),
-                        "monthly": 0,
-                        "total_interest": 0,
-                        "approval_odds": "High (80-95%)",
-                        "risk_score": "Moderate Risk",
-                        "key_benefits": [
-                            "Good balance of payment vs. interest",
-                            "Meets standard bank requirements",
-                            "Moderate cash needs upfront",
-                            "Leaves room for other investments"
-                        ],
-                        "considerations": [
-                            "Moderate total interest costs",
-                            "Average equity building pace",
-                            "Standard interest rates"
-                        ]
-                    },
-                    {
-                        "name": "Growth-Focused",
-                        "down_payment": max(dp, 0.15 * (la + dp)),  # 15% minimum down payment
-                        "loan_amount": min(la, 0.85 * (la + dp)),
-                        "term": min(lt + 3, 30),
-                        "rate": ir,  # Standard rate for higher LTV
-                        "monthly": 0,
-                        "total_interest": 0,
-                        "approval_odds": "Moderate (65-80%)",
-                        "risk_score": "Moderate Risk",
-                        "key_benefits": [
-                            "Lower monthly payment burden",
-                            "Minimum cash needed upfront",
-                            "More cash available for other investments",
-                            "Flexibility for career growth"
-                        ],
-                        "considerations": [
-                            "Higher total interest costs",
-                            "Slower equity building",
-                            "May require mortgage insurance",
-                            "Higher interest rates"
-                        ]
-                    }
-                ]
-                
-                # Calculate monthly payments and total interest using actual formulas
-                for opt in options:
-                    opt["monthly"] = (opt["loan_amount"] * (opt["rate"]/100/12) * 
-                                    (1 + opt["rate"]/100/12)**(opt["term"]*12)) / \
-                                    ((1 + opt["rate"]/100/12)**(opt["term"]*12) - 1)
-                    opt["total_interest"] = opt["monthly"] * opt["term"] * 12 - opt["loan_amount"]
-                    # Calculate real-world metrics
-                    opt["ltv_ratio"] = (opt["loan_amount"] / (opt["loan_amount"] + opt["down_payment"])) * 100
-                    opt["dti_ratio"] = (opt["monthly"] / mi) * 100
-                
-                # Filter options based on constraints and real approval criteria
-                filtered_options = [
-                    opt for opt in options 
-                    if opt["monthly"] <= max_monthly and
-                    (target_approval == "Flexible" or opt["approval_odds"] == target_approval) and
-                    opt["ltv_ratio"] <= 95  # Real-world maximum LTV
-                ]
-                
-                if not filtered_options:
-                    st.warning("""
-                    No options match your constraints. This happens when your maximum payment is too low 
-                    or your approval requirements are too strict for your financial situation. Try adjusting your parameters.
-                    """)
-                else:
-                    # Map risk tolerance to profile index, with more nuanced selection
-                    if risk_tolerance == 1:  # Very Conservative
-                        best_idx = 0  # Conservative profile
-                    elif risk_tolerance == 2:  # Moderately Conservative
-                        # Lean conservative but consider balanced
-                        best_idx = min(1, len(filtered_options) - 1)
-                    elif risk_tolerance == 3:  # Balanced
-                        # Pick middle option when possible
-                        best_idx = min(1, len(filtered_options) - 1)
-                    elif risk_tolerance == 4:  # Moderately Aggressive
-                        # Lean growth-focused but consider balanced
-                        best_idx = min(len(filtered_options) - 1, 1)
-                    else:  # Aggressive
-                        best_idx = min(2, len(filtered_options) - 1)  # Growth-Focused profile
-                    
-                    # Adjust based on payment priority preference
-                    if payment_priority == 1 and len(filtered_options) > 1:  # Lower Monthly Payment
-                        # Sort by monthly payment, lowest first
-                        filtered_options.sort(key=lambda x: x["monthly"])
-                        best_idx = 0
-                    elif payment_priority == 5 and len(filtered_options) > 1:  # Lower Total Interest
-                        # Sort by total interest, lowest first
-                        filtered_options.sort(key=lambda x: x["total_interest"])
-                        best_idx = 0
-                    
-                    recommended = filtered_options[best_idx]
-                    st.session_state.loan_options = filtered_options
-                    st.session_state.recommended = recommended
-                    st.session_state.all_options = options
+            # Search down payment, term, repayment type and rate tier for the best structure under the user's
+            # constraints, once per payment priority so the alternatives can be compared
+            property_price = la + dp
+            available_cash = dp + oa
+            options = []
+            cash_purchase = None
+            for name, priority in [("Interest-Saving", 5), ("Balanced", 3), ("Low-Payment", 1)]:
+                opt = optimize_loan_structure(
+                    property_price, available_cash, ir, mi, max_monthly,
+                    target_approval=target_approval,
+                    payment_priority=priority,
+                    risk_tolerance=risk_tolerance,
+                    other_monthly_debt=ol,
+                    credit_rating=credit_rating
+                )
+                if opt is not None and not opt["loan_needed"]:
+                    # The cash covers the price, so there is no loan to structure for any priority
+                    cash_purchase = opt
+                    break
+                if opt is not None:
+                    opt["name"] = name
+                    opt["priority"] = priority
+                    opt["key_benefits"], opt["considerations"] = describe_loan_structure(opt, available_cash)
+                    options.append(opt)
+
+            st.session_state.cash_purchase = cash_purchase
+            if cash_purchase is not None:
+                for key in ("loan_options", "recommended", "all_options", "loan_frontier"):
+                    st.session_state.pop(key, None)
+                st.success("No loan needed: your cash covers the whole price. Check the 'Loan Recommendation' tab for details.")
+            elif not options:
+                st.warning("""
+                No options match your constraints. This happens when your maximum payment is too low 
+                or your approval requirements are too strict for your financial situation. Try adjusting your parameters.
+                """)
+                # Which of the target tier's rules the current loan setup breaks
+                current_setup = {"dti_ratio": current_profile.debt_to_income, "ltv_ratio": current_profile.loan_to_value,
+                                 "credit_rating": credit_rating}
+                reasons = explain_approval(current_setup, target_approval)
+                if reasons:
+                    st.markdown(f"With your current loan setup, the '{target_approval}' criteria are not met:\n"
+                                + "\n".join(f"* {reason}" for reason in reasons))
+            else:
+                # Effective rates of all compared options in one batched solve
+                effective_rates = effective_annual_rate(
+                    np.array([opt["loan_amount"] for opt in options]), np.array([opt["rate"] for opt in options]),
+                    np.array([opt["term"] for opt in options]), loan_fees["arrangement_fee"], loan_fees["monthly_fee"],
+                    repayment_type=np.array([opt["repayment_type"] for opt in options])
+                )
+                for opt, effective_rate in zip(options, np.atleast_1d(effective_rates)):
+                    opt["effective_rate"] = float(effective_rate)
+                recommended = next((opt for opt in options if opt["priority"] == payment_priority), options[0])
+                st.session_state.loan_frontier = loan_structure_frontier(
+                    property_price, available_cash, ir, mi, max_monthly,
+                    target_approval=target_approval,
+                    other_monthly_debt=ol,
+                    credit_rating=credit_rating
+                )
+                st.session_state.loan_options = options
+                st.session_state.recommended = recommended
+                st.session_state.all_options = options
 
-                    # After calculation, automatically switch to the recommendation tab
-                    st.success("Recommendation generated! Check the 'Loan Recommendation' tab for your personalized recommendation.")
+                # After calculation, automatically switch to the recommendation tab
+                st.success("Recommendation generated! Check the 'Loan Recommendation' tab for your personalized recommendation.")
 
     # Second subtab: Recommendation display only
     with recommendation_subtab:
@@ -734,7 +803,19 @@ def render_loan_recommender():
                 </div>
                             
                 """, unsafe_allow_html=True)
-        if 'loan_options' not in st.session_state:
+        if st.session_state.get("cash_purchase") is not None:
+            cash_purchase = st.session_state.cash_purchase
+            st.html(f"""
+            <div class="bank-card">
+                <div class="bank-card-header">
+                    <span class="bank-card-title">Recommended: Buy Without a Loan</span>
+                    <span class="bank-card-arrow">›</span>
+                </div>
+                <p>Your cash covers the whole <strong>€{cash_purchase['down_payment']:,.0f}</strong> price, so there is no loan to structure.
+                You would have <strong>€{cash_purchase['cash_left']:,.0f}</strong> of cash left after the purchase.</p>
+            </div>
+            """)
+        elif 'loan_options' not in st.session_state:
             st.markdown("""
             <div class="bank-widget" style="text-align: center; padding: 30px;">
                 <div style="font-size: 18px; margin-bottom: 10px;">No Recommendation Yet</div>
@@ -751,18 +832,15 @@ def render_loan_recommender():
             dti_status = "Excellent" if rec["dti_ratio"] < 30 else "Good" if rec["dti_ratio"] < 40 else "Acceptable"
             
             # Calculate the full financial impact
-            total_cost = rec["monthly"] * rec["term"] * 12
+            total_cost = rec["loan_amount"] + rec["total_interest"]
             interest_percentage = (rec["total_interest"] / rec["loan_amount"]) * 100
             
-            # Calculate real-world comparisons
-            interest_savings = 0
-            if 'all_options' in st.session_state:
-                interest_savings = st.session_state.all_options[0]["total_interest"] - rec["total_interest"]
-
-            # And similarly for monthly_difference:
-            monthly_difference = 0
-            if 'all_options' in st.session_state:
-                monthly_difference = st.session_state.all_options[0]["monthly"] - rec["monthly"]
+            # Calculate real-world comparisons against the interest-saving option, or the first feasible one without it
+            baseline = next((opt for opt in st.session_state.all_options if opt["name"] == "Interest-Saving"),
+                            st.session_state.all_options[0])
+            baseline_name = f"the {baseline['name'].lower()} option"
+            interest_savings = baseline["total_interest"] - rec["total_interest"]
+            monthly_difference = baseline["monthly"] - rec["monthly"]
             
             # Use bank-style card for the recommendation display
             st.html(f"""
@@ -775,14 +853,16 @@ def render_loan_recommender():
                 <div style="display: flex; margin-bottom: 15px;">
                     <div style="flex: 1;">
                         <h5 style="margin-bottom: 10px;">Loan Structure</h5>
-                        <p><strong>Down Payment:</strong> €{rec['down_payment']:,} ({rec['ltv_ratio']:.1f}% LTV)</p>
-                        <p><strong>Loan Amount:</strong> €{rec['loan_amount']:,}</p>
+                        <p><strong>Down Payment:</strong> €{rec['down_payment']:,.0f} ({rec['ltv_ratio']:.1f}% LTV)</p>
+                        <p><strong>Loan Amount:</strong> €{rec['loan_amount']:,.0f}</p>
                         <p><strong>Term:</strong> {rec['term']} years</p>
-                        <p><strong>Interest Rate:</strong> {rec['rate']:.2f}%</p>
+                        <p><strong>Repayment Type:</strong> {rec['repayment_type']}</p>
+                        <p><strong>Interest Rate:</strong> {rec['rate']:.2f}% ({rec['rate_tier']} tier)</p>
+                        <p><strong>Effective Annual Rate:</strong> {rec['effective_rate']:.2f}% incl. fees</p>
                     </div>
                     <div style="flex: 1;">
                         <h5 style="margin-bottom: 10px;">Financial Impact</h5>
-                        <p><strong>Monthly Payment:</strong> €{rec['monthly']:.0f}</p>
+                        <p><strong>{'First Monthly Payment' if rec['repayment_type'] == 'Equal Principal' else 'Monthly Payment'}:</strong> €{rec['monthly']:.0f}</p>
                         <p><strong>Total Cost:</strong> €{total_cost:,.0f}</p>
                         <p><strong>Total Interest:</strong> €{rec['total_interest']:,.0f} ({interest_percentage:.1f}%)</p>
                         <p><strong>Payment-to-Income:</strong> {rec['dti_ratio']:.1f}%</p>
@@ -801,8 +881,8 @@ def render_loan_recommender():
                     <p>
                         With this option, you'll pay <strong>€{rec['monthly']:.0f} per month</strong> for <strong>{rec['term']} years</strong>. 
                         {
-                            f"This is <strong style='color:green'>€{abs(monthly_difference):.0f} less per month</strong> than the most conservative option, " if monthly_difference > 0 else 
-                            f"This is <strong style='color:#E63946'>€{abs(monthly_difference):.0f} more per month</strong> than the most aggressive option, " if monthly_difference < 0 else ""
+                            f"This is <strong style='color:green'>€{abs(monthly_difference):.0f} less per month</strong> than {baseline_name}, " if monthly_difference > 0 else 
+                            f"This is <strong style='color:#E63946'>€{abs(monthly_difference):.0f} more per month</strong> than {baseline_name}, " if monthly_difference < 0 else ""
                         }
                         {
                             f" you'll pay <strong style='color:#E63946'>€{abs(interest_savings):.0f} more in total interest</strong> over the life of the loan." if interest_savings < 0 else
@@ -837,10 +917,13 @@ def render_loan_recommender():
             comparison_df = pd.DataFrame([
                 {
                     "Profile": opt["name"],
-                    "Down Payment": f"€{opt['down_payment']:,}",
-                    "Loan Amount": f"€{opt['loan_amount']:,}",
+                    "Down Payment": f"€{opt['down_payment']:,.0f}",
+                    "Loan Amount": f"€{opt['loan_amount']:,.0f}",
                     "Term (years)": opt["term"],
-                    "Interest Rate": f"{opt['rate']}%",
+                    "Repayment": opt["repayment_type"],
+                    "Interest Rate": f"{opt['rate']:.2f}%",
+                    "Effective Rate": f"{opt['effective_rate']:.2f}%",
+                    "Rate Tier": opt["rate_tier"],
                     "Monthly Payment": f"€{opt['monthly']:.0f}",
                     "Total Interest": f"€{opt['total_interest']:,.0f}",
                     "LTV Ratio": f"{opt['ltv_ratio']:.1f}%",
@@ -850,6 +933,55 @@ def render_loan_recommender():
             
             st.dataframe(comparison_df, hide_index=True, use_container_width=True)
             
+            # Every non-dominated structure under the same constraints
+            if st.session_state.get("loan_frontier") is not None:
+                frontier = st.session_state.loan_frontier
+                st.markdown("<h5>Explore the Trade-offs</h5>", unsafe_allow_html=True)
+                st.markdown(f"""
+                <div class="bank-widget">
+                    Out of {frontier['candidates']:,} down payment, term, repayment type and rate tier combinations that were evaluated, 
+                    these {len(frontier['monthly']):,} cannot be improved on monthly payment, total interest and cash needed upfront 
+                    at the same time. Hover a point to see its structure.
+                </div>
+                """, unsafe_allow_html=True)
+                
+                fig_frontier = go.Figure()
+                fig_frontier.add_trace(go.Scattergl(
+                    x=frontier["monthly"],
+                    y=frontier["total_interest"],
+                    mode="markers",
+                    name="Pareto-optimal structures",
+                    marker=dict(
+                        size=5,
+                        color=frontier["down_payment"],
+                        colorscale=[[0, colors['light']], [1, colors['secondary']]],
+                        colorbar=dict(title="Cash Upfront (€)")
+                    ),
+                    customdata=list(zip(frontier["down_payment"], frontier["term"].astype(int), frontier["rate"], frontier["rate_tier"],
+                                        frontier["repayment_type"])),
+                    hovertemplate="Monthly: €%{x:,.0f}<br>Total interest: €%{y:,.0f}<br>Down payment: €%{customdata[0]:,.0f}"
+                                  "<br>Term: %{customdata[1]} years (%{customdata[4]})<br>Rate: %{customdata[2]:.2f}% (%{customdata[3]})<extra></extra>"
+                ))
+                fig_frontier.add_trace(go.Scatter(
+                    x=[opt["monthly"] for opt in st.session_state.loan_options],
+                    y=[opt["total_interest"] for opt in st.session_state.loan_options],
+                    mode="markers+text",
+                    name="Compared options",
+                    text=[opt["name"] for opt in st.session_state.loan_options],
+                    textposition="top center",
+                    marker=dict(size=14, color=colors['text'], symbol="star")
+                ))
+                fig_frontier.update_layout(
+                    height=450,
+                    xaxis_title="Monthly Payment (€)",
+                    yaxis_title="Total Interest (€)",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                    margin=dict(l=20, r=20, t=40, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_frontier, use_container_width=True)
+            
             # Add real-world recommendation specific to OP Bank - with proper formatting
             st.markdown(f"""
             <div class="bank-notice">
@@ -869,17 +1001,33 @@ def render_loan_recommender():
             
 
 # -------------------- FUNCTIONS FOR TABS --------------------
-def render_financial_summary():
-    global financial_vars, monthly_payment, loan_to_value, debt_to_income, disposable_income, asset_to_loan_ratio
-    global monthly_maintenance, renovation_cost_monthly, total_monthly_housing_cost, total_housing_ratio, risk_score, risk_category
-    global mi, me, sd, ms, ol, oa, la, dp, lt, ir, colors
+# Terms the regulatory stress test is reported for
+stress_terms = np.arange(10, 31)
+
+@flow.node("mi", "la", "ol", "stress_rate")
+def stress_results(mi, la, ol, stress_rate):
+    return stress_test(mi, la, stress_terms, ol, stress_rate=stress_rate)
+
+@flow.node("mi", "me", "sd", "ms", "oa", "la", "dp", "lt", "profile", "monthly_maintenance", "renovation_cost_monthly",
+           "stress_results", "stress_rate")
+def overview_cards_html(mi, me, sd, ms, oa, la, dp, lt, profile, monthly_maintenance, renovation_cost_monthly,
+                        stress_results, stress_rate):
+    """Build the Everyday Finance, Wealth and Loan Impact cards of the Financial Overview"""
+    monthly_payment = profile.monthly_payment
+    loan_to_value = profile.loan_to_value
+    
+    # Regulatory stress test at the current term, against the 60% cap
+    term_index = int(np.clip(lt, stress_terms[0], stress_terms[-1]) - stress_terms[0])
+    stressed_ratio = stress_results["stressed_ratio"][term_index]
+    stress_margin = stress_results["margin"][term_index, -1]
+    
     # Pre-loan wealth (status quo)
     debt_amount_pre = sd  # Student debt only
     assets_amount_pre = oa  # Savings only
     total_amount_pre = debt_amount_pre + assets_amount_pre
     debt_percentage_pre = (debt_amount_pre / total_amount_pre) * 100 if total_amount_pre > 0 else 0
     assets_percentage_pre = 100 - debt_percentage_pre
-
+    
     # Post-loan wealth
     property_value = la + dp  # 350000 €
     debt_amount_post = sd + la  # Student debt + housing loan
@@ -887,7 +1035,7 @@ def render_financial_summary():
     total_amount_post = debt_amount_post + assets_amount_post
     debt_percentage_post = (debt_amount_post / total_amount_post) * 100 if total_amount_post > 0 else 0
     assets_percentage_post = 100 - debt_percentage_post
-
+    
     monthly_income = mi
     monthly_expenses = me  # Pre-loan includes rent
     student_payment = ms
@@ -900,6 +1048,138 @@ def render_financial_summary():
     # Payment ratios
     payment_to_income_ratio = (loan_payment / monthly_income) * 100
     
+    # Wealth section (show pre- and post-loan)
+    wealth_html = f"""
+    <div class="bank-card">
+        <div class="bank-card-header">
+            <span class="bank-card-title">Wealth</span>
+            <span class="bank-card-arrow">›</span>
+        </div>
+        <div style="display: flex; justify-content: space-between;">
+            <div style="flex: 1; padding-right: 10px;">
+                <h4>Before Loan</h4>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+                    <div style="color: #555; font-size: 14px;">Debt</div>
+                    <div style="color: #555; font-size: 14px;">Assets</div>
+                </div>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
+                    <div style="font-weight: 500; font-size: 14px;">-{debt_amount_pre:,.2f} €</div>
+                    <div style="font-weight: 500; font-size: 14px;">{assets_amount_pre:,.2f} €</div>
+                </div>
+                <div style="height: 10px; background-color: #e0e0e0; border-radius: 5px; margin: 15px 0; position: relative;">
+                    <div style="position: absolute; width: 1px; height: 16px; background-color: #333; top: -3px; left: {assets_percentage_pre}%;"></div>
+                    <div style="position: absolute; height: 100%; left: 0; width: {debt_percentage_pre}%; background-color: #555; border-radius: 5px 0 0 5px;"></div>
+                    <div style="position: absolute; height: 100%; right: 0; width: {assets_percentage_pre}%; background-color: #FF9500; border-radius: 0 5px 5px 0;"></div>
+                </div>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
+                    <div style="font-size: 13px; color: #555;">Existing student debt</div>
+                    <div style="font-size: 13px; font-weight: 500;">{sd:,.2f} €</div>
+                </div>
+            </div>
+            <div style="flex: 1; padding-left: 10px;">
+                <h4>After Loan</h4>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+                    <div style="color: #555; font-size: 14px;">Debt</div>
+                    <div style="color: #555; font-size: 14px;">Assets</div>
+                </div>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
+                    <div style="font-weight: 500; font-size: 14px;">-{debt_amount_post:,.2f} €</div>
+                    <div style="font-weight: 500; font-size: 14px;">{assets_amount_post:,.2f} €</div>
+                </div>
+                <div style="height: 10px; background-color: #e0e0e0; border-radius: 5px; margin: 15px 0; position: relative;">
+                    <div style="position: absolute; width: 1px; height: 16px; background-color: #333; top: -3px; left: {assets_percentage_post}%;"></div>
+                    <div style="position: absolute; height: 100%; left: 0; width: {debt_percentage_post}%; background-color: #555; border-radius: 5px 0 0 5px;"></div>
+                    <div style="position: absolute; height: 100%; right: 0; width: {assets_percentage_post}%; background-color: #FF9500; border-radius: 0 5px 5px 0;"></div>
+                </div>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
+                    <div style="font-size: 13px; color: #555;">Loan {lt}-year fixed</div>
+                    <div style="font-size: 13px; font-weight: 500;">{la:,.2f} €</div>
+                </div>
+                <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
+                    <div style="font-size: 13px; color: #555;">Existing student debt</div>
+                    <div style="font-size: 13px; font-weight: 500;">{sd:,.2f} €</div>
+                </div>
+            </div>
+        </div>
+    </div>
+    """
+    
+    # Everyday finance section
+    necessaries = (me - 900) * 0.6  # Adjust for rent removal
+    loan_repayment = monthly_payment + ms
+    fun_benefits = (me - 900) * 0.4
+    
+    finance_html = f"""
+    <div class="bank-card">
+        <div class="bank-card-header">
+            <span class="bank-card-title">Everyday Finance</span>
+            <span class="bank-card-arrow">›</span>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-top: 20px;">
+            <div style="text-align: center; flex: 1;">
+                <div style="font-size: 14px; color: #555; margin-bottom: 8px;">Income</div>
+                <div style="font-size: 22px; font-weight: 500; color: #4DAA57;">{monthly_income:,.2f} €</div>
+            </div>
+            <div style="text-align: center; flex: 1;">
+                <div style="font-size: 14px; color: #555; margin-bottom: 8px;">Expenditure</div>
+                <div style="font-size: 22px; font-weight: 500; color: #E63946;">-{total_expenses:,.2f} €</div>
+            </div>
+        </div>
+        <div style="height: 1px; background-color: #f0f0f0; margin: 15px 0;"></div>
+        <div class="bank-item">
+            <div class="bank-item-label">Necessaries</div>
+            <div class="bank-item-value negative-value">-{necessaries:,.2f} €</div>
+            <div class="bank-item-arrow">›</div>
+        </div>
+        <div class="bank-item">
+            <div class="bank-item-label">Loan repayment</div>
+            <div class="bank-item-value negative-value">-{loan_repayment:,.2f} €</div>
+            <div class="bank-item-arrow">›</div>
+        </div>
+        <div class="bank-item" style="border-bottom: none;">
+            <div class="bank-item-label">Fun and benefits</div>
+            <div class="bank-item-value negative-value">-{fun_benefits:,.2f} €</div>
+            <div class="bank-item-arrow">›</div>
+        </div>
+    </div>
+    """
+    
+    # Loan impact section
+    loan_html = f"""
+    <div class="bank-card">
+        <div class="bank-card-header">
+            <span class="bank-card-title">Loan Impact</span>
+            <span class="bank-card-arrow">›</span>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+            <div style="color: #555; font-size: 14px;">Monthly Payment</div>
+            <div style="font-weight: 500; font-size: 14px;">{monthly_payment:,.2f} €</div>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+            <div style="color: #555; font-size: 14px;">Payment-to-Income Ratio</div>
+            <div style="font-weight: 500; font-size: 14px;">{payment_to_income_ratio:.1f}%</div>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+            <div style="color: #555; font-size: 14px;">Loan-to-Value Ratio</div>
+            <div style="font-weight: 500; font-size: 14px;">{loan_to_value:.1f}%</div>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-bottom: 15px;">
+            <div style="color: #555; font-size: 14px;">Monthly Balance After Expenses</div>
+            <div style="font-weight: 500; font-size: 14px; color: {'#4DAA57' if monthly_balance > 0 else '#E63946'};">{monthly_balance:,.2f} €</div>
+        </div>
+        <div class="bank-notice">
+            <strong>Note:</strong> Loan service costs in relation to net income must not exceed 60%. 
+            Current ratio: <span style="color: {'#4DAA57' if payment_to_income_ratio < 40 else '#FF9500' if payment_to_income_ratio < 60 else '#E63946'};">{payment_to_income_ratio:.1f}%</span>
+            <br>
+            Stress test at {stress_rate:.1f}%: <span style="color: {'#4DAA57' if stress_margin >= 0 else '#E63946'};">{stressed_ratio:.1f}%</span>
+            ({f"passes with {stress_margin:.1f} points to spare" if stress_margin >= 0 else f"fails by {-stress_margin:.1f} points"})
+        </div>
+    </div>
+    """
+    return finance_html, wealth_html, loan_html
+
+
+def render_financial_summary():
     # Key financial indicators
     st.markdown("### Financial Overview")
     
@@ -916,134 +1196,27 @@ def render_financial_summary():
             with kpi_col4:
                 ui.metric_card(title="Overall Risk Score", content=f"{risk_score:.1f}", description=risk_category)
 
-            # Wealth section (show pre- and post-loan)
-            wealth_html = f"""
-            <div class="bank-card">
-                <div class="bank-card-header">
-                    <span class="bank-card-title">Wealth</span>
-                    <span class="bank-card-arrow">›</span>
-                </div>
-                <div style="display: flex; justify-content: space-between;">
-                    <div style="flex: 1; padding-right: 10px;">
-                        <h4>Before Loan</h4>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                            <div style="color: #555; font-size: 14px;">Debt</div>
-                            <div style="color: #555; font-size: 14px;">Assets</div>
-                        </div>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
-                            <div style="font-weight: 500; font-size: 14px;">-{debt_amount_pre:,.2f} €</div>
-                            <div style="font-weight: 500; font-size: 14px;">{assets_amount_pre:,.2f} €</div>
-                        </div>
-                        <div style="height: 10px; background-color: #e0e0e0; border-radius: 5px; margin: 15px 0; position: relative;">
-                            <div style="position: absolute; width: 1px; height: 16px; background-color: #333; top: -3px; left: {assets_percentage_pre}%;"></div>
-                            <div style="position: absolute; height: 100%; left: 0; width: {debt_percentage_pre}%; background-color: #555; border-radius: 5px 0 0 5px;"></div>
-                            <div style="position: absolute; height: 100%; right: 0; width: {assets_percentage_pre}%; background-color: #FF9500; border-radius: 0 5px 5px 0;"></div>
-                        </div>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
-                            <div style="font-size: 13px; color: #555;">Existing student debt</div>
-                            <div style="font-size: 13px; font-weight: 500;">{sd:,.2f} €</div>
-                        </div>
-                    </div>
-                    <div style="flex: 1; padding-left: 10px;">
-                        <h4>After Loan</h4>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                            <div style="color: #555; font-size: 14px;">Debt</div>
-                            <div style="color: #555; font-size: 14px;">Assets</div>
-                        </div>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 10px;">
-                            <div style="font-weight: 500; font-size: 14px;">-{debt_amount_post:,.2f} €</div>
-                            <div style="font-weight: 500; font-size: 14px;">{assets_amount_post:,.2f} €</div>
-                        </div>
-                        <div style="height: 10px; background-color: #e0e0e0; border-radius: 5px; margin: 15px 0; position: relative;">
-                            <div style="position: absolute; width: 1px; height: 16px; background-color: #333; top: -3px; left: {assets_percentage_post}%;"></div>
-                            <div style="position: absolute; height: 100%; left: 0; width: {debt_percentage_post}%; background-color: #555; border-radius: 5px 0 0 5px;"></div>
-                            <div style="position: absolute; height: 100%; right: 0; width: {assets_percentage_post}%; background-color: #FF9500; border-radius: 0 5px 5px 0;"></div>
-                        </div>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
-                            <div style="font-size: 13px; color: #555;">Loan {lt}-year fixed</div>
-                            <div style="font-size: 13px; font-weight: 500;">{la:,.2f} €</div>
-                        </div>
-                        <div style="display: flex; justify-content: space-between; margin-bottom: 3px;">
-                            <div style="font-size: 13px; color: #555;">Existing student debt</div>
-                            <div style="font-size: 13px; font-weight: 500;">{sd:,.2f} €</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-            """
-
-            # Everyday finance section
-            necessaries = (me - 900) * 0.6  # Adjust for rent removal
-            loan_repayment = monthly_payment + ms
-            fun_benefits = (me - 900) * 0.4
-            
-            finance_html = f"""
-            <div class="bank-card">
-                <div class="bank-card-header">
-                    <span class="bank-card-title">Everyday Finance</span>
-                    <span class="bank-card-arrow">›</span>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-top: 20px;">
-                    <div style="text-align: center; flex: 1;">
-                        <div style="font-size: 14px; color: #555; margin-bottom: 8px;">Income</div>
-                        <div style="font-size: 22px; font-weight: 500; color: #4DAA57;">{monthly_income:,.2f} €</div>
-                    </div>
-                    <div style="text-align: center; flex: 1;">
-                        <div style="font-size: 14px; color: #555; margin-bottom: 8px;">Expenditure</div>
-                        <div style="font-size: 22px; font-weight: 500; color: #E63946;">-{total_expenses:,.2f} €</div>
-                    </div>
-                </div>
-                <div style="height: 1px; background-color: #f0f0f0; margin: 15px 0;"></div>
-                <div class="bank-item">
-                    <div class="bank-item-label">Necessaries</div>
-                    <div class="bank-item-value negative-value">-{necessaries:,.2f} €</div>
-                    <div class="bank-item-arrow">›</div>
-                </div>
-                <div class="bank-item">
-                    <div class="bank-item-label">Loan repayment</div>
-                    <div class="bank-item-value negative-value">-{loan_repayment:,.2f} €</div>
-                    <div class="bank-item-arrow">›</div>
-                </div>
-                <div class="bank-item" style="border-bottom: none;">
-                    <div class="bank-item-label">Fun and benefits</div>
-                    <div class="bank-item-value negative-value">-{fun_benefits:,.2f} €</div>
-                    <div class="bank-item-arrow">›</div>
-                </div>
-            </div>
-            """
-
-            # Loan impact section
-            loan_html = f"""
-            <div class="bank-card">
-                <div class="bank-card-header">
-                    <span class="bank-card-title">Loan Impact</span>
-                    <span class="bank-card-arrow">›</span>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                    <div style="color: #555; font-size: 14px;">Monthly Payment</div>
-                    <div style="font-weight: 500; font-size: 14px;">{monthly_payment:,.2f} €</div>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                    <div style="color: #555; font-size: 14px;">Payment-to-Income Ratio</div>
-                    <div style="font-weight: 500; font-size: 14px;">{payment_to_income_ratio:.1f}%</div>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
-                    <div style="color: #555; font-size: 14px;">Loan-to-Value Ratio</div>
-                    <div style="font-weight: 500; font-size: 14px;">{loan_to_value:.1f}%</div>
-                </div>
-                <div style="display: flex; justify-content: space-between; margin-bottom: 15px;">
-                    <div style="color: #555; font-size: 14px;">Monthly Balance After Expenses</div>
-                    <div style="font-weight: 500; font-size: 14px; color: {'#4DAA57' if monthly_balance > 0 else '#E63946'};">{monthly_balance:,.2f} €</div>
-                </div>
-                <div class="bank-notice">
-                    <strong>Note:</strong> Loan service costs in relation to net income must not exceed 60%. 
-                    Current ratio: <span style="color: {'#4DAA57' if payment_to_income_ratio < 40 else '#FF9500' if payment_to_income_ratio < 60 else '#E63946'};">{payment_to_income_ratio:.1f}%</span>
-                </div>
-            </div>
-            """
+            finance_html, wealth_html, loan_html = flow["overview_cards_html"]
             st.html(finance_html)
             st.html(wealth_html)
             st.html(loan_html)
+            
+            with st.expander("Regulatory Stress Test"):
+                st.slider("Stress Rate (%)", min_value=4.0, max_value=10.0, value=STRESS_RATE, step=0.5, key="stress_rate")
+                stress = flow["stress_results"]
+                stress_df = pd.DataFrame({
+                    "Term (years)": stress_terms,
+                    "Stressed Payment": [f"€{payment:,.0f}" for payment in stress["stressed_payment"]],
+                    "Service Cost to Income": [f"{ratio:.1f}%" for ratio in stress["stressed_ratio"]],
+                })
+                for cap_index, cap in enumerate(stress["caps"]):
+                    stress_df[f"{cap:.0f}% Cap"] = [
+                        f"Pass (+{margin:.1f} pts)" if margin >= 0 else f"Fail ({margin:.1f} pts)"
+                        for margin in stress["margin"][:, cap_index]
+                    ]
+                st.dataframe(stress_df, hide_index=True, use_container_width=True, height=300)
+                st.caption(f"The housing loan is repaid at the stress rate over its term, capped at {STRESS_TERM_YEARS} years, "
+                           f"plus your other loan payments, compared with net income.")
 
     with col2:
         with st.container(border=True):
@@ -1140,31 +1313,23 @@ def render_financial_summary():
         with st.expander("Press to change financial parameters", icon=":material/settings:", expanded=True):
             col3, col4 = st.columns(2)
             with col3:
-                lt = st.slider("Loan Term (years)", min_value=10, max_value=30, value=lt, key="global_loan_term")
+                st.slider("Loan Term (years)", min_value=10, max_value=30, value=financial_vars["loan_term"], key="global_loan_term")
             with col4:
-                ir = st.slider("Interest Rate (%)", min_value=1.0, max_value=10.0, value=ir, step=0.1, key="global_interest_rate")
+                st.slider("Interest Rate (%)", min_value=1.0, max_value=10.0, value=financial_vars["interest_rate"], step=0.1, key="global_interest_rate")
 
             col1, col2 = st.columns(2)
             with col1:
-                mi = st.number_input("Monthly Net Income (€)", value=mi, key="global_monthly_income")
-                me = st.number_input("Monthly Expenses (€)", value=me, key="global_monthly_expenses")
-                sd = st.number_input("Existing Student Debt (€)", value=sd, key="global_student_debt")
-                ms = st.number_input("Monthly Student Payment (€)", value=ms, key="global_student_payment")
+                st.number_input("Monthly Net Income (€)", value=financial_vars["monthly_income"], key="global_monthly_income")
+                st.number_input("Monthly Expenses (€)", value=financial_vars["monthly_expenses"], key="global_monthly_expenses")
+                st.number_input("Existing Student Debt (€)", value=financial_vars["existing_student_debt"], key="global_student_debt")
+                st.number_input("Monthly Student Payment (€)", value=financial_vars["monthly_student_payment"], key="global_student_payment")
             with col2:
-                la = st.number_input("Loan Amount (€)", value=la, key="global_loan_amount")
-                dp = st.number_input("Down Payment (€)", value=dp, key="global_down_payment")
-                oa = st.number_input("Other Assets (€)", value=oa, key="global_other_assets")
-
-            # Recalculate financial metrics
-            monthly_payment = (la * (ir/100/12) * (1 + ir/100/12)**(lt*12)) / ((1 + ir/100/12)**(lt*12) - 1)
-            loan_to_value = (la / (la + dp)) * 100
-            debt_to_income = ((monthly_payment + ms) / mi) * 100
-            disposable_income = mi - me - monthly_payment - ms
-            asset_to_loan_ratio = (oa / la) * 100
-            total_monthly_housing_cost = monthly_payment + monthly_maintenance + renovation_cost_monthly
-            total_housing_ratio = (total_monthly_housing_cost / mi) * 100
-            risk_score = (debt_to_income * 0.4 + loan_to_value * 0.4 - (disposable_income/mi)*20 - (asset_to_loan_ratio*0.1))
-            risk_category = "Low Risk" if risk_score < 20 else "Moderate Risk" if risk_score < 35 else "High Risk"
+                st.number_input("Loan Amount (€)", value=financial_vars["loan_amount"], key="global_loan_amount")
+                st.number_input("Down Payment (€)", value=financial_vars["down_payment"], key="global_down_payment")
+                st.number_input("Other Assets (€)", value=financial_vars["other_assets"], key="global_other_assets")
+
+            # The widget values were already read from session state at the top of the run,
+            # so the cached profile above is the one every tab displays
 
             st.markdown("""
             <div class="bank-notice" style="margin-top: 15px;">
@@ -1177,55 +1342,207 @@ def render_financial_summary():
             st.markdown("</div>", unsafe_allow_html=True)
 
 
+# Payment analysis figures only depend on the schedule, so they survive unrelated input changes
+@flow.node("schedule", "la")
+def payment_pie_figure(schedule, la):
+    # Create a pie chart with Plotly using go.Pie directly for better color control
+    principal_interest_data = [
+        {"Category": "Principal", "Amount": la},
+        {"Category": "Interest", "Amount": float(schedule["total_interest"])}
+    ]
+
+    principal_interest_df = pd.DataFrame(principal_interest_data)
+
+    # Use go.Pie instead of px.pie for more direct control of colors
+    fig_pie = go.Figure(data=[go.Pie(
+        labels=principal_interest_df["Category"],
+        values=principal_interest_df["Amount"],
+        hole=0.4,
+        marker=dict(colors=[colors['primary'], colors['secondary']]),
+        textinfo='percent+label'
+    )])
+
+    fig_pie.update_layout(
+        height=350,
+        margin=dict(l=20, r=20, t=30, b=0),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+    )
+
+    fig_pie.update_traces(
+        textinfo='percent+label',
+        textfont_size=14
+    )
+    return fig_pie
+
+@flow.node("schedule")
+def yearly_breakdown_figure(schedule):
+    # Create area chart for amortization - updated with brand colors
+    fig_area = go.Figure()
+
+    fig_area.add_trace(go.Scatter(
+        x=schedule["year"],
+        y=schedule["yearly_principal"],
+        name="Principal",
+        mode='none',
+        fill='tonexty',
+        fillcolor=colors['primary'],
+        line=dict(width=0)
+    ))
+
+    fig_area.add_trace(go.Scatter(
+        x=schedule["year"],
+        y=schedule["yearly_principal"] + schedule["yearly_interest"],
+        name="Interest",
+        mode='none',
+        fill='tonexty',
+        fillcolor=colors['secondary'],
+        line=dict(width=0)
+    ))
+
+    fig_area.update_layout(
+        height=400,
+        title="Yearly Payment Breakdown",
+        xaxis_title="Year",
+        yaxis_title="Amount (€)",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(l=20, r=20, t=70, b=40)
+    )
+    return fig_area
+
+@flow.node("schedule")
+def balance_figure(schedule):
+    # Remaining balance chart - updated with brand colors
+    fig_balance = go.Figure()
+
+    fig_balance.add_trace(go.Scatter(
+        x=schedule["year"],
+        y=schedule["yearly_balance"],
+        name="Remaining Balance",
+        line=dict(color=colors['primary'], width=3),
+        mode="lines+markers"
+    ))
+
+    fig_balance.update_layout(
+        height=400,
+        title="Remaining Loan Balance",
+        xaxis_title="Year",
+        yaxis_title="Remaining Balance (€)",
+        margin=dict(l=20, r=20, t=70, b=40)
+    )
+    return fig_balance
+
+# Extra monthly amounts shown on the prepayment savings curve
+prepayment_amounts = np.arange(0, 1001, 25)
+
+@flow.node("schedule", "la", "dp", "ir", "lt", "payment_rate_type", "payment_repayment_type")
+def loan_milestones(schedule, la, dp, ir, lt, payment_rate_type, payment_repayment_type):
+    # Fixed-rate annuity milestones are solved in closed form; other schedules are looked up on their balance path
+    property_value = la + dp
+    if payment_rate_type == "Fixed" and payment_repayment_type == "Annuity":
+        return {
+            "half_paid": balance_milestone_month(la, ir, lt, la / 2),
+            "ltv_60": ltv_milestone_month(la, ir, lt, property_value, 60),
+            "crossover": principal_crossover_month(la, ir, lt),
+        }
+    return {
+        "half_paid": first_month_at_or_below(schedule["balance"], la / 2),
+        "ltv_60": 0 if la <= property_value * 0.6 else first_month_at_or_below(schedule["balance"], property_value * 0.6),
+        "crossover": np.argmax(schedule["principal"] >= schedule["interest"]) + 1,
+    }
+
+@flow.node("la", "ir", "lt")
+def payment_statement(la, ir, lt):
+    cents = amortization_schedule_cents(la, ir, lt)
+    return pd.DataFrame({
+        "Month": cents["month"],
+        "Payment (€)": cents["payments"] / 100,
+        "Interest (€)": cents["interest"] / 100,
+        "Principal (€)": cents["principal"] / 100,
+        "Balance (€)": cents["balance"] / 100,
+    }).style.format({
+        "Payment (€)": "{:,.2f}", "Interest (€)": "{:,.2f}", "Principal (€)": "{:,.2f}", "Balance (€)": "{:,.2f}"
+    })
+
+@flow.node("la", "ir", "lt")
+def early_payment_savings(la, ir, lt):
+    return prepayment_schedule(la, ir, lt, [100, 200])
+
+@flow.node("la", "ir", "lt", "prepayment_lump_sum", "prepayment_lump_year")
+def prepayment_curve_figure(la, ir, lt, prepayment_lump_sum, prepayment_lump_year):
+    lump_sums = {prepayment_lump_year * 12: prepayment_lump_sum} if prepayment_lump_sum else None
+    prepayment = prepayment_schedule(la, ir, lt, prepayment_amounts, lump_sums)
+
+    fig_savings = go.Figure()
+    fig_savings.add_trace(go.Scatter(
+        x=prepayment_amounts,
+        y=prepayment["interest_saved"],
+        name="Interest Saved",
+        line=dict(color=colors['primary'], width=3),
+        hovertemplate="Extra €%{x}/month<br>Interest saved: €%{y:,.0f}<extra></extra>"
+    ))
+    fig_savings.add_trace(go.Scatter(
+        x=prepayment_amounts,
+        y=prepayment["months_saved"] / 12,
+        name="Years Saved",
+        yaxis="y2",
+        line=dict(color=colors['secondary'], width=2, dash="dash"),
+        hovertemplate="Extra €%{x}/month<br>Paid off %{y:.1f} years early<extra></extra>"
+    ))
+    fig_savings.update_layout(
+        height=350,
+        xaxis_title="Extra Monthly Payment (€)",
+        yaxis=dict(title="Interest Saved (€)"),
+        yaxis2=dict(title="Years Saved", overlaying="y", side="right", showgrid=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+        margin=dict(l=20, r=20, t=40, b=40)
+    )
+    return fig_savings
+
 def render_payment_analysis():
     st.subheader("Payment Analysis")
     
-    # Create the loan amortization schedule
-    loan_amount = financial_vars["loan_amount"]
-    interest_rate = financial_vars["interest_rate"]
-    loan_term_years = financial_vars["loan_term"]
+    # Fixed rate, or reference rate + margin with the payment recalculated every 12 months
+    rate_col1, rate_col2, rate_col3, rate_col4 = st.columns(4)
+    with rate_col1:
+        st.radio("Repayment Type", list(REPAYMENT_TYPES), key="payment_repayment_type")
+    with rate_col2:
+        st.radio("Interest Rate Type", ["Fixed", "Variable (12-month reset)"], key="payment_rate_type")
+    if payment_rate_type != "Fixed":
+        with rate_col3:
+            st.slider("Loan Margin (%)", min_value=0.3, max_value=2.0, value=0.8, step=0.05, key="payment_margin")
+        with rate_col4:
+            st.slider("Long-Run Reference Rate (%)", min_value=0.0, max_value=6.0, value=2.5, step=0.1, key="payment_long_run_rate")
     
-    # Calculate monthly payment
-    monthly_interest_rate = interest_rate / 100 / 12
-    loan_term_months = loan_term_years * 12
-    monthly_payment = (loan_amount * monthly_interest_rate * (1 + monthly_interest_rate) ** loan_term_months) / \
-                     ((1 + monthly_interest_rate) ** loan_term_months - 1)
-    
-    # Generate amortization data
-    amortization_data = []
-    remaining_balance = loan_amount
-    
-    for month in range(1, loan_term_months + 1):
-        interest_payment = remaining_balance * monthly_interest_rate
-        principal_payment = monthly_payment - interest_payment
-        remaining_balance -= principal_payment
-        
-        # Only store data for each year (to reduce data points)
-        if month % 12 == 0 or month == 1:
-            year = (month - 1) // 12 + 1
-            amortization_data.append({
-                "Year": year,
-                "Month": month,
-                "Payment": monthly_payment,
-                "Principal": principal_payment,
-                "Interest": interest_payment,
-                "Remaining Balance": remaining_balance
-            })
+    # Create the loan amortization schedule
+    loan_amount = la
+    interest_rate = ir
+    loan_term_years = lt
     
-    amortization_df = pd.DataFrame(amortization_data)
+    # One vectorized pass gives the monthly schedule and the yearly rollups
+    schedule = flow["schedule"]
+    monthly_payment = float(schedule["payment"])
+    average_payment = float(schedule["payments"].mean())
     
     # Calculate total interest
-    total_interest = monthly_payment * loan_term_months - loan_amount
+    total_interest = float(schedule["total_interest"])
     interest_to_principal_ratio = total_interest / loan_amount * 100
     
     # Payment distribution metrics
     col1, col2, col3 = st.columns(3)
     
     with col1:
+        if payment_repayment_type == "Equal Principal":
+            payment_description = f"First Payment, Falling to €{schedule['payments'][int(schedule['months']) - 1]:.0f}"
+        elif payment_rate_type == "Fixed":
+            payment_description = "Fixed Monthly Payment"
+        elif payment_repayment_type == "Fixed Installment":
+            payment_description = "Fixed Installment, the Term Adjusts to Rates"
+        else:
+            payment_description = f"First Year, €{schedule['reset_payments'].min():.0f}-€{schedule['reset_payments'].max():.0f} Over the Loan"
         ui.metric_card(
             title="Monthly Payment",
             content=f"€{monthly_payment:.0f}",
-            description="Fixed Monthly Payment"
+            description=payment_description
         )
     
     with col2:
@@ -1236,55 +1553,29 @@ def render_payment_analysis():
         )
     
     with col3:
+        balloon = float(schedule.get("balloon", 0.0))
         ui.metric_card(
             title="Total Amount Paid",
-            content=f"€{(monthly_payment * loan_term_months):,.0f}",
-            description=f"Over {loan_term_years} Years"
+            content=f"€{float(schedule['total_paid']):,.0f}",
+            description=f"Over {int(schedule['months']) / 12:g} Years"
+                        + (f", incl. €{balloon:,.0f} Due With the Last Payment" if balloon >= 1 else "")
         )
     
     # Create visualization tabs
-    viz_tab1, viz_tab2 = st.tabs(["Payment Distribution", "Amortization Schedule"])
+    viz_tab1, viz_tab2, viz_tab3 = st.tabs(["Payment Distribution", "Amortization Schedule", "Payment Statement"])
     
     with viz_tab1:
         # Payment Distribution - Principal vs Interest
         
-        # Create a pie chart with Plotly using go.Pie directly for better color control
-        principal_interest_data = [
-            {"Category": "Principal", "Amount": loan_amount},
-            {"Category": "Interest", "Amount": total_interest}
-        ]
-        
-        principal_interest_df = pd.DataFrame(principal_interest_data)
-        
-        # Use go.Pie instead of px.pie for more direct control of colors
-        fig_pie = go.Figure(data=[go.Pie(
-            labels=principal_interest_df["Category"],
-            values=principal_interest_df["Amount"],
-            hole=0.4,
-            marker=dict(colors=[colors['primary'], colors['secondary']]),
-            textinfo='percent+label'
-        )])
-        
-        fig_pie.update_layout(
-            height=350,
-            margin=dict(l=20, r=20, t=30, b=0),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
-        )
-        
-        fig_pie.update_traces(
-            textinfo='percent+label',
-            textfont_size=14
-        )
-        
         # First year payment breakdown
-        first_year_interest = sum(amortization_df[amortization_df["Year"] == 1]["Interest"])
-        first_year_principal = sum(amortization_df[amortization_df["Year"] == 1]["Principal"])
+        first_year_interest = schedule["yearly_interest"][0]
+        first_year_principal = schedule["yearly_principal"][0]
         first_year_total = first_year_interest + first_year_principal
         
         col_pie, col_first_year = st.columns([3, 2])
         
         with col_pie:
-            st.plotly_chart(fig_pie, use_container_width=True)
+            st.plotly_chart(flow["payment_pie_figure"], use_container_width=True)
         
         with col_first_year:
             
@@ -1309,103 +1600,33 @@ def render_payment_analysis():
     
     with viz_tab2:
         # Amortization Schedule
-        
-        # Create yearly payment breakdown data
-        yearly_data = []
-        current_principal = loan_amount
-        
-        for year in range(1, loan_term_years + 1):
-            # Calculate payments for this year
-            yearly_interest = 0
-            yearly_principal = 0
-            
-            for _ in range(12):
-                interest_payment = current_principal * monthly_interest_rate
-                principal_payment = monthly_payment - interest_payment
-                
-                yearly_interest += interest_payment
-                yearly_principal += principal_payment
-                current_principal -= principal_payment
-            
-            yearly_data.append({
-                "Year": year,
-                "Interest": yearly_interest,
-                "Principal": yearly_principal,
-                "Remaining Balance": current_principal
-            })
-        
-        yearly_df = pd.DataFrame(yearly_data)
-        
-        # Create area chart for amortization - updated with brand colors
-        fig_area = go.Figure()
-        
-        fig_area.add_trace(go.Scatter(
-            x=yearly_df["Year"],
-            y=yearly_df["Principal"],
-            name="Principal",
-            mode='none',
-            fill='tonexty',
-            fillcolor=colors['primary'],
-            line=dict(width=0)
-        ))
-        
-        fig_area.add_trace(go.Scatter(
-            x=yearly_df["Year"],
-            y=yearly_df["Principal"] + yearly_df["Interest"],
-            name="Interest",
-            mode='none',
-            fill='tonexty',
-            fillcolor=colors['secondary'],
-            line=dict(width=0)
-        ))
-        
-        fig_area.update_layout(
-            height=400,
-            title="Yearly Payment Breakdown",
-            xaxis_title="Year",
-            yaxis_title="Amount (€)",
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
-            margin=dict(l=20, r=20, t=70, b=40)
-        )
-        
         col_area, col_balance = st.columns([3, 2])
         
         with st.container(border=True):
             with col_area:
-                st.plotly_chart(fig_area, use_container_width=True)
+                st.plotly_chart(flow["yearly_breakdown_figure"], use_container_width=True)
             
             with col_balance:
-                # Remaining balance chart - updated with brand colors
-                fig_balance = go.Figure()
-                
-                fig_balance.add_trace(go.Scatter(
-                    x=yearly_df["Year"],
-                    y=yearly_df["Remaining Balance"],
-                    name="Remaining Balance",
-                    line=dict(color=colors['primary'], width=3),
-                    mode="lines+markers"
-                ))
-                
-                fig_balance.update_layout(
-                    height=400,
-                    title="Remaining Loan Balance",
-                    xaxis_title="Year",
-                    yaxis_title="Remaining Balance (€)",
-                    margin=dict(l=20, r=20, t=70, b=40)
-                )
-                
-                st.plotly_chart(fig_balance, use_container_width=True)
+                st.plotly_chart(flow["balance_figure"], use_container_width=True)
+    
+    with viz_tab3:
+        # Month-by-month statement computed in whole cents
+        if payment_rate_type == "Fixed" and payment_repayment_type == "Annuity":
+            st.dataframe(flow["payment_statement"], hide_index=True, use_container_width=True, height=400)
+            st.caption("Monthly interest is rounded to the cent and the final payment clears the remaining balance.")
+        else:
+            st.info("The payment statement is available for fixed-rate annuity loans.")
     
     # Additional insights about the loan
     insight_col1, insight_col2 = st.columns(2)
     
     with insight_col1:
-        # Calculate when 50% of the loan is paid off
-        half_paid_year = 0
-        for i, row in yearly_df.iterrows():
-            if row["Remaining Balance"] <= loan_amount / 2:
-                half_paid_year = row["Year"]
-                break
+        # When 50% of the loan is paid off, LTV drops under 60% and principal overtakes interest
+        milestones = flow["loan_milestones"]
+        half_paid_year = -(-int(milestones["half_paid"]) // 12)
+        ltv_60_year = -(-int(milestones["ltv_60"]) // 12)
+        crossover_year = -(-int(milestones["crossover"]) // 12)
+        ltv_60_text = "Already" if ltv_60_year == 0 else f"Year {ltv_60_year}"
         
         st.html(f"""
         <div class="bank-card">
@@ -1419,61 +1640,144 @@ def render_payment_analysis():
                 <div style="font-weight: 500; font-size: 14px;">Year {half_paid_year}</div>
             </div>
             
+            <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
+                <div style="color: #555; font-size: 14px;">Loan-to-Value Below 60%:</div>
+                <div style="font-weight: 500; font-size: 14px;">{ltv_60_text}</div>
+            </div>
+            
             <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
                 <div style="color: #555; font-size: 14px;">Interest Equals Principal:</div>
-                <div style="font-weight: 500; font-size: 14px;">Year {min(loan_term_years // 2 + 2, loan_term_years)}</div>
+                <div style="font-weight: 500; font-size: 14px;">Year {crossover_year}</div>
             </div>
             
             <div style="height: 1px; background-color: #f0f0f0; margin: 15px 0;"></div>
             
             <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
                 <div style="color: #555; font-size: 14px;">Average Monthly Payment:</div>
-                <div style="font-weight: 500; font-size: 14px;">€{monthly_payment:.0f}</div>
+                <div style="font-weight: 500; font-size: 14px;">€{average_payment:.0f}</div>
             </div>
             
             <div style="display: flex; justify-content: space-between; margin-bottom: 5px;">
                 <div style="color: #555; font-size: 14px;">Payment-to-Income Ratio:</div>
-                <div style="font-weight: 500; font-size: 14px; color: {'#4DAA57' if monthly_payment / financial_vars['monthly_income'] * 100 < 30 else '#FF9500' if monthly_payment / financial_vars['monthly_income'] * 100 < 40 else '#E63946'};">
-                    {monthly_payment / financial_vars['monthly_income'] * 100:.1f}%
+                <div style="font-weight: 500; font-size: 14px; color: {'#4DAA57' if monthly_payment / mi * 100 < 30 else '#FF9500' if monthly_payment / mi * 100 < 40 else '#E63946'};">
+                    {monthly_payment / mi * 100:.1f}%
                 </div>
             </div>
         </div>
         """)
     
     with insight_col2:
-        # Early payment scenarios
-        st.html(f"""
-        <div class="bank-card">
-            <div class="bank-card-header">
-                <span class="bank-card-title">Early Payment Savings</span>
-                <span class="bank-card-arrow">›</span>
+        # Early payment scenarios, simulated exactly for a fixed-rate annuity whatever loan type is selected above
+        early_payments = flow["early_payment_savings"]
+        fixed_annuity = payment_rate_type == "Fixed" and payment_repayment_type == "Annuity"
+        extra_cards = "" if fixed_annuity else f"""
+            <div style="font-size: 12px; color: #666; margin-bottom: 10px;">
+                Shown for a fixed-rate annuity at {interest_rate:.1f}%, not for your {'fixed' if payment_rate_type == 'Fixed' else 'variable'}-rate {payment_repayment_type.lower()} loan.
             </div>
-            
+            """
+        for i, extra in enumerate(early_payments["extra_monthly"]):
+            extra_cards += f"""
             <div class="bank-widget" style="margin-bottom: 10px;">
                 <div style="font-size: 13px; margin-bottom: 5px;">
-                    If you pay an extra €100/month:
+                    If you pay an extra €{extra:.0f}/month:
                 </div>
                 <div style="font-weight: 500; margin-bottom: 5px;">
-                    Save ~€{(total_interest * 0.15):.0f} in interest
+                    Save €{early_payments['interest_saved'][i]:,.0f} in interest
                 </div>
                 <div style="font-size: 12px; color: #666;">
-                    Pay off ~{loan_term_years * 0.9:.1f} years early
+                    Pay off {early_payments['months_saved'][i] / 12:.1f} years early
                 </div>
             </div>
-            
-            <div class="bank-widget" style="margin-bottom: 10px;">
-                <div style="font-size: 13px; margin-bottom: 5px;">
-                    If you pay an extra €200/month:
-                </div>
-                <div style="font-weight: 500; margin-bottom: 5px;">
-                    Save ~€{(total_interest * 0.25):.0f} in interest
-                </div>
-                <div style="font-size: 12px; color: #666;">
-                    Pay off ~{loan_term_years * 0.75:.1f} years early
-                </div>
+            """
+        
+        st.html(f"""
+        <div class="bank-card">
+            <div class="bank-card-header">
+                <span class="bank-card-title">Early Payment Savings (Fixed-Rate Annuity)</span>
+                <span class="bank-card-arrow">›</span>
             </div>
+            {extra_cards}
         </div>
         """)
+    
+    # Savings curve over a range of extra payments, optionally with a one-off lump sum
+    with st.container(border=True):
+        st.markdown("### Extra Payment Savings (Fixed-Rate Annuity)")
+        lump_col1, lump_col2 = st.columns(2)
+        with lump_col1:
+            st.number_input("One-Off Lump Sum (€)", min_value=0, max_value=int(loan_amount), value=0, step=1000, key="prepayment_lump_sum")
+        with lump_col2:
+            st.slider("Lump Sum Paid in Year", min_value=1, max_value=int(loan_term_years), value=5, key="prepayment_lump_year")
+        st.plotly_chart(flow["prepayment_curve_figure"], use_container_width=True)
+        st.caption(f"Extra payments go straight to principal of a fixed-rate annuity at the current {interest_rate:.1f}% rate; the monthly payment stays the same and the loan ends early."
+                   + ("" if fixed_annuity else " The repayment and rate type selected above are not modelled here."))
+
+
+@st.fragment
+def render_refinancing_analyzer():
+    st.subheader("Refinancing Analyzer")
+    st.markdown("""
+    <div class="bank-widget">
+        Compare moving the loan to a new rate at every possible month of the term. Refinancing pays off when the 
+        lower payment has covered the fees; the curve shows what is left over for the rest of the loan.
+    </div>
+    """, unsafe_allow_html=True)
+    
+    refi_col1, refi_col2, refi_col3 = st.columns(3)
+    with refi_col1:
+        new_reference_rate = st.slider("New Reference Rate (%)", min_value=0.0, max_value=8.0, value=min(max(round(ir - 1.5, 1), 0.0), 8.0), step=0.1, key="refi_reference_rate")
+    with refi_col2:
+        new_margin = st.slider("New Loan Margin (%)", min_value=0.3, max_value=2.0, value=0.6, step=0.05, key="refi_margin")
+    with refi_col3:
+        refinance_fees = st.number_input("Refinancing Fees (€)", min_value=0, max_value=20000, value=1500, step=100, key="refi_fees")
+    
+    new_rate = new_reference_rate + new_margin
+    refinance = refinance_analysis(la, ir, lt, new_rate, refinance_fees)
+    refinance_years = refinance["month"] / 12
+    
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    with metric_col1:
+        ui.metric_card(
+            title="Refinance Now",
+            content=f"€{refinance['net_savings'][0]:,.0f}",
+            description=f"Net Savings at {new_rate:.2f}% vs {ir:.2f}%"
+        )
+    with metric_col2:
+        break_even = refinance["break_even_months"][0]
+        ui.metric_card(
+            title="Break-Even",
+            content=f"{break_even:.0f} months" if np.isfinite(break_even) else "Never",
+            description="Until the Fees Are Recovered"
+        )
+    with metric_col3:
+        last_month = refinance["last_worthwhile_month"]
+        ui.metric_card(
+            title="Worth It Until",
+            content=f"Year {last_month // 12 + 1}" if last_month >= 0 else "Not Worth It",
+            description="Latest Refinance That Covers the Fees"
+        )
+    
+    fig_refi = go.Figure()
+    fig_refi.add_trace(go.Scatter(
+        x=refinance_years,
+        y=refinance["net_savings"],
+        name="Net Savings",
+        line=dict(color=colors['primary'], width=3),
+        fill="tozeroy",
+        fillcolor="rgba(255, 149, 0, 0.15)",
+        hovertemplate="Refinance in year %{x:.1f}<br>Net savings: €%{y:,.0f}<extra></extra>"
+    ))
+    fig_refi.add_hline(y=0, line=dict(color=colors['slate'], width=1, dash="dash"))
+    fig_refi.update_layout(
+        height=350,
+        xaxis_title="Refinance After (years)",
+        yaxis_title="Net Savings Over Remaining Term (€)",
+        margin=dict(l=20, r=20, t=20, b=40),
+        font=dict(family="Calibri Light"),
+        plot_bgcolor="white"
+    )
+    st.plotly_chart(fig_refi, use_container_width=True)
+    st.caption(f"The new loan keeps the remaining term; {len(refinance['month'])} refinance months are evaluated together.")
 
 
 def render_enhanced_property_details():
@@ -1637,6 +1941,14 @@ def render_enhanced_renovation_summary():
     
     st.html(renovations_html)
 
+@flow.node("la", "ir")
+def term_costs(la, ir):
+    terms = np.array([15, 20, 25, 30])
+    costs = payment_grid(la, ir, terms)
+    costs["effective_rate"] = effective_annual_rate(la, ir, terms, loan_fees["arrangement_fee"], loan_fees["monthly_fee"])
+    return costs
+
+@st.fragment
 def render_loan_calculator():
     st.subheader("Personal Budget Calculator")
     
@@ -1657,11 +1969,7 @@ def render_loan_calculator():
             </div>
                     """, unsafe_allow_html=True)
         
-    monthly_interest = ir / 100 / 12
-    num_payments = lt * 12
-    monthly_payment = (la * monthly_interest * (1 + monthly_interest) ** num_payments) / (
-        (1 + monthly_interest) ** num_payments - 1
-    )
+    monthly_payment = annuity_payment(la, ir, lt)
     
     payment_to_income = (monthly_payment / mi) * 100
     total_debt_ratio = ((monthly_payment + ol) / mi) * 100
@@ -1748,10 +2056,6 @@ def render_loan_calculator():
             
             st.markdown('</div>', unsafe_allow_html=True)
     
-    monthly_payment = (la * monthly_interest * (1 + monthly_interest) ** num_payments) / (
-        (1 + monthly_interest) ** num_payments - 1
-    )
-    
     net_income_after_expenses = monthly_income - living_expenses - other_expenses - savings_investments - current_housing
     leftover_after_loan = net_income_after_expenses - monthly_payment + current_housing
     
@@ -1787,19 +2091,15 @@ def render_loan_calculator():
             </div>
             """)
             
-            terms = [15, 20, 25, 30]
-            term_data = []
-            for term in terms:
-                term_monthly = (la * (ir/100/12) * (1 + ir/100/12)**(term*12)) / ((1 + ir/100/12)**(term*12) - 1)
-                term_total_interest = term_monthly * term * 12 - la
-                term_data.append({
-                    "Term (years)": term, 
-                    "Monthly Payment": term_monthly, 
-                    "Total Interest": term_total_interest,
-                    "Total Cost": term_monthly * term * 12,
-                })
-            
-            term_df = pd.DataFrame(term_data)
+            terms = np.array([15, 20, 25, 30])
+            term_costs = flow["term_costs"]
+            term_df = pd.DataFrame({
+                "Term (years)": terms,
+                "Monthly Payment": term_costs["payment"],
+                "Total Interest": term_costs["total_interest"],
+                "Total Cost": term_costs["total_paid"],
+                "Effective Rate": term_costs["effective_rate"],
+            })
             
             # Create an enhanced HTML table for loan term options
             term_table_html = """
@@ -1837,7 +2137,9 @@ def render_loan_calculator():
             term_display["Monthly Payment"] = term_display["Monthly Payment"].round().astype(int).apply(lambda x: f"€{x:,}")
             term_display["Total Interest"] = term_display["Total Interest"].round().astype(int).apply(lambda x: f"€{x:,}")
             term_display["Total Cost"] = term_display["Total Cost"].round().astype(int).apply(lambda x: f"€{x:,}")
+            term_display["Effective Rate"] = term_display["Effective Rate"].apply(lambda x: f"{x:.2f}%")
             ui.table(term_display)
+            st.caption(f"Effective rates include a €{loan_fees['arrangement_fee']:,} arrangement fee and a €{loan_fees['monthly_fee']} monthly fee.")
             
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -2029,6 +2331,79 @@ def render_enhanced_interest_scenario_card(scenario, base_scenario=None):
     
     return html
 
+# Define the interest rate increase scenarios
+rate_scenarios = [2, 4, 6]
+
+# Discretionary budget the rate scenarios can be absorbed from; users can edit it in the risk simulator
+default_budget_categories = [
+    {"Category": "Dining Out", "Monthly Budget": 200, "Minimum": 0, "Priority": "Low"},
+    {"Category": "Entertainment", "Monthly Budget": 150, "Minimum": 0, "Priority": "Low"},
+    {"Category": "Vacation Savings", "Monthly Budget": 180, "Minimum": 0, "Priority": "Medium"},
+    {"Category": "Shopping", "Monthly Budget": 120, "Minimum": 0, "Priority": "Low"},
+    {"Category": "Hobbies", "Monthly Budget": 100, "Minimum": 0, "Priority": "Medium"},
+    {"Category": "Fitness", "Monthly Budget": 80, "Minimum": 0, "Priority": "High"},
+]
+
+@st.cache_data(max_entries=16, show_spinner="Simulating rate paths...")
+def load_rate_risk_simulation(la, lt, mi, start_reference_rate, margin, long_run_rate, volatility, n_paths,
+                              repayment_type="Annuity"):
+    """Memoized Monte Carlo of the variable-rate payment, using a process pool for large path counts"""
+    processes = min(4, os.cpu_count() or 1) if n_paths >= 50000 else None
+    return simulate_rate_risk(la, lt, mi, start_reference_rate, margin, long_run_rate=long_run_rate,
+                              volatility=volatility, n_paths=n_paths, processes=processes,
+                              repayment_type=repayment_type)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_payment_holidays(la, rate, lt, extend_term):
+    """Memoized repayment holiday grid: one row per start year, one column per holiday length of 0-12 months"""
+    return payment_holiday_schedule(la, rate, lt, np.arange(lt)[:, None] * 12 + 1, np.arange(13), extend_term=extend_term)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_life_event_cashflow(mi, me, payment, event_payment, housing_costs, savings, income_change, expense_change,
+                             onset_month, typical_months, recovery_months, benefit_months, income_change_after_benefits):
+    """Memoized month-by-month cash flow through a life event over 5,000 sampled durations"""
+    return simulate_life_event_cashflow(mi, me, payment, savings, income_change, expense_change, event_payment=event_payment,
+                                        housing_costs=housing_costs, onset_month=onset_month, typical_months=typical_months,
+                                        recovery_months=recovery_months, benefit_months=benefit_months,
+                                        income_change_after_benefits=income_change_after_benefits)
+
+@st.cache_data(max_entries=16, show_spinner="Simulating household lifetimes...")
+def load_lifetime_distress(la, ir, lt, mi, me, housing_costs, savings, events, n_households):
+    """Memoized lifetime Monte Carlo of the life events, using a process pool for the largest runs"""
+    processes = min(4, os.cpu_count() or 1) if n_households >= 100000 else None
+    return simulate_lifetime_distress(la, ir, lt, mi, me, events, housing_costs=housing_costs, savings=savings,
+                                      n_households=n_households, processes=processes)
+
+wealth_home_appreciation = 2.0
+
+@st.cache_data(max_entries=32, show_spinner="Simulating net worth...")
+def load_wealth_trajectories(la, rates, lt, property_value, savings, mi, fixed_expenses, investment_return,
+                             return_volatility, n_paths):
+    """Memoized net worth simulation for every rate scenario, so revisiting the tab is free"""
+    return simulate_wealth(la, np.array(rates), lt, property_value, mi, fixed_expenses, initial_investments=savings,
+                           expected_return=investment_return, return_volatility=return_volatility,
+                           home_appreciation=wealth_home_appreciation, n_paths=n_paths)
+
+# Stress matrix grid: every life event against each rate shock and event duration
+stress_matrix_shocks = np.arange(0, 5.01, 0.5)
+stress_matrix_durations = np.array([1, 3, 6, 9, 12, 18, 24])
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_stress_matrix(la, ir, lt, mi, me, housing_costs, savings, events):
+    """Memoized stress matrix of the life events, using a process pool only for very large grids"""
+    grid_size = len(events) * len(stress_matrix_shocks) * len(stress_matrix_durations)
+    processes = min(4, os.cpu_count() or 1) if grid_size >= 1_000_000 else None
+    return stress_matrix(la, ir, lt, mi, me, events, stress_matrix_shocks, stress_matrix_durations,
+                         housing_costs=housing_costs, savings=savings, processes=processes)
+
+@flow.node("la", "ir", "lt")
+def rate_scenario_costs(la, ir, lt):
+    rates = ir + np.array([0] + rate_scenarios)
+    costs = payment_grid(la, rates, lt)
+    costs["effective_rate"] = effective_annual_rate(la, rates, lt, loan_fees["arrangement_fee"], loan_fees["monthly_fee"])
+    return costs
+
+@st.fragment
 def render_financial_risk_simulator():
     # Add global variables declaration to fix scope issues
     global colors, mi, me, ol, la, lt, ir, monthly_payment, monthly_maintenance, renovation_cost_monthly
@@ -2057,8 +2432,7 @@ def render_financial_risk_simulator():
                 </div>
                 """, unsafe_allow_html=True)
         
-        # Define the interest rate increase scenarios
-        rate_scenarios = [2, 4, 6]
+        # Interest rate increase scenarios are defined next to the rate_scenario_costs node
         
         # Get current details
         current_rate = ir
@@ -2066,10 +2440,12 @@ def render_financial_risk_simulator():
         loan_term = lt
         monthly_income = mi
         
+        # Current rate and every shocked rate in one batched call
+        rate_costs = flow["rate_scenario_costs"]
+        
         # Base calculation - current payment
-        monthly_interest = current_rate / 100 / 12
-        current_payment = monthly_payment  # Use the globally calculated value
-        current_total_interest = current_payment * loan_term * 12 - loan_amount
+        current_payment = rate_costs["payment"][0]
+        current_total_interest = rate_costs["total_interest"][0]
         current_dti = (current_payment / monthly_income) * 100
         
         # Calculate payments for each scenario
@@ -2082,17 +2458,15 @@ def render_financial_risk_simulator():
             "Total Interest": current_total_interest,
             "DTI Ratio": current_dti,
             "Rate": current_rate,
+            "Effective Rate": rate_costs["effective_rate"][0],
             "Color": colors['primary']
         })
         
         # Add each rate increase scenario
-        for rate_increase in rate_scenarios:
+        for i, rate_increase in enumerate(rate_scenarios, start=1):
             new_rate = current_rate + rate_increase
-            new_monthly_interest = new_rate / 100 / 12
-            new_payment = (loan_amount * new_monthly_interest * (1 + new_monthly_interest) ** (loan_term*12)) / (
-                (1 + new_monthly_interest) ** (loan_term*12) - 1
-            )
-            new_total_interest = new_payment * loan_term * 12 - loan_amount
+            new_payment = rate_costs["payment"][i]
+            new_total_interest = rate_costs["total_interest"][i]
             new_dti = (new_payment / monthly_income) * 100
             
             # Determine risk level and color based on DTI ratio
@@ -2113,6 +2487,7 @@ def render_financial_risk_simulator():
                 "DTI Ratio": new_dti,
                 "Risk Level": risk_level,
                 "Rate": new_rate,
+                "Effective Rate": rate_costs["effective_rate"][i],
                 "Color": color
             })
         
@@ -2120,67 +2495,41 @@ def render_financial_risk_simulator():
         scenario_df = pd.DataFrame(scenario_data)
         
         # Display in two subtabs: Immediate Impact and Long-term Effects
-        immediate_tab, longterm_tab = st.tabs(["Monthly Budget Impact", "Long-Term Financial Effects"])
+        immediate_tab, longterm_tab, simulation_tab = st.tabs(["Monthly Budget Impact", "Long-Term Financial Effects", "Variable Rate Simulation"])
         
         # Immediate Impact Tab
         with immediate_tab:  
+            # Discretionary spending that could absorb a higher payment, editable by the user
+            with st.expander("Your Discretionary Budget"):
+                discretionary_df = st.data_editor(
+                    pd.DataFrame(default_budget_categories),
+                    column_config={
+                        "Category": st.column_config.TextColumn("Category", required=True),
+                        "Monthly Budget": st.column_config.NumberColumn("Monthly Budget", min_value=0, format="€%d"),
+                        "Minimum": st.column_config.NumberColumn("Minimum", min_value=0, format="€%d",
+                                                                 help="The least you would keep spending on this"),
+                        "Priority": st.column_config.SelectboxColumn("Priority", options=list(BUDGET_PRIORITY_WEIGHTS), required=True),
+                    },
+                    num_rows="dynamic",
+                    hide_index=True,
+                    use_container_width=True,
+                    key="budget_categories"
+                ).dropna(subset=["Category", "Monthly Budget"])
+                st.caption("Cuts start with low-priority categories and never go below the minimum you set; "
+                           "categories with the same priority are reduced by the same share.")
+
+            # The cuts covering each rate scenario's payment increase, solved for all scenarios at once
+            budget_amounts = discretionary_df["Monthly Budget"].to_numpy(dtype=float)
+            payment_increases = np.array([scenario["Monthly Payment"] for scenario in scenario_data]) - scenario_data[0]["Monthly Payment"]
+            scenario_cuts = budget_cuts(payment_increases, budget_amounts,
+                                        np.minimum(discretionary_df["Minimum"].fillna(0).to_numpy(dtype=float), budget_amounts),
+                                        discretionary_df["Priority"].map(BUDGET_PRIORITY_WEIGHTS).fillna(1.0).to_numpy(dtype=float))
+
             # Display key metrics in cards at the top
             st.markdown("### Monthly Changes in Expenses")
             with st.container(border=True):
                 
                 subcols = st.columns(len(scenario_data))
-                
-                # Calculate lifestyle impacts for each scenario
-                lifestyle_impacts = []
-                
-                # Base lifestyle categories and costs
-                lifestyle_categories = [
-                    {"name": "Dining Out", "cost": 200, "priority": "low"},
-                    {"name": "Entertainment", "cost": 150, "priority": "low"},
-                    {"name": "Vacation Savings", "cost": 180, "priority": "medium"},
-                    {"name": "Shopping", "cost": 120, "priority": "low"},
-                    {"name": "Hobbies", "cost": 100, "priority": "medium"},
-                    {"name": "Fitness", "cost": 80, "priority": "high"}
-                ]
-                
-                # For each scenario, calculate what lifestyle changes would be needed
-                for i, scenario in enumerate(scenario_data):
-                    if i == 0:  # Skip the current scenario
-                        lifestyle_impacts.append([])
-                        continue
-                        
-                    payment_diff = scenario["Monthly Payment"] - scenario_data[0]["Monthly Payment"]
-                    
-                    # Track what needs to be cut to compensate
-                    cuts_needed = []
-                    remaining_to_cut = payment_diff
-                    
-                    # Sort lifestyle categories by priority (low priority gets cut first)
-                    sorted_categories = sorted(lifestyle_categories, key=lambda x: {"low": 0, "medium": 1, "high": 2}[x["priority"]])
-                    
-                    for category in sorted_categories:
-                        if remaining_to_cut <= 0:
-                            break
-                            
-                        if remaining_to_cut >= category["cost"]:
-                            # Need to cut this entirely
-                            cuts_needed.append({
-                                "category": category["name"],
-                                "amount": category["cost"],
-                                "percentage": 100
-                            })
-                            remaining_to_cut -= category["cost"]
-                        else:
-                            # Partial cut needed
-                            percentage = (remaining_to_cut / category["cost"]) * 100
-                            cuts_needed.append({
-                                "category": category["name"],
-                                "amount": remaining_to_cut,
-                                "percentage": percentage
-                            })
-                            remaining_to_cut = 0
-                    
-                    lifestyle_impacts.append(cuts_needed)
             
                 for i, scenario in enumerate(scenario_data):
                     with subcols[i]:
@@ -2205,7 +2554,12 @@ def render_financial_risk_simulator():
                         )
                         
                         # Add DTI ratio as a caption or small text below
-                        st.caption(f"DTI: {scenario['DTI Ratio']:.1f}%")
+                        st.caption(f"DTI: {scenario['DTI Ratio']:.1f}% · Effective rate: {scenario['Effective Rate']:.2f}%")
+                        if i > 0:
+                            categories_cut = int((scenario_cuts["cuts"][i] > 0.5).sum())
+                            uncovered = scenario_cuts["uncovered"][i]
+                            st.caption(f"€{uncovered:.0f}/month more than your budget can absorb" if uncovered > 0.5
+                                       else f"Covered by trimming {categories_cut} budget {'category' if categories_cut == 1 else 'categories'}")
                         
 
             
@@ -2237,8 +2591,8 @@ def render_financial_risk_simulator():
                     
                     # Define budget categories with consistent colors
                     expense_categories = [
-                        {"name": "Other Expenses", "amount": financial_vars["monthly_expenses"], "color": expense_colors["Other Expenses"]},
-                        {"name": "Other Loans", "amount": financial_vars["other_loans"], "color": expense_colors["Other Loans"]},
+                        {"name": "Other Expenses", "amount": me, "color": expense_colors["Other Expenses"]},
+                        {"name": "Other Loans", "amount": ol, "color": expense_colors["Other Loans"]},
                         {"name": "Housing Costs", "amount": monthly_maintenance + renovation_cost_monthly, "color": expense_colors["Housing Costs"]}
                     ]
                     
@@ -2395,28 +2749,20 @@ def render_financial_risk_simulator():
                         with tab:
                             # Create a table of lifestyle impacts
                             impact_data = []
-                            remaining = payment_diff
-                            
-                            for category in lifestyle_categories:
-                                if remaining <= 0:
-                                    impact = 0
+                            for k, category in enumerate(discretionary_df.to_dict("records")):
+                                cut = scenario_cuts["cuts"][scenario_idx, k]
+                                if cut < 0.5:
                                     status = "No Change"
-                                elif remaining >= category["cost"]:
-                                    impact = category["cost"]
+                                elif scenario_cuts["remaining_budget"][scenario_idx, k] < 0.5:
                                     status = "Eliminate"
-                                    remaining -= category["cost"]
                                 else:
-                                    impact = remaining
-                                    pct = (impact / category["cost"]) * 100
-                                    status = f"Reduce by {pct:.0f}%"
-                                    remaining = 0
-                                    
+                                    status = f"Reduce by {cut / budget_amounts[k] * 100:.0f}%"
                                 impact_data.append({
-                                    "Category": category["name"],
-                                    "Current Budget": f"€{category['cost']}",
-                                    "Potential Cut": f"€{impact:.0f}",
+                                    "Category": category["Category"],
+                                    "Current Budget": f"€{budget_amounts[k]:.0f}",
+                                    "Potential Cut": f"€{cut:.0f}",
                                     "Status": status,
-                                    "Priority": category["priority"].capitalize()
+                                    "Priority": category["Priority"]
                                 })
                             
                             # Display the table using ui.table
@@ -2436,11 +2782,30 @@ def render_financial_risk_simulator():
 
                             # Display the styled DataFrame in Streamlit
                             st.dataframe(styled_df, hide_index=True)
+                            if scenario_cuts["uncovered"][scenario_idx] > 0.5:
+                                st.warning(f"Even with every cut, €{scenario_cuts['uncovered'][scenario_idx]:.0f}/month of the "
+                                           f"€{payment_diff:.0f} increase is left uncovered.")
                             
         
         # Long-term effects tab
         with longterm_tab:
             
+            # Net worth month by month in every rate scenario, over thousands of investment return paths
+            wealth_col1, wealth_col2, wealth_col3 = st.columns(3)
+            with wealth_col1:
+                investment_return = st.slider("Expected Investment Return (%/year)", min_value=0.0, max_value=10.0, value=7.0,
+                                              step=0.5, key="wealth_return")
+            with wealth_col2:
+                return_volatility = st.slider("Return Volatility (%/year)", min_value=0.0, max_value=25.0, value=15.0,
+                                              step=1.0, key="wealth_volatility")
+            with wealth_col3:
+                wealth_paths = st.select_slider("Return Paths", options=[1000, 2000, 5000, 10000], value=2000, key="wealth_paths")
+            fixed_expenses = sum([cat["amount"] for cat in expense_categories])
+            wealth = load_wealth_trajectories(loan_amount, tuple(scenario["Rate"] for scenario in scenario_data), loan_term,
+                                              la + dp, oa, monthly_income, fixed_expenses, investment_return,
+                                              return_volatility, wealth_paths)
+
+
             # Two columns for the long-term effects
             col1, col2 = st.columns(2)
             
@@ -2485,39 +2850,6 @@ def render_financial_risk_simulator():
                     st.plotly_chart(fig_interest, use_container_width=True)
             
             with col2:
-                # Calculate wealth-building impact (for the table only, not showing the chart)
-                retirement_data = []
-                investment_return = 7.0  # Annual return percentage
-                investment_years = 25  # Years of investment 
-                
-                for scenario in scenario_data:
-                    # How much disposable income would be left
-                    fixed_expenses = sum([cat["amount"] for cat in expense_categories])
-                    disposable = monthly_income - fixed_expenses - scenario["Monthly Payment"]
-                    
-                    # Assume baseline savings is 15% of income
-                    baseline_savings = monthly_income * 0.15
-                    
-                    # Actual savings capability would be limited by disposable income
-                    actual_savings = min(baseline_savings, disposable)
-                    
-                    # Monthly savings gap
-                    savings_gap = baseline_savings - actual_savings if actual_savings < baseline_savings else 0
-                    
-                    # Calculate long-term impact of savings gap
-                    future_value = 0
-                    if savings_gap > 0:
-                        # Calculate future value using compound interest formula
-                        r = investment_return / 100 / 12  # Monthly interest rate
-                        n = investment_years * 12  # Number of months
-                        future_value = savings_gap * ((1 + r)**n - 1) / r * (1 + r)
-                    
-                    retirement_data.append({
-                        "Scenario": scenario["Scenario"],
-                        "Monthly Savings Gap": savings_gap,
-                        "25-Year Impact": future_value
-                    })
-                
                 # Overall financial impact table
                 st.markdown("### Cumulative Financial Impact")
                 
@@ -2525,12 +2857,12 @@ def render_financial_risk_simulator():
                 
                 with st.container(border=True):
 
-                    for scenario in scenario_data:
+                    for scenario_index, scenario in enumerate(scenario_data):
                         # Calculate additional interest compared to current
                         additional_interest = scenario["Total Interest"] - scenario_data[0]["Total Interest"] if scenario != scenario_data[0] else 0
                         
-                        # Find corresponding retirement impact
-                        retirement_impact = next((item["25-Year Impact"] for item in retirement_data if item["Scenario"] == scenario["Scenario"]), 0)
+                        # Median of the investments each return path ends up short of the current rate scenario
+                        retirement_impact = wealth["investment_loss_bands"][2, scenario_index]
                         
                         # Total financial impact
                         total_impact = additional_interest + retirement_impact
@@ -2545,6 +2877,117 @@ def render_financial_risk_simulator():
                     # Display the table using HTML instead of ui.table
                     impact_df = pd.DataFrame(impact_data)
                     ui.table(impact_df)
+
+            st.markdown("### Net Worth Over 25 Years")
+            with st.container(border=True):
+                wealth_scenario = st.radio("Rate Scenario", [scenario["Scenario"].replace("\n", " ") for scenario in scenario_data],
+                                           horizontal=True, key="wealth_scenario")
+                shown = [scenario["Scenario"].replace("\n", " ") for scenario in scenario_data].index(wealth_scenario)
+                years_axis = wealth["month"] / 12
+                w5, w25, w50, w75, w95 = wealth["net_worth_bands"][:, shown]
+                fig_wealth = go.Figure()
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=w95, mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=w5, mode="lines", line=dict(width=0), fill="tonexty",
+                                                fillcolor="rgba(255, 149, 0, 0.2)", name="5th-95th percentile"))
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=w75, mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=w25, mode="lines", line=dict(width=0), fill="tonexty",
+                                                fillcolor="rgba(255, 149, 0, 0.45)", name="25th-75th percentile"))
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=w50, mode="lines", line=dict(color=colors['secondary'], width=3), name="Median"))
+                fig_wealth.add_trace(go.Scatter(x=years_axis, y=wealth["home_equity"][shown], mode="lines",
+                                                line=dict(color=colors['slate'], width=2, dash="dash"), name="Home equity"))
+                if shown > 0:
+                    fig_wealth.add_trace(go.Scatter(x=years_axis, y=wealth["net_worth_bands"][2, 0], mode="lines",
+                                                    line=dict(color=colors['secondary'], width=2, dash="dot"), name="Median at current rate"))
+                fig_wealth.update_layout(
+                    height=400,
+                    xaxis_title="Years from Now",
+                    yaxis_title="Net Worth (€)",
+                    hovermode="x unified",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                    margin=dict(l=20, r=20, t=40, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_wealth, use_container_width=True)
+                st.caption(f"Net worth is home equity (the home appreciating {wealth_home_appreciation:.0f}% a year, minus the loan balance) plus investments: "
+                           f"your €{oa:,.0f} of other assets and up to 15% of income invested each month, or what is left after expenses and the "
+                           f"payment. {wealth['n_paths']:,} return paths are shared by all rate scenarios.")
+        
+        # Monte Carlo of the reference rate with 12-month resets
+        with simulation_tab:
+            st.markdown("### Simulated Reference Rate Paths")
+            with st.container(border=True):
+                st.markdown("""
+                <div class="bank-widget">
+                    Most Finnish mortgages follow a reference rate (such as 12-month Euribor) plus a fixed margin, and the 
+                    payment is recalculated every 12 months. Instead of fixed shocks, this simulates thousands of possible 
+                    reference rate paths that drift back towards a long-run level, and shows the range of outcomes.
+                </div>
+                """, unsafe_allow_html=True)
+                
+                repayment_type = st.radio("Repayment Type", list(REPAYMENT_TYPES), horizontal=True, key="sim_repayment_type")
+                sim_col1, sim_col2, sim_col3, sim_col4 = st.columns(4)
+                with sim_col1:
+                    margin = st.slider("Loan Margin (%)", min_value=0.3, max_value=2.0, value=0.8, step=0.05, key="sim_margin")
+                with sim_col2:
+                    long_run_rate = st.slider("Long-Run Reference Rate (%)", min_value=0.0, max_value=6.0, value=2.5, step=0.1, key="sim_long_run_rate")
+                with sim_col3:
+                    volatility = st.slider("Rate Volatility (%-points/year)", min_value=0.2, max_value=2.5, value=1.0, step=0.1, key="sim_volatility")
+                with sim_col4:
+                    n_paths = st.select_slider("Simulated Paths", options=[1000, 5000, 10000, 50000, 100000], value=10000, key="sim_paths")
+                
+                start_reference_rate = max(current_rate - margin, 0.0)
+                simulation = load_rate_risk_simulation(loan_amount, loan_term, monthly_income, start_reference_rate, margin,
+                                                       long_run_rate, volatility, n_paths, repayment_type)
+                p5, p25, p50, p75, p95 = simulation["payment_bands"]
+                
+                metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+                with metric_col1:
+                    st.metric("Median Total Interest", f"€{simulation['total_interest_bands'][2]:,.0f}",
+                              delta=f"€{simulation['total_interest_bands'][2] - simulation['fixed_total_interest']:,.0f} vs fixed", delta_color="inverse")
+                with metric_col2:
+                    st.metric("Worst 5% Total Interest", f"€{simulation['total_interest_bands'][4]:,.0f}")
+                with metric_col3:
+                    st.metric("Highest Payment (95th pct)", f"€{p95.max():,.0f}")
+                with metric_col4:
+                    st.metric("Paths Reaching Severe DTI (50%+)", f"{(simulation['peak_dti'] >= 50).mean() * 100:.1f}%")
+                
+                years = simulation["year"]
+                fig_fan = go.Figure()
+                fig_fan.add_trace(go.Scatter(x=years, y=p95, mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                fig_fan.add_trace(go.Scatter(x=years, y=p5, mode="lines", line=dict(width=0), fill="tonexty",
+                                             fillcolor="rgba(255, 149, 0, 0.2)", name="5th-95th percentile"))
+                fig_fan.add_trace(go.Scatter(x=years, y=p75, mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+                fig_fan.add_trace(go.Scatter(x=years, y=p25, mode="lines", line=dict(width=0), fill="tonexty",
+                                             fillcolor="rgba(255, 149, 0, 0.45)", name="25th-75th percentile"))
+                fig_fan.add_trace(go.Scatter(x=years, y=p50, mode="lines", line=dict(color=colors['secondary'], width=3), name="Median"))
+                fig_fan.add_trace(go.Scatter(x=years, y=simulation["expected_payment"], mode="lines",
+                                             line=dict(color=colors['secondary'], width=2, dash="dot"), name="Expected rate path"))
+                fig_fan.add_trace(go.Scatter(x=years, y=simulation["fixed_payment"], mode="lines",
+                                             line=dict(color=colors['slate'], width=2, dash="dash"), name=f"Fixed {current_rate:.1f}%"))
+                fig_fan.update_layout(
+                    height=380,
+                    xaxis_title="Loan Year",
+                    yaxis_title="Monthly Payment (€)",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                    margin=dict(l=20, r=20, t=40, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_fan, use_container_width=True)
+                
+                dti_df = pd.DataFrame({
+                    "Percentile": [f"{p}th" for p in simulation["percentiles"]],
+                    "Rate in Year 5": [f"{rate:.2f}%" for rate in simulation["rate_bands"][:, min(4, len(years) - 1)]],
+                    "Peak Payment-to-Income": [f"{dti:.1f}%" for dti in simulation["dti_bands"].max(axis=1)],
+                    "Total Interest": [f"€{interest:,.0f}" for interest in simulation["total_interest_bands"]]
+                })
+                ui.table(dti_df)
+                st.caption(f"{simulation['n_paths']:,} simulated paths, starting from a {start_reference_rate:.2f}% reference rate plus {margin:.2f}% margin.")
+                if repayment_type == "Fixed Installment":
+                    st.caption(f"With a fixed installment the term floats: the loan is repaid by year {simulation['payoff_year_bands'][2]:.0f} "
+                               f"in half of the paths and by year {simulation['payoff_year_bands'][4]:.0f} in 95% of them "
+                               f"(contract term {loan_term} years).")
         
         # Risk Assessment at the bottom of the main tab
         
@@ -2623,36 +3066,61 @@ def render_financial_risk_simulator():
                         Simulates how unexpected life events would affect your finances. 
                     </div>
                     """, unsafe_allow_html=True)
+            # Durations are typical lengths in months; benefit_months is how long earnings-related
+            # unemployment or sickness allowance lasts before income falls further; annual_probability
+            # is the rough yearly chance (%) of the event for a household with a mortgage
             risk_scenarios = {
                 "Divorce": {
                     "income_change": -40,
                     "expense_change": +25,
+                    "typical_months": 18,
+                    "annual_probability": 1.5,
+                    "recovery_months": 12,
                     "description": "Separation typically causes a significant drop in household income while expenses may increase due to maintaining two households, legal fees, and other separation costs."
                 },
                 "Having a Child": {
                     "income_change": -15,
                     "expense_change": +20,
+                    "typical_months": 12,
+                    "annual_probability": 8,
+                    "recovery_months": 3,
                     "description": "Having a child often leads to temporary income reduction (parental leave) and increased expenses for childcare, healthcare, food, clothing, etc."
                 },
                 "Job Loss": {
                     "income_change": -70,
                     "expense_change": -10,
+                    "typical_months": 6,
+                    "annual_probability": 4,
+                    "recovery_months": 3,
+                    "benefit_months": 13,
+                    "income_change_after_benefits": -85,
                     "description": "Losing your job results in a major income drop, partially offset by unemployment benefits. Some expenses might be reduced due to budget cuts."
                 },
                 "Medical Emergency": {
                     "income_change": -20,
                     "expense_change": +15,
+                    "typical_months": 4,
+                    "annual_probability": 2,
+                    "recovery_months": 2,
+                    "benefit_months": 12,
+                    "income_change_after_benefits": -60,
                     "description": "A serious health issue can reduce your ability to work while increasing out-of-pocket medical expenses, even with insurance coverage."
                 },
                 "Housing Market Crash": {
                     "income_change": -5,
                     "expense_change": +0,
                     "rate_change": +2.0,
+                    "typical_months": 24,
+                    "annual_probability": 3,
+                    "recovery_months": 12,
                     "description": "A market crash doesn't directly affect income, but if you have a variable-rate mortgage, interest rates might rise significantly, increasing monthly payments."
                 },
                 "Unexpected Home Repairs": {
                     "income_change": 0,
                     "expense_change": +15,
+                    "typical_months": 2,
+                    "annual_probability": 10,
+                    "recovery_months": 0,
                     "description": "Major repairs like roof replacement, plumbing issues, or foundation problems can create significant unexpected expenses."
                 }
             }
@@ -2677,6 +3145,7 @@ def render_financial_risk_simulator():
                 - Income change: {scenario['income_change']}%
                 - Expense change: {scenario['expense_change']}%
                 {f"- Interest rate change: +{scenario['rate_change']}%" if 'rate_change' in scenario else ""}
+                - Typical duration: {scenario['typical_months']} months
                 """)
 
             with st.container(border=True):
@@ -2690,11 +3159,26 @@ def render_financial_risk_simulator():
                 new_income = original_income * (1 + scenario['income_change']/100)
                 new_expenses = original_expenses * (1 + scenario['expense_change']/100)
                 
+                # A repayment holiday (lyhennysvapaa) replaces the payment with interest only for a while
+                hol_col1, hol_col2, hol_col3 = st.columns(3)
+                with hol_col1:
+                    holiday_months = st.select_slider("Repayment Holiday", options=[0, 3, 6, 9, 12], value=0, key="life_event_holiday_months",
+                                                      format_func=lambda months: "None" if months == 0 else f"{months} months")
+                with hol_col2:
+                    event_year = st.slider("Event Happens in Loan Year", min_value=1, max_value=int(lt), value=1, key="life_event_year")
+                with hol_col3:
+                    holiday_mode = st.radio("After the Holiday", ["Extend the loan term", "Keep the end date"], key="life_event_holiday_mode")
+                
                 # Calculate new payment if interest rate changes
                 new_payment = original_payment
+                new_rate = ir
                 if 'rate_change' in scenario:
                     new_rate = ir + scenario['rate_change']
-                    new_payment = (la * (new_rate/100/12) * (1 + new_rate/100/12)**(lt*12)) / ((1 + new_rate/100/12)**(lt*12) - 1)
+                    new_payment = annuity_payment(la, new_rate, lt)
+                
+                holidays = load_payment_holidays(la, new_rate, int(lt), holiday_mode == "Extend the loan term")
+                if holiday_months > 0:
+                    new_payment = holidays["holiday_payment"][event_year - 1, holiday_months]
                 
                 # Calculate financial health indicators
                 original_leftover = original_income - original_expenses - original_payment - monthly_maintenance - renovation_cost_monthly
@@ -2725,7 +3209,7 @@ def render_financial_risk_simulator():
                     st.markdown(f"""
                     - **Monthly Income:** €{new_income:.0f}
                     - **Monthly Expenses:** €{new_expenses:.0f}
-                    - **Loan Payment:** €{new_payment:.0f}
+                    - **Loan Payment:** €{new_payment:.0f}{" (interest only)" if holiday_months > 0 else ""}
                     - **Housing Costs:** €{monthly_maintenance + renovation_cost_monthly:.0f}
                     - **Leftover:** <span style="color:{leftover_color}">€{new_leftover:.0f}</span>
                     - **Payment-to-Income Ratio:** <span style="color:{dti_color}">{new_dti:.1f}%</span>
@@ -2739,6 +3223,36 @@ def render_financial_risk_simulator():
                 else:
                     st.success(f"**Low Risk**: Your finances could likely handle this scenario with €{new_leftover:.0f} left over each month.")
                 
+                if holiday_months > 0:
+                    payment_after = holidays["payment_after"][event_year - 1, holiday_months]
+                    end_year = holidays["months"][event_year - 1, holiday_months] / 12
+                    granted_months = int(holidays["holiday_months"][event_year - 1, holiday_months])
+                    if granted_months < holiday_months:
+                        st.warning(f"Only {granted_months} months of holiday fit before the loan's end date, so the holiday is shortened to that.")
+                    st.info(f"During the {granted_months}-month repayment holiday you pay €{new_payment:.0f}/month in interest only. "
+                            f"Afterwards the payment is €{payment_after:.0f}/month and the loan ends after {end_year:.1f} years. "
+                            f"The holiday costs €{holidays['extra_interest'][event_year - 1, holiday_months]:,.0f} in extra interest.")
+                
+                with st.expander("Cost of a Repayment Holiday by Timing and Length"):
+                    fig_holiday = go.Figure(data=go.Heatmap(
+                        x=np.arange(1, 13),
+                        y=np.arange(1, int(lt) + 1),
+                        z=holidays["extra_interest"][:, 1:],
+                        colorscale=[[0, colors['light']], [1, colors['secondary']]],
+                        colorbar=dict(title="Extra Interest (€)"),
+                        hovertemplate="Holiday of %{x} months in year %{y}<br>Extra interest: €%{z:,.0f}<extra></extra>"
+                    ))
+                    fig_holiday.update_layout(
+                        height=350,
+                        xaxis_title="Holiday Length (months)",
+                        yaxis_title="Holiday Starts in Loan Year",
+                        margin=dict(l=20, r=20, t=20, b=40),
+                        font=dict(family="Calibri Light"),
+                        plot_bgcolor="white"
+                    )
+                    st.plotly_chart(fig_holiday, use_container_width=True)
+                    st.caption("Every start year and length is computed in one pass. Earlier holidays cost more because more of the loan is still outstanding.")
+                
                 # Recommendations
                 with st.expander("Preparation Recommendations"):
                     if selected_scenario == "Divorce":
@@ -2784,6 +3298,173 @@ def render_financial_risk_simulator():
                         - Maintain adequate home insurance
                         """)
 
+            # Month by month through the event: uncertain length, benefits running out, recovery and savings
+            with st.container(border=True):
+                st.markdown("### Cash Flow Through the Event")
+                flow_col1, flow_col2, flow_col3 = st.columns(3)
+                with flow_col1:
+                    onset_month = st.slider("Event Starts in Month", min_value=1, max_value=24, value=3, key="life_event_onset")
+                with flow_col2:
+                    typical_months = st.slider("Typical Duration (months)", min_value=1, max_value=36, value=scenario["typical_months"],
+                                               key=f"life_event_duration_{selected_scenario}")
+                with flow_col3:
+                    recovery_months = st.slider("Recovery Period (months)", min_value=0, max_value=24, value=scenario["recovery_months"],
+                                                key=f"life_event_recovery_{selected_scenario}")
+                cashflow = load_life_event_cashflow(
+                    mi, me, original_payment, annuity_payment(la, new_rate, lt) if 'rate_change' in scenario else original_payment,
+                    monthly_maintenance + renovation_cost_monthly, oa, scenario["income_change"], scenario["expense_change"],
+                    onset_month, typical_months, recovery_months, scenario.get("benefit_months"),
+                    scenario.get("income_change_after_benefits")
+                )
+                finite_runway = cashflow["runway"][np.isfinite(cashflow["runway"])]
+
+                cf_col1, cf_col2, cf_col3 = st.columns(3)
+                with cf_col1:
+                    st.metric("Chance of Running Out of Savings", f"{cashflow['prob_depleted']:.0%}",
+                              help=f"Share of {cashflow['n_paths']:,} sampled event durations in which your €{oa:,.0f} of savings go negative within 5 years")
+                with cf_col2:
+                    if cashflow["short_before_event"].all():
+                        runway_text = "Short Before the Event"
+                    else:
+                        runway_text = f"{np.median(finite_runway):.0f} months" if len(finite_runway) else "Never"
+                    st.metric("Runway When Savings Run Out", runway_text,
+                              help="Median months from the start of the event until savings are used up, among the outcomes where they are")
+                with cf_col3:
+                    st.metric("Lowest Savings (1 in 20 outcomes)", f"€{np.percentile(cashflow['lowest_savings'], 5):,.0f}")
+
+                bands = cashflow["savings_bands"]
+                fig_cashflow = go.Figure()
+                fig_cashflow.add_trace(go.Scatter(x=cashflow["month"], y=bands[4], mode="lines", line=dict(width=0),
+                                                  showlegend=False, hoverinfo="skip"))
+                fig_cashflow.add_trace(go.Scatter(x=cashflow["month"], y=bands[0], mode="lines", line=dict(width=0), fill="tonexty",
+                                                  fillcolor="rgba(255, 90, 0, 0.15)", name="5th-95th percentile"))
+                fig_cashflow.add_trace(go.Scatter(x=cashflow["month"], y=bands[3], mode="lines", line=dict(width=0),
+                                                  showlegend=False, hoverinfo="skip"))
+                fig_cashflow.add_trace(go.Scatter(x=cashflow["month"], y=bands[1], mode="lines", line=dict(width=0), fill="tonexty",
+                                                  fillcolor="rgba(255, 90, 0, 0.3)", name="25th-75th percentile"))
+                fig_cashflow.add_trace(go.Scatter(x=cashflow["month"], y=bands[2], mode="lines", name="Median",
+                                                  line=dict(color=colors['secondary'], width=3)))
+                fig_cashflow.add_hline(y=0, line_dash="dash", line_color="#E63946")
+                fig_cashflow.update_layout(
+                    height=400,
+                    xaxis_title="Month",
+                    yaxis_title="Savings (€)",
+                    hovermode="x unified",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5),
+                    margin=dict(l=20, r=20, t=40, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_cashflow, use_container_width=True)
+                benefit_note = (f" Benefits are assumed to run out after {scenario['benefit_months']} months, when income falls to "
+                                f"{100 + scenario['income_change_after_benefits']}% of today's." if "benefit_months" in scenario else "")
+                st.caption(f"Each of the {cashflow['n_paths']:,} outcomes draws how long the event lasts (about {typical_months} months on average, "
+                           f"longer in some outcomes) and then fades out over {recovery_months} months. Your monthly surplus or "
+                           f"deficit is added to your savings.{benefit_note}")
+
+            # Every life event at once, crossed with rate shocks and how long the event lasts
+            with st.container(border=True):
+                st.markdown("### Stress Matrix: All Life Events Under Rate Shocks")
+                matrix = load_stress_matrix(la, ir, int(lt), mi, me, monthly_maintenance + renovation_cost_monthly, oa,
+                                            list(risk_scenarios.values()))
+                event_names = list(risk_scenarios)
+                shock_labels = [f"+{shock:.1f}%" for shock in matrix["rate_shocks"]]
+                matrix_view = st.radio("Show", ["Monthly Leftover", "Payment-to-Income"], horizontal=True,
+                                       key="stress_matrix_view")
+                if matrix_view == "Monthly Leftover":
+                    z, title, hover = matrix["leftover"], "Leftover (€)", "€%{z:,.0f} left per month"
+                    colorscale, zmid = [[0, "#E63946"], [0.5, "white"], [1, "#4DAA57"]], 0
+                else:
+                    z, title, hover = matrix["dti"], "Payment-to-Income (%)", "%{z:.1f}% of income"
+                    colorscale, zmid = [[0, "#4DAA57"], [0.5, "white"], [1, "#E63946"]], 40
+                fig_matrix = go.Figure(data=go.Heatmap(
+                    x=shock_labels, y=event_names, z=z, zmid=zmid, colorscale=colorscale,
+                    colorbar=dict(title=title),
+                    hovertemplate="%{y} with a %{x} rate shock<br>" + hover + "<extra></extra>"
+                ))
+                fig_matrix.update_layout(
+                    height=350,
+                    xaxis_title="Rate Shock on Top of the Event",
+                    margin=dict(l=20, r=20, t=20, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_matrix, use_container_width=True)
+
+                matrix_shock = st.select_slider("Rate Shock", options=list(matrix["rate_shocks"]), value=matrix["rate_shocks"][2],
+                                                format_func=lambda shock: f"+{shock:.1f}%", key="stress_matrix_shock")
+                shock_index = int(np.flatnonzero(matrix["rate_shocks"] == matrix_shock)[0])
+                fig_savings = go.Figure(data=go.Heatmap(
+                    x=[f"{months} mo" for months in matrix["durations"].astype(int)], y=event_names,
+                    z=matrix["savings_left"][:, shock_index], zmid=0,
+                    colorscale=[[0, "#E63946"], [0.5, "white"], [1, "#4DAA57"]],
+                    colorbar=dict(title="Savings Left (€)"),
+                    hovertemplate="%{y} lasting %{x}<br>Savings left: €%{z:,.0f}<extra></extra>"
+                ))
+                fig_savings.update_layout(
+                    height=350,
+                    xaxis_title="Event Duration",
+                    margin=dict(l=20, r=20, t=20, b=40),
+                    font=dict(family="Calibri Light"),
+                    plot_bgcolor="white"
+                )
+                st.plotly_chart(fig_savings, use_container_width=True)
+                st.caption(f"Starting from your €{oa:,.0f} of other assets. Events with their own rate change "
+                           f"(such as a housing market crash) get the shock on top of it. All "
+                           f"{matrix['savings_left'].size:,} combinations are computed in one broadcast pass.")
+
+            # Random sequences of all the events over the whole loan, for one probability of distress
+            with st.container(border=True):
+                st.markdown("### Lifetime Risk: Probability of Financial Distress")
+                n_households = st.select_slider("Simulated Households", options=[20000, 50000, 100000], value=20000,
+                                                format_func=lambda n: f"{n:,}", key="lifetime_households")
+                lifetime = load_lifetime_distress(la, ir, int(lt), mi, me, monthly_maintenance + renovation_cost_monthly, oa,
+                                                  list(risk_scenarios.values()), n_households)
+                first_years = -(-lifetime["first_distress_month"] // 12)
+
+                lt_col1, lt_col2, lt_col3 = st.columns(3)
+                with lt_col1:
+                    st.metric("Probability of Distress Over the Loan", f"{lifetime['prob_distress']:.1%}",
+                              help="Share of simulated households whose income and savings fall short of the loan payment and expenses at some point")
+                with lt_col2:
+                    st.metric("Within the First 5 Years", f"{lifetime['cumulative_distress'][min(4, len(lifetime['year']) - 1)]:.1%}")
+                with lt_col3:
+                    st.metric("Typical Year of First Shortfall", f"Year {np.median(first_years):.0f}" if len(first_years) else "None")
+
+                dist_col1, dist_col2 = st.columns(2)
+                with dist_col1:
+                    fig_lifetime = go.Figure(go.Scatter(
+                        x=lifetime["year"], y=lifetime["cumulative_distress"] * 100, mode="lines", fill="tozeroy",
+                        line=dict(color=colors['secondary'], width=3),
+                        hovertemplate="By year %{x}: %{y:.1f}% of households<extra></extra>"
+                    ))
+                    fig_lifetime.update_layout(
+                        height=350,
+                        xaxis_title="Loan Year",
+                        yaxis_title="Households in Distress (%)",
+                        margin=dict(l=20, r=20, t=20, b=40),
+                        font=dict(family="Calibri Light"),
+                        plot_bgcolor="white"
+                    )
+                    st.plotly_chart(fig_lifetime, use_container_width=True)
+                with dist_col2:
+                    fig_events = go.Figure(go.Bar(
+                        x=lifetime["event_share_at_distress"] * 100, y=list(risk_scenarios), orientation="h",
+                        marker_color=colors['primary'],
+                        hovertemplate="%{y}: under way in %{x:.0f}% of first shortfalls<extra></extra>"
+                    ))
+                    fig_events.update_layout(
+                        height=350,
+                        xaxis_title="Under Way at First Shortfall (%)",
+                        margin=dict(l=20, r=20, t=20, b=40),
+                        font=dict(family="Calibri Light"),
+                        plot_bgcolor="white"
+                    )
+                    st.plotly_chart(fig_events, use_container_width=True)
+                st.caption(f"{lifetime['n_households']:,} households each live through their own random sequence of the events above over "
+                           f"{int(lt)} years, at the yearly probabilities and typical durations listed with each scenario. For comparison, "
+                           f"the Financial Overview risk score is {risk_score:.1f} ({risk_category}).")
+
 
 
  
@@ -2795,6 +3476,7 @@ tab1, tab2, tab3 = st.tabs(["Loan Decision Center", "Payment Analysis", "Propert
 # -------------------- TAB 2: PAYMENT ANALYSIS --------------------
 with tab2:
     render_payment_analysis()
+    render_refinancing_analyzer()
 
 # -------------------- TAB 3: PROPERTY DETAILS --------------------
 with tab3:
@@ -2871,31 +3553,20 @@ if not tab1:
     with st.expander("Press to change financial parameters"):
         col3, col4 = st.columns(2)
         with col3:
-            lt = st.slider("Loan Term (years)", min_value=10, max_value=30, value=lt, key="global_loan_term")
+            st.slider("Loan Term (years)", min_value=10, max_value=30, value=financial_vars["loan_term"], key="global_loan_term")
         with col4:
-            ir = st.slider("Interest Rate (%)", min_value=1.0, max_value=10.0, value=ir, step=0.1, key="global_interest_rate")
+            st.slider("Interest Rate (%)", min_value=1.0, max_value=10.0, value=financial_vars["interest_rate"], step=0.1, key="global_interest_rate")
         
         col1, col2 = st.columns(2)
         with col1:
-            mi = st.number_input("Monthly Net Income (€)", value=mi, key="global_monthly_income")
-            me = st.number_input("Monthly Expenses (€)", value=me, key="global_monthly_expenses")
-            sd = st.number_input("Existing Student Debt (€)", value=sd, key="global_student_debt")
-            ms = st.number_input("Monthly Student Payment (€)", value=ms, key="global_student_payment")
+            st.number_input("Monthly Net Income (€)", value=financial_vars["monthly_income"], key="global_monthly_income")
+            st.number_input("Monthly Expenses (€)", value=financial_vars["monthly_expenses"], key="global_monthly_expenses")
+            st.number_input("Existing Student Debt (€)", value=financial_vars["existing_student_debt"], key="global_student_debt")
+            st.number_input("Monthly Student Payment (€)", value=financial_vars["monthly_student_payment"], key="global_student_payment")
         with col2:
-            la = st.number_input("Loan Amount (€)", value=la, key="global_loan_amount")
-            dp = st.number_input("Down Payment (€)", value=dp, key="global_down_payment")
-            oa = st.number_input("Other Assets (€)", value=oa, key="global_other_assets")
-        
-        # Recalculate financial metrics
-        monthly_payment = (la * (ir/100/12) * (1 + ir/100/12)**(lt*12)) / ((1 + ir/100/12)**(lt*12) - 1)
-        loan_to_value = (la / (la + dp)) * 100
-        debt_to_income = ((monthly_payment + ms) / mi) * 100
-        disposable_income = mi - me - monthly_payment - ms
-        asset_to_loan_ratio = (oa / la) * 100
-        total_monthly_housing_cost = monthly_payment + monthly_maintenance + renovation_cost_monthly
-        total_housing_ratio = (total_monthly_housing_cost / mi) * 100
-        risk_score = (debt_to_income * 0.4 + loan_to_value * 0.4 - (disposable_income/mi)*20 - (asset_to_loan_ratio*0.1))
-        risk_category = "Low Risk" if risk_score < 20 else "Moderate Risk" if risk_score < 35 else "High Risk"
+            st.number_input("Loan Amount (€)", value=financial_vars["loan_amount"], key="global_loan_amount")
+            st.number_input("Down Payment (€)", value=financial_vars["down_payment"], key="global_down_payment")
+            st.number_input("Other Assets (€)", value=financial_vars["other_assets"], key="global_other_assets")
         
         st.markdown("""
         <div class="bank-notice" style="margin-top: 15px;">
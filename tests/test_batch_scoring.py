@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_scoring import REQUIRED_COLUMNS, read_chunks, score_chunk, score_file
+from loan_engine import financial_metrics
+
+
+def applicants(n):
+    rows = pd.DataFrame({
+        "monthly_income": np.full(n, 4000), "monthly_expenses": np.full(n, 1500), "other_loans": np.zeros(n, dtype=int),
+        "other_assets": np.full(n, 10000), "loan_amount": 150000 + 1000 * np.arange(n), "down_payment": np.full(n, 40000),
+        "loan_term": np.full(n, 25), "interest_rate": np.full(n, 4),
+    })
+    rows.insert(0, "applicant_id", [f"A{i}" for i in range(n)])
+    return rows
+
+
+def test_multi_chunk_csv_with_blank_cell_in_later_chunk(tmp_path):
+    # Integer columns in the first chunk and a blank other_loans cell in the second used to
+    # change the Parquet schema between chunks
+    source = tmp_path / "applicants.csv"
+    output = tmp_path / "scores.parquet"
+    frame = applicants(7)
+    frame.to_csv(source, index=False)
+    text = source.read_text().splitlines()
+    fields = text[6].split(",")
+    fields[3] = ""
+    text[6] = ",".join(fields)
+    source.write_text("\n".join(text) + "\n")
+
+    stats = score_file(source, output, chunksize=3, processes=1)
+    scored = pd.read_parquet(output)
+
+    assert stats["rows"] == 7
+    assert scored["incomplete"].tolist() == [False] * 5 + [True, False]
+    assert scored.loc[5, ["monthly_payment", "risk_score"]].isna().all()
+    assert pd.isna(scored.loc[5, "risk_category"]) and pd.isna(scored.loc[5, "approval_tier"])
+    complete = scored.drop(index=5)
+    expected = financial_metrics(**{c: frame.drop(index=5)[c].to_numpy(dtype=float) for c in REQUIRED_COLUMNS})
+    np.testing.assert_allclose(complete["risk_score"], expected["risk_score"])
+
+
+def test_parquet_chunks_are_read_as_float(tmp_path):
+    source = tmp_path / "applicants.pq"
+    applicants(5).to_parquet(source)
+    chunks = list(read_chunks(source, chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert all(chunk[column].dtype == float for chunk in chunks for column in REQUIRED_COLUMNS)
+    assert chunks[0]["applicant_id"].dtype == object
+
+
+def test_unsupported_file_type_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported applicant file type"):
+        next(read_chunks(tmp_path / "applicants.xlsx"))
+
+
+def test_missing_required_column_is_rejected():
+    with pytest.raises(ValueError, match="missing columns: interest_rate"):
+        score_chunk(applicants(2).drop(columns="interest_rate").astype({"monthly_income": float}))
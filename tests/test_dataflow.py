@@ -0,0 +1,73 @@
+import numpy as np
+
+from dataflow import Dataflow
+
+
+def counting_flow():
+    flow = Dataflow()
+    calls = []
+
+    @flow.node("a", "b")
+    def total(a, b):
+        calls.append("total")
+        return a + b
+
+    @flow.node("total", "c")
+    def scaled(total, c):
+        calls.append("scaled")
+        return total * c
+
+    @flow.node("c")
+    def label(c):
+        calls.append("label")
+        return f"x{c}"
+
+    return flow, calls
+
+
+def test_nodes_are_computed_on_first_pull_only():
+    flow, calls = counting_flow()
+    flow.set_inputs(a=1, b=2, c=3)
+    assert flow["scaled"] == 9 and flow["label"] == "x3"
+    assert calls == ["total", "scaled", "label"]
+
+    flow.set_inputs(a=1, b=2, c=3)
+    assert flow["scaled"] == 9 and flow["label"] == "x3"
+    assert calls == ["total", "scaled", "label"]
+
+
+def test_only_nodes_downstream_of_a_changed_input_are_recomputed():
+    flow, calls = counting_flow()
+    flow.set_inputs(a=1, b=2, c=3)
+    flow["scaled"], flow["label"]
+    calls.clear()
+
+    flow.set_inputs(a=5, b=2, c=3)
+    assert flow["scaled"] == 21 and flow["label"] == "x3"
+    assert calls == ["total", "scaled"]
+
+    calls.clear()
+    flow.set_inputs(a=5, b=2, c=4)
+    assert flow["scaled"] == 28 and flow["label"] == "x4"
+    assert calls == ["scaled", "label"]
+
+
+def test_unchanged_intermediate_value_still_recomputes_dependents_once():
+    # a and b trade places: the total is recomputed, its version bumps, and scaled follows
+    flow, calls = counting_flow()
+    flow.set_inputs(a=1, b=2, c=3)
+    flow["scaled"]
+    calls.clear()
+    flow.set_inputs(a=2, b=1, c=3)
+    assert flow["scaled"] == 9
+    assert calls == ["total", "scaled"]
+
+
+def test_array_inputs_that_cannot_be_compared_count_as_changed():
+    flow, calls = counting_flow()
+    flow.set_inputs(a=np.array([1, 2]), b=np.array([3, 4]), c=1)
+    np.testing.assert_array_equal(flow["total"], [4, 6])
+    calls.clear()
+    flow.set_inputs(a=np.array([1, 2]), b=np.array([3, 4]), c=1)
+    flow["total"]
+    assert calls == ["total"]
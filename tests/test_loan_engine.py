@@ -0,0 +1,443 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from loan_engine import (
+    APPROVAL_TIERS, RATE_DENOMINATOR, RATE_UNITS_PER_PERCENT, RISK_CATEGORIES, RISK_THRESHOLDS, _feasible,
+    _structure_scores, amortization_schedule, amortization_schedule_cents, annuity_payment, balance_milestone_month,
+    budget_cuts, check_approval, cumulative_interest, effective_annual_rate, evaluate_loan_structures,
+    financial_metrics, financial_profile, first_month_at_or_below, loan_structure_frontier, max_affordable_loan,
+    optimize_loan_structure, pareto_mask, payment_grid, payment_holiday_schedule, prepayment_schedule,
+    principal_crossover_month, refinance_analysis, remaining_balance, repayment_schedule, reset_schedule,
+    risk_category, stress_test, variable_rate_schedule,
+)
+
+
+# -------------------- Brute-force references --------------------
+
+def loop_annuity(principal, annual_rate, term_years):
+    # Month-by-month annuity: interest on the opening balance, the final payment clears the rest
+    r = annual_rate / 100 / 12
+    n = round(term_years * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    balance, interest, principal_paid, balances = principal, [], [], []
+    for m in range(n):
+        month_interest = balance * r
+        repaid = balance if m == n - 1 else payment - month_interest
+        balance -= repaid
+        interest.append(month_interest)
+        principal_paid.append(repaid)
+        balances.append(balance)
+    return np.array(interest), np.array(principal_paid), np.array(balances)
+
+
+def loop_variable_rate(principal, annual_rates, term_years, repayment_type, reset_months=12, max_extension_years=10):
+    # Month-by-month variable-rate loan: the payment is reset at the start of every period
+    n = round(term_years * 12)
+    horizon = n + max_extension_years * 12 if repayment_type == "Fixed Installment" else n
+    installment = annuity_payment(principal, annual_rates[0], term_years)
+    balance, payment, balances, interest = principal, 0.0, [], []
+    for m in range(horizon):
+        rate = annual_rates[min(m // reset_months, len(annual_rates) - 1)]
+        r = rate / 100 / 12
+        if m % reset_months == 0:
+            if repayment_type == "Annuity":
+                payment = annuity_payment(balance, rate, (n - m) / 12)
+            elif repayment_type == "Fixed Installment":
+                payment = max(installment, balance * r * 1.001)
+        month_interest = balance * r
+        if repayment_type == "Equal Principal":
+            repaid = min(principal / n, balance)
+        else:
+            repaid = min(payment - month_interest, balance)
+        if m == horizon - 1:
+            repaid = balance
+        balance -= repaid
+        interest.append(month_interest)
+        balances.append(balance)
+        if balance <= 1e-9:
+            break
+    return np.array(interest), np.array(balances)
+
+
+def loop_prepayment(principal, annual_rate, term_years, extra, lump_sums=None):
+    r = annual_rate / 100 / 12
+    n = round(term_years * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    balance, total_interest = principal, 0.0
+    for month in range(1, n + 1):
+        total_interest += balance * r
+        balance = balance * (1 + r) - payment - extra - (lump_sums or {}).get(month, 0)
+        if balance <= 1e-6:
+            return month, total_interest
+    return n, total_interest
+
+
+def loop_holiday(principal, annual_rate, term_years, start, length, extend_term):
+    # Interest only during the holiday, then a new annuity over what is left
+    r = annual_rate / 100 / 12
+    n = round(term_years * 12)
+    payment = annuity_payment(principal, annual_rate, term_years)
+    balance, balances, month = principal, [], 1
+    while month < start:
+        balance = balance * (1 + r) - payment
+        balances.append(balance)
+        month += 1
+    holiday_balance = balance
+    balances += [balance] * length
+    remaining = n - (start - 1) if extend_term else n - (start - 1) - length
+    payment_after = annuity_payment(holiday_balance, annual_rate, remaining / 12)
+    for _ in range(remaining):
+        balance = balance * (1 + r) - payment_after
+        balances.append(balance)
+    balances[-1] = 0.0
+    return np.maximum(balances, 0.0)
+
+
+def bisection_irr(cash_flows, net_amount):
+    # Monthly rate at which the cash flows are worth the net amount received
+    low, high = 0.0, 1.0
+    months = np.arange(1, len(cash_flows) + 1)
+    for _ in range(200):
+        mid = (low + high) / 2
+        if (cash_flows * (1 + mid) ** -months).sum() > net_amount:
+            low = mid
+        else:
+            high = mid
+    return ((1 + (low + high) / 2) ** 12 - 1) * 100
+
+
+def brute_force_non_dominated(points):
+    points = np.asarray(points, dtype=float)
+    unique = np.unique(points, axis=0)
+    keep = []
+    for p in unique:
+        dominated = np.any(np.all(unique <= p, axis=1) & np.any(unique < p, axis=1))
+        if not dominated:
+            keep.append(tuple(p))
+    return set(keep)
+
+
+# -------------------- Payments and schedules --------------------
+
+@pytest.mark.parametrize("principal, rate, years", [(200000, 4.0, 25), (150000, 0.0, 20), (90000, 7.5, 10.5)])
+def test_amortization_schedule_matches_a_monthly_loop(principal, rate, years):
+    schedule = amortization_schedule(principal, rate, years)
+    interest, principal_paid, balance = loop_annuity(principal, rate, years)
+    np.testing.assert_allclose(schedule["interest"], interest, atol=1e-6)
+    np.testing.assert_allclose(schedule["principal"], principal_paid, atol=1e-6)
+    np.testing.assert_allclose(schedule["balance"], balance, atol=1e-6)
+    assert np.isclose(schedule["total_paid"], principal + interest.sum())
+    padded = np.pad(interest, (0, schedule["year"].size * 12 - interest.size))
+    np.testing.assert_allclose(schedule["yearly_interest"], padded.reshape(-1, 12).sum(axis=1), atol=1e-6)
+
+
+def test_amortization_schedule_batches_mixed_terms():
+    batch = amortization_schedule([100000, 200000], [3.0, 5.0], [10, 20])
+    for k, (principal, rate, years) in enumerate([(100000, 3.0, 10), (200000, 5.0, 20)]):
+        single = amortization_schedule(principal, rate, years)
+        n = round(years * 12)
+        np.testing.assert_allclose(batch["balance"][k, :n], single["balance"], atol=1e-6)
+        assert not batch["interest"][k, n:].any()
+
+
+def test_payment_grid_matches_the_schedules():
+    grid = payment_grid([150000, 250000], [2.0, 4.5], [15, 30], outer=True)
+    for i, j, k in itertools.product(range(2), range(2), range(2)):
+        schedule = amortization_schedule([150000, 250000][i], [2.0, 4.5][j], [15, 30][k])
+        assert np.isclose(grid["payment"][i, j, k], schedule["payment"])
+        assert np.isclose(grid["total_interest"][i, j, k], schedule["total_interest"])
+    equal_principal = payment_grid(240000, 4.0, 20, repayment_type="Equal Principal")
+    schedule = repayment_schedule(240000, 4.0, 20, "Equal Principal")
+    assert np.isclose(equal_principal["payment"], schedule["payments"][0])
+    assert np.isclose(equal_principal["total_interest"], schedule["total_interest"])
+
+
+def test_cent_schedule_matches_integer_arithmetic():
+    principal, rate, years = 187654.32, 3.87, 25
+    schedule = amortization_schedule_cents(principal, rate, years)
+    units = round(rate * RATE_UNITS_PER_PERCENT)
+    payment = int(np.ceil(round(annuity_payment(principal, rate, years) * 100, 6)))
+    balance, n = round(principal * 100), round(years * 12)
+    for m in range(n):
+        quotient, remainder = divmod(balance * units, RATE_DENOMINATOR)
+        interest = quotient + (2 * remainder >= RATE_DENOMINATOR)
+        repaid = balance if m == n - 1 else min(max(payment - interest, 0), balance)
+        balance -= repaid
+        assert schedule["interest"][m] == interest
+        assert schedule["balance"][m] == balance
+    assert schedule["total_paid"] == round(principal * 100) + schedule["total_interest"]
+
+
+@pytest.mark.parametrize("repayment_type", ["Annuity", "Equal Principal", "Fixed Installment"])
+@pytest.mark.parametrize("rates", [[2.0, 3.0, 5.0, 6.5], [5.0, 3.0, 1.5, 1.0], [3.0, 7.0, 9.0, 9.0]])
+def test_variable_rate_schedule_matches_a_monthly_loop(repayment_type, rates):
+    rates = np.array(rates + [rates[-1]] * 30)
+    schedule = variable_rate_schedule(200000, rates, 20, repayment_type=repayment_type)
+    interest, balance = loop_variable_rate(200000, rates, 20, repayment_type)
+    np.testing.assert_allclose(schedule["balance"], balance, atol=1e-5)
+    np.testing.assert_allclose(schedule["interest"], interest, atol=1e-5)
+    assert np.isclose(schedule["total_paid"], 200000 + interest.sum())
+
+    resets = reset_schedule(200000, rates, 20, repayment_type=repayment_type)
+    assert np.isclose(resets["total_interest"], interest.sum())
+    assert np.isclose(resets["total_paid"], schedule["total_paid"])
+    assert int(resets["payoff_month"]) == len(balance) or repayment_type != "Fixed Installment"
+
+
+def test_fixed_installment_books_the_residual_as_a_balloon():
+    rates = np.array([2.0, 3.0, 6.0] + [9.0] * 40)
+    resets = reset_schedule(200000, rates, 20, repayment_type="Fixed Installment")
+    schedule = variable_rate_schedule(200000, rates, 20, repayment_type="Fixed Installment")
+    assert resets["balloon"] > 0
+    assert np.isclose(resets["balloon"], schedule["balloon"])
+    # The last payment clears the whole opening balance, balloon included
+    assert np.isclose(schedule["payments"][-1], schedule["interest"][-1] + schedule["balance"][-2])
+    assert schedule["principal"][-1] > schedule["balloon"]
+    assert np.isclose(schedule["total_paid"], 200000 + schedule["total_interest"])
+
+
+def test_fixed_installment_schedule_ends_at_payoff():
+    # At a constant rate a fixed installment loan repays like an annuity; the extension
+    # months it could run into must not show up as empty years
+    fixed = repayment_schedule(200000, 4.0, 25, "Fixed Installment")
+    annuity = amortization_schedule(200000, 4.0, 25)
+    assert int(fixed["months"]) == 300
+    assert fixed["balance"].shape == (300,) and fixed["year"].size == 25
+    np.testing.assert_allclose(fixed["balance"], annuity["balance"], atol=1e-6)
+    np.testing.assert_allclose(fixed["yearly_interest"], annuity["yearly_interest"], atol=1e-6)
+    assert float(fixed["balloon"]) == 0.0
+
+
+# -------------------- Closed-form balance queries --------------------
+
+def test_balance_queries_match_the_schedule():
+    principal, rate, years, value = 220000, 3.5, 25, 280000
+    schedule = amortization_schedule(principal, rate, years)
+    months = np.arange(0, 301, 7)
+    expected_balance = np.concatenate([[principal], schedule["balance"]])[months]
+    np.testing.assert_allclose(remaining_balance(principal, rate, years, months), expected_balance, atol=1e-6)
+    expected_interest = np.concatenate([[0.0], schedule["cumulative_interest"]])[months]
+    np.testing.assert_allclose(cumulative_interest(principal, rate, years, months), expected_interest, atol=1e-6)
+
+    for threshold in [principal / 2, value * 0.6, 1000.0, principal]:
+        expected = 0 if threshold >= principal else first_month_at_or_below(schedule["balance"], threshold)
+        assert balance_milestone_month(principal, rate, years, threshold) == expected
+    expected_crossover = np.argmax(schedule["principal"] >= schedule["interest"]) + 1
+    assert principal_crossover_month(principal, rate, years) == expected_crossover
+
+
+def test_refinance_analysis_matches_direct_computation():
+    principal, rate, years, new_rate, fees = 200000, 4.5, 20, 3.0, 1500
+    result = refinance_analysis(principal, rate, years, new_rate, fees)
+    schedule = amortization_schedule(principal, rate, years)
+    for month in [0, 1, 60, 239]:
+        balance = principal if month == 0 else schedule["balance"][month - 1]
+        new_payment = annuity_payment(balance, new_rate, (240 - month) / 12)
+        assert np.isclose(result["balance"][month], balance)
+        assert np.isclose(result["net_savings"][month], (schedule["payment"] - new_payment) * (240 - month) - fees)
+
+
+# -------------------- Prepayments and holidays --------------------
+
+def test_prepayment_schedule_matches_a_monthly_loop():
+    extras = np.array([0, 50, 100, 250, 1000])
+    lump_sums = {24: 10000, 61: 5000}
+    result = prepayment_schedule(180000, 4.2, 25, extras, lump_sums)
+    for k, extra in enumerate(extras):
+        payoff, total_interest = loop_prepayment(180000, 4.2, 25, extra, lump_sums)
+        assert result["payoff_month"][k] == payoff
+        assert np.isclose(result["total_interest"][k], total_interest)
+
+
+def test_payment_holiday_matches_a_monthly_loop():
+    for start, length, extend_term in [(1, 6, True), (37, 12, True), (37, 12, False), (120, 3, False)]:
+        result = payment_holiday_schedule(200000, 4.0, 25, start, length, extend_term=extend_term)
+        expected = loop_holiday(200000, 4.0, 25, start, length, extend_term)
+        assert result["balance"].shape == expected.shape
+        np.testing.assert_allclose(result["balance"], expected, atol=1e-6)
+
+
+def test_final_year_holiday_keeps_the_original_end_date():
+    # A 12-month holiday from the first month of the last year cannot fit before month 300
+    result = payment_holiday_schedule(200000, 4.0, 25, 289, 12, extend_term=False)
+    assert int(result["months"]) == 300
+    assert int(result["holiday_months"]) == 11
+    assert result["balance"].shape == (300,)
+    np.testing.assert_allclose(result["balance"], loop_holiday(200000, 4.0, 25, 289, 11, False), atol=1e-6)
+
+    grid = payment_holiday_schedule(200000, 4.0, 25, np.arange(25)[:, None] * 12 + 1, np.arange(13), extend_term=False)
+    assert grid["months"].max() == 300
+
+    extended = payment_holiday_schedule(200000, 4.0, 25, 289, 12, extend_term=True)
+    assert int(extended["months"]) == 312 and int(extended["holiday_months"]) == 12
+
+
+# -------------------- Effective rate --------------------
+
+@pytest.mark.parametrize("repayment_type", ["Annuity", "Equal Principal"])
+def test_effective_annual_rate_matches_bisection_on_cash_flows(repayment_type):
+    principal, rate, years, upfront_fee, monthly_fee = 200000, 4.0, 20, 1500, 5
+    payments = repayment_schedule(principal, rate, years, repayment_type)["payments"]
+    expected = bisection_irr(payments + monthly_fee, principal - upfront_fee)
+    result = effective_annual_rate(principal, rate, years, upfront_fee, monthly_fee, repayment_type=repayment_type)
+    assert np.isclose(result, expected, atol=1e-8)
+
+
+def test_effective_annual_rate_batches_repayment_types():
+    types = np.array(["Annuity", "Equal Principal", "Annuity"])
+    batch = effective_annual_rate([100000, 200000, 300000], [3.0, 4.0, 5.0], [10, 20, 30], 1000, 3, repayment_type=types)
+    for k in range(3):
+        single = effective_annual_rate([100000, 200000, 300000][k], [3.0, 4.0, 5.0][k], [10, 20, 30][k], 1000, 3,
+                                       repayment_type=types[k])
+        assert np.isclose(batch[k], single, atol=1e-9)
+    assert np.isclose(effective_annual_rate(100000, 4.0, 20), (1 + 4.0 / 1200) ** 12 * 100 - 100)
+
+
+# -------------------- Affordability, stress test and budget cuts --------------------
+
+def test_max_affordable_loan_is_the_largest_loan_meeting_every_constraint():
+    income, cash, rate, years, max_monthly, max_dti, other_debt = 5000, 60000, 4.0, 25, 1500, 40, 200
+    result = max_affordable_loan(income, cash, rate, years, max_monthly=max_monthly, max_dti=max_dti,
+                                 other_monthly_debt=other_debt)
+
+    def meets_all(loan):
+        payment = annuity_payment(loan, rate, years)
+        stressed = annuity_payment(loan, 6.0, min(years, 25))
+        return (payment <= max_monthly + 1e-9 and (payment + other_debt) / income * 100 <= max_dti + 1e-9
+                and (stressed + other_debt) / income * 100 <= 50 + 1e-9 and loan / (loan + cash) * 100 <= 95 + 1e-9)
+
+    low, high = 0.0, 5e6
+    for _ in range(100):
+        mid = (low + high) / 2
+        low, high = (mid, high) if meets_all(mid) else (low, mid)
+    assert np.isclose(result["max_loan"], low, rtol=1e-9)
+    assert np.isclose(result["max_price"], low + cash)
+
+
+def test_stress_test_matches_direct_computation():
+    result = stress_test([4000, 6000], 250000, 30, other_monthly_debt=150)
+    stressed = annuity_payment(250000, 6.0, 25)
+    np.testing.assert_allclose(result["stressed_ratio"], (stressed + 150) / np.array([4000, 6000]) * 100)
+    np.testing.assert_array_equal(result["passes"], result["stressed_ratio"][:, None] <= np.array([50, 60]))
+
+
+def test_budget_cuts_match_the_cheapest_vertex():
+    # The LP optimum is a vertex: some categories cut fully in an order, one partly
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        budget = rng.integers(50, 400, 5).astype(float)
+        floor = np.floor(budget * rng.uniform(0, 0.5, 5))
+        weight = rng.choice([1.0, 2.0, 4.0], 5)
+        shortfall = rng.uniform(0, 1.2) * (budget - floor).sum()
+        result = budget_cuts(shortfall, budget, floor, weight)
+
+        best = np.inf
+        for order in itertools.permutations(range(5)):
+            left, cost = shortfall, 0.0
+            for k in order:
+                cut = min(left, budget[k] - floor[k])
+                cost += cut * weight[k]
+                left -= cut
+            best = min(best, cost)
+        assert np.isclose(result["cost"], best)
+        assert np.isclose(result["cuts"].sum() + result["uncovered"], shortfall)
+        assert np.all(result["remaining_budget"] >= floor - 1e-9)
+
+
+def test_budget_cuts_share_equal_weights_evenly():
+    result = budget_cuts(60, [100, 200, 300], floor=[0, 100, 100], weight=1)
+    np.testing.assert_allclose(result["cuts"], [15, 15, 30])
+
+
+# -------------------- Approval, metrics and the recommender --------------------
+
+def test_check_approval_matches_a_tier_loop():
+    rng = np.random.default_rng(5)
+    dti, ltv, credit = rng.uniform(20, 55, 200), rng.uniform(60, 100, 200), rng.integers(0, 4, 200)
+    result = check_approval({"dti_ratio": dti, "ltv_ratio": ltv, "credit_rating": credit})
+    for k in range(200):
+        expected = next((rank for rank, limits in enumerate(APPROVAL_TIERS.values())
+                         if dti[k] <= limits["max_dti"] and ltv[k] <= limits["max_ltv"]
+                         and credit[k] >= limits["min_credit"]), len(APPROVAL_TIERS))
+        assert result["approval_rank"][k] == expected
+
+
+def test_risk_category_follows_the_thresholds():
+    scores = np.array([-5.0, 19.99, 20.0, 34.99, 35.0, 80.0])
+    assert [risk_category(score) for score in scores] == [
+        "Low Risk", "Low Risk", "Moderate Risk", "Moderate Risk", "High Risk", "High Risk"]
+    indices = np.searchsorted(RISK_THRESHOLDS, scores, side="right")
+    assert [risk_category(score) for score in scores] == [RISK_CATEGORIES[i] for i in indices]
+
+
+def test_financial_profile_matches_the_batched_metrics():
+    inputs = (4500, 1800, 150, 20000, 200000, 50000, 25, 4.0, 200, 50)
+    profile = financial_profile(*inputs)
+    metrics = financial_metrics(*(np.full(3, value, dtype=float) for value in inputs))
+    for key, value in profile._asdict().items():
+        if key == "risk_category":
+            assert value == RISK_CATEGORIES[metrics[key][0]]
+        else:
+            assert np.isclose(value, metrics[key][0])
+
+
+def test_pareto_mask_matches_pairwise_dominance():
+    rng = np.random.default_rng(11)
+    points = rng.integers(0, 8, (400, 3)).astype(float)
+    mask = pareto_mask(points)
+    kept = {tuple(point) for point in points[mask]}
+    assert kept == brute_force_non_dominated(points)
+    assert mask.sum() == len(kept)
+
+
+def test_loan_structure_frontier_matches_brute_force():
+    price, cash, rate, income, max_monthly = 300000, 120000, 4.0, 6000, 2200
+    frontier = loan_structure_frontier(price, cash, rate, income, max_monthly, down_payment_steps=40)
+    down_payments = np.round(np.linspace(price * 0.05, cash, 40), -1)
+    candidates = evaluate_loan_structures(price, down_payments, np.arange(10, 31), rate, income)
+    feasible = _feasible(candidates, max_monthly, len(APPROVAL_TIERS) - 1, 95)
+    points = np.column_stack([candidates[key][feasible] for key in ("down_payment", "monthly", "total_interest")])
+    found = set(map(tuple, np.column_stack([frontier["down_payment"], frontier["monthly"], frontier["total_interest"]])))
+    assert found == brute_force_non_dominated(points)
+
+
+def test_no_loan_needed_when_cash_covers_the_price():
+    result = optimize_loan_structure(300000, 320000, 4.0, 5000, 2000, payment_priority=1, risk_tolerance=1)
+    assert result == {"loan_needed": False, "down_payment": 300000.0, "loan_amount": 0.0, "cash_left": 20000.0}
+
+
+def test_loan_structure_when_cash_falls_short_of_the_price():
+    result = optimize_loan_structure(300000, 100000, 4.0, 5000, 2000)
+    assert result["loan_needed"]
+    assert 200000 <= result["loan_amount"] <= 285000
+    assert np.isclose(result["down_payment"] + result["loan_amount"], 300000)
+
+
+def test_optimizer_matches_a_fine_down_payment_grid():
+    # The score is linear in the down payment between constraint corners, so the corner
+    # search must do at least as well as a brute-force search on a EUR 50 grid
+    rng = np.random.default_rng(7)
+    for _ in range(8):
+        price = rng.uniform(150000, 400000)
+        cash = rng.uniform(0.06, 0.6) * price
+        rate, income, max_monthly = rng.uniform(2, 6), rng.uniform(2500, 9000), rng.uniform(800, 3500)
+        priority, tolerance = rng.integers(1, 6), rng.integers(1, 6)
+        target = list(APPROVAL_TIERS)[rng.integers(0, len(APPROVAL_TIERS))]
+        target_rank = list(APPROVAL_TIERS).index(target)
+        result = optimize_loan_structure(price, cash, rate, income, max_monthly, target, priority, tolerance)
+
+        downs = np.unique(np.append(np.arange(np.ceil(price * 0.05), cash, 50.0), [price * 0.05, cash]))
+        grid = evaluate_loan_structures(price, downs, np.arange(10, 31), rate, income)
+        feasible = _feasible(grid, max_monthly, target_rank, 95)
+        if not feasible.any():
+            assert result is None
+            continue
+        ranges = {key: (grid[key][feasible].min(), grid[key][feasible].max())
+                  for key in ("monthly", "total_interest", "down_payment")}
+        best = _structure_scores(grid, feasible, priority, tolerance, ranges).min()
+        chosen = evaluate_loan_structures(price, [result["down_payment"]], [result["term"]], rate, income,
+                                          repayment_types=[result["repayment_type"]])
+        score = _structure_scores(chosen, _feasible(chosen, max_monthly, target_rank, 95), priority, tolerance, ranges)
+        assert score.min() <= best + 1e-6
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+
+from loan_engine import annuity_payment, remaining_balance
+from risk_simulation import (
+    _lifetime_chunk, expected_reference_rates, simulate_life_event_cashflow, simulate_lifetime_distress,
+    simulate_rate_risk, simulate_reference_rates, simulate_wealth, stress_matrix,
+)
+
+EVENTS = [
+    {"annual_probability": 4, "typical_months": 6, "income_change": -40, "expense_change": 0},
+    {"annual_probability": 2, "typical_months": 12, "income_change": -20, "expense_change": 15},
+    {"annual_probability": 3, "typical_months": 24, "income_change": 0, "expense_change": 0, "rate_change": 2},
+]
+
+
+def test_reference_rates_without_volatility_follow_the_expected_path():
+    rates = simulate_reference_rates(3, 10, 3.5, long_run_rate=2.0, volatility=0.0, seed=1)
+    np.testing.assert_allclose(rates, np.broadcast_to(expected_reference_rates(10, 3.5, 2.0), (3, 10)))
+    assert simulate_reference_rates(500, 10, 0.5, long_run_rate=0.0, volatility=2.0, seed=1).min() >= 0.0
+
+
+def test_rate_risk_does_not_depend_on_the_process_pool():
+    serial = simulate_rate_risk(200000, 20, 5000, 3.0, 0.8, n_paths=30000, seed=4)
+    pooled = simulate_rate_risk(200000, 20, 5000, 3.0, 0.8, n_paths=30000, seed=4, processes=2)
+    np.testing.assert_array_equal(serial["total_interest"], pooled["total_interest"])
+    np.testing.assert_array_equal(serial["payment_bands"], pooled["payment_bands"])
+
+
+def test_stress_matrix_matches_a_scenario_loop():
+    shocks, durations = np.linspace(-1, 4, 120), np.array([3, 6, 12])
+    result = stress_matrix(200000, 4.0, 25, 5000, 2500, EVENTS, shocks, durations, housing_costs=300, savings=10000)
+    for e, event in enumerate(EVENTS):
+        for s, shock in enumerate(shocks):
+            income = 5000 * (1 + event["income_change"] / 100)
+            payment = annuity_payment(200000, 4.0 + event.get("rate_change", 0) + shock, 25)
+            leftover = income - 2500 * (1 + event["expense_change"] / 100) - payment - 300
+            assert np.isclose(result["leftover"][e, s], leftover)
+            np.testing.assert_allclose(result["savings_left"][e, s], 10000 + leftover * durations)
+            assert np.isclose(result["months_covered"][e, s], 10000 / -leftover if leftover < 0 else np.inf)
+
+
+def test_life_event_cashflow_matches_a_monthly_loop():
+    kwargs = dict(monthly_income=4000, monthly_expenses=2200, loan_payment=1100, savings=6000, income_change=-50,
+                  expense_change=10, event_payment=700, housing_costs=250, onset_month=4, typical_months=6,
+                  recovery_months=3, benefit_months=4, income_change_after_benefits=-70, horizon_months=36,
+                  n_paths=40, seed=9)
+    result = simulate_life_event_cashflow(**kwargs)
+    durations = result["durations"]
+    rng = np.random.default_rng(9)
+    np.testing.assert_array_equal(durations, np.maximum(np.ceil(rng.gamma(2.0, 6 / 2.0, 40)), 1))
+
+    for p, duration in enumerate(durations):
+        balance, lowest, first_depleted = 6000.0, np.inf, None
+        for month in range(1, 37):
+            elapsed = month - 4
+            if 0 <= elapsed < duration:
+                fade, months_in = 1.0, elapsed
+            elif 0 <= elapsed - duration < 3:
+                fade, months_in = 1 - (elapsed - duration + 1) / 4, duration - 1
+            else:
+                fade, months_in = 0.0, duration - 1
+            income_change = -50 if months_in < 4 else -70
+            income = 4000 * (1 + income_change * fade / 100)
+            leftover = income - 2200 * (1 + 10 * fade / 100) - (1100 + (700 - 1100) * fade) - 250
+            balance += leftover
+            lowest = min(lowest, balance)
+            if balance < 0 and first_depleted is None:
+                first_depleted = month
+        assert np.isclose(result["lowest_savings"][p], lowest)
+        expected_runway = np.inf if first_depleted is None else max(first_depleted - 4, 0)
+        assert result["runway"][p] == expected_runway
+    assert 0 < np.isfinite(result["runway"]).sum() < 40
+
+
+def test_life_event_runway_is_zero_when_savings_run_out_before_the_event():
+    result = simulate_life_event_cashflow(3000, 2900, 400, 500, -50, onset_month=6, n_paths=100)
+    assert result["short_before_event"].all()
+    assert (result["runway"] == 0).all()
+    healthy = simulate_life_event_cashflow(3000, 2000, 400, 5000, -50, onset_month=6, n_paths=100)
+    assert not healthy["short_before_event"].any()
+    assert (healthy["runway"] > 0).all()
+
+
+def test_lifetime_chunk_matches_a_household_loop():
+    n_households, n_months = 150, 120
+    income, expenses, housing, savings = 5200.0, 2600.0, 250.0, 8000.0
+    payment = np.full(n_months, float(annuity_payment(180000, 4.0, 10)))
+    month = np.arange(1, n_months + 1)
+    opening = remaining_balance(180000, 4.0, 10, month - 1)
+    rate_change = np.array([event.get("rate_change", 0) for event in EVENTS], dtype=float)
+    event_payments = np.where(rate_change[:, None] != 0,
+                              annuity_payment(opening, 4.0 + rate_change[:, None], (n_months - month + 1) / 12),
+                              payment)
+    hazard = 1 - (1 - np.array([20.0, 10.0, 15.0]) / 100) ** (1 / 12)
+    typical = np.array([event["typical_months"] for event in EVENTS], dtype=float)
+    income_factor = 1 + np.array([event["income_change"] for event in EVENTS], dtype=float) / 100
+    expense_factor = 1 + np.array([event["expense_change"] for event in EVENTS], dtype=float) / 100
+    seed = np.random.SeedSequence(21)
+    first_month, _, occurrences = _lifetime_chunk((n_households, seed, income, expenses, housing, savings, payment,
+                                                   event_payments, hazard, typical, income_factor, expense_factor, 2.0))
+
+    # Same draws as the chunk, then every household stepped through month by month
+    rng = np.random.default_rng(seed)
+    max_occurrences = int(np.ceil(hazard.max() * n_months * 3)) + 5
+    onsets = np.ceil(np.cumsum(rng.exponential(1 / hazard[:, None, None], (3, n_households, max_occurrences)), axis=-1))
+    durations = np.maximum(np.ceil(rng.gamma(2.0, typical[:, None, None] / 2.0, onsets.shape)), 1)
+    for h in range(n_households):
+        balance, expected = savings, 0
+        for m in range(1, n_months + 1):
+            active = [((onsets[e, h] <= m) & (m < onsets[e, h] + durations[e, h])).any() for e in range(3)]
+            leftover = (income * np.prod(np.where(active, income_factor, 1.0))
+                        - expenses * np.prod(np.where(active, expense_factor, 1.0)) - payment[m - 1] - housing)
+            leftover -= sum(event_payments[e, m - 1] - payment[m - 1] for e in range(3) if active[e])
+            balance += leftover
+            if balance < 0:
+                expected = m
+                break
+        assert first_month[h] == expected
+    assert 0 < (first_month > 0).sum() < n_households
+    np.testing.assert_array_equal(occurrences, (onsets <= n_months).sum(axis=-1).sum(axis=1))
+
+
+def test_lifetime_distress_does_not_depend_on_the_process_pool():
+    args = (200000, 4.0, 20, 4500, 2800, EVENTS)
+    serial = simulate_lifetime_distress(*args, savings=5000, n_households=12000, seed=3)
+    pooled = simulate_lifetime_distress(*args, savings=5000, n_households=12000, seed=3, processes=2)
+    np.testing.assert_array_equal(serial["first_distress_month"], pooled["first_distress_month"])
+    assert serial["prob_distress"] == pooled["prob_distress"]
+    assert np.isclose(serial["cumulative_distress"][-1], serial["prob_distress"])
+
+
+@pytest.mark.parametrize("rates", [[4.0], [2.0, 6.0]])
+def test_wealth_matches_a_monthly_portfolio_loop(rates):
+    result = simulate_wealth(150000, rates, 20, 220000, 5000, 2500, initial_investments=10000, years=10,
+                             n_paths=30, seed=5, percentiles=(0, 50, 100))
+    rng = np.random.default_rng(5)
+    sigma = 0.15 / np.sqrt(12)
+    returns = rng.normal(np.log(1.07) / 12 - sigma ** 2 / 2, sigma, (30, 120))
+    for s, rate in enumerate(rates):
+        payment = annuity_payment(150000, rate, 20)
+        contribution = max(min(5000 * 0.15, 5000 - 2500 - payment), 0)
+        wealth = np.full(30, 10000.0)
+        for m in range(120):
+            wealth = (wealth + contribution) * np.exp(returns[:, m])
+        np.testing.assert_allclose(result["investment_bands"][[0, 2], s, -1], [wealth.min(), wealth.max()], rtol=1e-9)
+        assert np.isclose(result["balance"][s, -1], remaining_balance(150000, rate, 20, 120))